@@ -9,10 +9,12 @@
 #TODO Shunt admittances at buses
 
 import sys, os, copy
-import networkx
 import math
 
 import networkMaker
+import instrumentation
+import lazyImport
+networkx=lazyImport.lazyModule('networkx')
 
 ## Entry point of the program.
 # @param argv Program parameters: data folder path, slack bus id, period of interest (scenario hardcoded for now).
@@ -39,7 +41,9 @@ def writeLine(outFile,str2Write):
 ## Make the file input for pyflow.
 # @param fileName Output file name.
 # @param networkGraph Graph with the daily scenario.
-def makeDGPFile(fileName, networkGraph):
+# @param sink Output sink of the file, see outputSinks. If None, the file is written in the current folder.
+@instrumentation.instrumented(output=lambda fileName,*args,**kwargs: fileName if kwargs.get('sink') is None else [])
+def makeDGPFile(fileName, networkGraph, sink=None):
 
     # Convert multigraph into a simple graph, without multiedges
     simpleGraph = networkx.Graph()
@@ -51,7 +55,7 @@ def makeDGPFile(fileName, networkGraph):
         else:
             print(u,v)
 
-    outFile = open(fileName,'w')
+    outFile = open(fileName,'w') if sink is None else sink.open(fileName)
 
     # write front matter
     outFile.write("""Bus\n""")
@@ -0,0 +1,111 @@
+## Sparse admittance matrix (Ybus) of the network.
+# Requires numpy and scipy which can be installed with "pip3 install numpy scipy".
+#@author Sebastien MATHIEU
+
+import numpy
+import scipy.sparse
+
+import networkArrays
+
+# Cache of the admittance matrices with the topology hash, MVA base and base voltage as a key.
+ybusCache={}
+
+## Make the admittance matrix of a network.
+# The matrix is cached with the hash of the topology, the returned matrix can be updated without altering the cache.
+# @param graph Network graph from networkMaker.makeNetwork.
+# @param baseMVA System MVA base.
+# @param baseKV Base voltage in kV of every bus. If None, the base voltage of each bus is used.
+# @return AdmittanceMatrix.
+def makeYbus(graph,baseMVA=networkArrays.BASE_MVA,baseKV=None):
+	key=(networkArrays.topologyHash(graph),baseMVA,baseKV)
+	ybus=ybusCache.get(key)
+	if ybus is None:
+		ybus=AdmittanceMatrix(networkArrays.makeNetworkArrays(graph,baseMVA,baseKV))
+		ybusCache[key]=ybus
+	return ybus.copy()
+
+## Admittance matrix of a network with series and shunt terms of the closed branches.
+# The sparsity pattern contains every branch, open branches having null entries, so that opening or closing a branch
+# only updates four existing entries of the matrix.
+class AdmittanceMatrix:
+	## Constructor.
+	# @param arrays Array model of the network.
+	def __init__(self,arrays):
+		self.arrays=arrays
+		n=len(arrays.buses)
+		f=arrays.fromBus
+		t=arrays.toBus
+
+		# Series and shunt admittances of each branch in p.u.
+		z=arrays.r+1j*arrays.x
+		if numpy.any(z == 0):
+			raise Exception("Branches with a null impedance: %s"%[arrays.branches[i] for i in numpy.flatnonzero(z == 0)])
+		self.ySeries=1/z
+		self.yShunt=1j*arrays.b
+		self.closed=arrays.closed.copy()
+
+		# Sparsity pattern with the diagonal and both off-diagonal terms of every branch
+		rows=numpy.concatenate((numpy.arange(n),f,t))
+		cols=numpy.concatenate((numpy.arange(n),t,f))
+		pattern=scipy.sparse.csr_matrix((numpy.ones(len(rows)),(rows,cols)),shape=(n,n))
+		pattern.sum_duplicates()
+		pattern.sort_indices()
+		self.Y=scipy.sparse.csr_matrix((numpy.zeros(pattern.nnz,dtype=complex),pattern.indices,pattern.indptr),shape=(n,n))
+
+		# Position in the data array of the (f,f), (f,t), (t,f) and (t,t) entries of every branch
+		keys=numpy.repeat(numpy.arange(n),numpy.diff(self.Y.indptr))*n+self.Y.indices
+		self.positions=numpy.searchsorted(keys,numpy.stack((f*n+f,f*n+t,t*n+f,t*n+t),axis=1))
+
+		# Stamp the closed branches
+		c=numpy.flatnonzero(self.closed)
+		numpy.add.at(self.Y.data,self.positions[c,0],self.ySeries[c]+self.yShunt[c]/2)
+		numpy.add.at(self.Y.data,self.positions[c,1],-self.ySeries[c])
+		numpy.add.at(self.Y.data,self.positions[c,2],-self.ySeries[c])
+		numpy.add.at(self.Y.data,self.positions[c,3],self.ySeries[c]+self.yShunt[c]/2)
+
+	## Copy the matrix, the array model is shared.
+	# @return AdmittanceMatrix.
+	def copy(self):
+		other=AdmittanceMatrix.__new__(AdmittanceMatrix)
+		other.__dict__.update(self.__dict__)
+		other.Y=self.Y.copy()
+		other.closed=self.closed.copy()
+		return other
+
+	## Open or close a branch by a rank-one update of the series term and a diagonal update of the shunt term.
+	# The change of the matrix is dySeries*(e_f-e_t)(e_f-e_t)^T + dyShunt/2*(e_f e_f^T + e_t e_t^T).
+	# @param branch Index of the branch or (from bus, to bus, line id).
+	# @param closed New status of the branch.
+	# @return Tuple (f, t, dySeries, dyShunt) with the bus indexes of the branch and the change of its admittances, null if the status is unchanged.
+	def setBranchStatus(self,branch,closed):
+		if not isinstance(branch,(int,numpy.integer)):
+			branch=self.arrays.branchIndex[branch]
+		f=self.arrays.fromBus[branch]
+		t=self.arrays.toBus[branch]
+		if bool(closed) == self.closed[branch]:
+			return f,t,0j,0j
+
+		sign=1 if closed else -1
+		dySeries=sign*self.ySeries[branch]
+		dyShunt=sign*self.yShunt[branch]
+		ff,ft,tf,tt=self.positions[branch]
+		data=self.Y.data
+		data[ff]+=dySeries+dyShunt/2
+		data[ft]-=dySeries
+		data[tf]-=dySeries
+		data[tt]+=dySeries+dyShunt/2
+		self.closed[branch]=bool(closed)
+		return f,t,dySeries,dyShunt
+
+	## @var arrays
+	# Array model of the network.
+	## @var Y
+	# Admittance matrix in p.u. as a scipy.sparse.csr_matrix indexed as the buses of the array model.
+	## @var ySeries
+	# Series admittance of each branch in p.u.
+	## @var yShunt
+	# Total shunt admittance of each branch in p.u.
+	## @var closed
+	# Status of each branch in the matrix.
+	## @var positions
+	# Positions in the data array of Y of the (f,f), (f,t), (t,f) and (t,t) entries of each branch.
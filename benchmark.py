@@ -0,0 +1,253 @@
+## Benchmark of the readers and converters on synthetic data of increasing size.
+# The data sets are generated by syntheticData in the benchmark folder and reused by the next runs. The day mode of a
+# converter writes the files of one day. The year mode runs the year path of each converter, its main or its year
+# writer, on a sample of days of the year given with --days. The time of the days, without the reading of the network,
+# is scaled to the whole year. The power flow of the year is run with an increasing number of worker processes to
+# measure its scaling with the cores. The scaling exponent of each case is the slope of its time between the two largest
+# sizes in a log-log scale, 1 for a linear scaling.
+# Requires openpyxl which can be installed with "pip3 install openpyxl".
+#@author Sebastien MATHIEU
+
+import sys, os, copy, time, json, math, shutil, tempfile, contextlib
+
+import networkMaker
+import scenariosReader
+import syntheticData
+import networkArrays
+import matpowerConverter
+import pyflowConverter
+import DGPConverter
+import dsimaConverter
+import timeseriesConverter
+import dotConverter
+import radialPowerFlow
+import powerFlowRunner
+import injectionStore
+
+## Default sizes of the networks in buses.
+SIZES=[100,1000,10000]
+## Default folder of the synthetic data sets.
+BENCHMARK_FOLDER="benchmark"
+## Default number of days of the year mode.
+SAMPLE_DAYS=7
+## Year of the benchmark.
+YEAR=2020
+## Scenario of the benchmark.
+SCENARIO='H'
+## Number of days of the year, as in the converters.
+YEAR_DAYS=scenariosReader.YEAR_DAYS
+
+## Entry point of the program.
+# @param argv Program parameters.
+def main(argv):
+	# Options
+	sampleDays=SAMPLE_DAYS
+	folderPath=BENCHMARK_FOLDER
+	jsonPath=None
+	options=[a for a in argv if a.startswith('--')]
+	argv=[a for a in argv if not a.startswith('--')]
+	for o in options:
+		if o.startswith('--days='):
+			sampleDays=int(o[len('--days='):])
+		elif o.startswith('--data='):
+			folderPath=o[len('--data='):]
+		elif o.startswith('--json='):
+			jsonPath=o[len('--json='):]
+		else:
+			displayHelp()
+			sys.exit(2)
+	sizes=[int(s) for s in argv[0].split(',')] if len(argv) > 0 else SIZES
+
+	results=runBenchmark(sizes,folderPath,sampleDays)
+	print(summary(results,sizes))
+	if jsonPath is not None:
+		with open(jsonPath,'w') as file:
+			json.dump({"sizes":sizes,"sampleDays":sampleDays,"results":results},file,indent=1)
+
+## Display help of the program.
+def displayHelp():
+	text="Usage :\n\tpython3 benchmark.py [size[,size...]] [--days=N] [--data=folder] [--json=file]\n"
+	text+="\nThe default sizes are %s buses, the data sets are generated in the folder \"%s\".\n"%(",".join(map(str,SIZES)),BENCHMARK_FOLDER)
+	text+="The year mode of the converters is run on N days (default %s) spread over the year and scaled to the year.\n"%SAMPLE_DAYS
+	text+="The power flow of the year is run with 1, 2, 4... worker processes up to the number of cores, %s here.\n"%(os.cpu_count() or 1)
+	print(text)
+
+## Get the folder of the synthetic data set of a size, generating it if needed.
+# @param folderPath Folder of the data sets.
+# @param size Number of buses.
+# @return Path of the data set.
+def dataSet(folderPath,size):
+	dataPath=os.path.join(folderPath,"synthetic%s"%size,"")
+	if not os.path.exists(dataPath+scenariosReader.LOAD_PROFILES_FILE):
+		print("Generating %s buses in \"%s\"" % (size,dataPath))
+		syntheticData.makeSyntheticData(dataPath,size)
+	return dataPath
+
+## Run the benchmark.
+# @param sizes List of network sizes in buses.
+# @param folderPath Folder of the data sets.
+# @param sampleDays Number of days of the year mode.
+# @return Dictionary with the name of the cases as keys and the dictionary of the times in seconds by size as values.
+def runBenchmark(sizes,folderPath=BENCHMARK_FOLDER,sampleDays=SAMPLE_DAYS):
+	results={}
+	days=[1+(YEAR_DAYS*k)//sampleDays for k in range(sampleDays)]
+	for size in sizes:
+		dataPath=dataSet(folderPath,size)
+		outputPath=tempfile.mkdtemp(prefix="ylpic-benchmark-")
+		try:
+			for name,seconds in runCases(dataPath,outputPath,days):
+				results.setdefault(name,{})[size]=seconds
+				print("\t%s buses, %-24s %10.3fs" % (size,name,seconds))
+		finally:
+			shutil.rmtree(outputPath)
+	return results
+
+## Run the cases on a data set.
+# @param dataPath Folder of the data set.
+# @param outputPath Folder of the outputs.
+# @param days Days of the year mode.
+# @return Generator of tuples with the name of the case and its time in seconds.
+def runCases(dataPath,outputPath,days):
+	# Readers
+	graph,seconds=timed(networkMaker.makeNetwork,dataPath)
+	yield "makeNetwork",seconds
+	dayGraph=copy.deepcopy(graph)
+	result,seconds=timed(scenariosReader.readScenarios,dataPath,YEAR,days[0],dayGraph,SCENARIO)
+	yield "readScenarios",seconds
+
+	# Day mode of the converters
+	slackBusId=networkArrays.ROOT_BUS
+	dayPath=os.path.join(outputPath,"day","")
+	os.makedirs(dayPath)
+	yield "matpower day",timed(writeMatpowerDay,dayPath,dayGraph,slackBusId,days[0])[1]
+	yield "pyflow day",timed(writePyflowDay,dayPath,dayGraph,slackBusId,days[0])[1]
+	yield "pyflow npy day",timed(writeNpyDay,dayPath,dayGraph,slackBusId,days[0])[1]
+	yield "DGP",timed(DGPConverter.makeDGPFile,dayPath+"caseYlpic.csv",graph)[1]
+	pricesData,seconds=timed(dsimaConverter.readPricesData,dataPath+"prices.xlsx")
+	yield "readPricesData",seconds
+	yield "dsima day",timed(writeDsimaDay,dayPath,dayGraph,pricesData,days[0])[1]
+	yield "radial power flow day",timed(radialPowerFlow.runRadialPowerFlow,dayGraph,slackBusId)[1]
+	yield "dot",timed(dotConverter.makeNetworkDot,dayGraph,dayPath)[1]
+
+	# Year mode of the converters on the sample of days, the reading of the network is not scaled
+	networkSeconds=timed(networkMaker.makeNetwork,dataPath)[1]
+	daysOption="--days=%s" % ",".join(map(str,days))
+	runs=[("matpower year",lambda path: runQuietly(matpowerConverter.main,[dataPath,str(slackBusId),str(YEAR),SCENARIO,path,daysOption,"--force"])),
+		("pyflow year",lambda path: runQuietly(pyflowConverter.main,[dataPath,str(slackBusId),str(YEAR),SCENARIO,path,daysOption])),
+		("pyflow npy year",lambda path: runQuietly(pyflowConverter.main,[dataPath,str(slackBusId),str(YEAR),SCENARIO,path,daysOption,"--npy"])),
+		("pyflow sink year",lambda path: runQuietly(pyflowConverter.main,[dataPath,str(slackBusId),str(YEAR),SCENARIO,path,daysOption,"--sink=%scases.zip" % path])),
+		("dsima year",lambda path: runQuietly(dsimaConverter.main,[dataPath,path,str(YEAR),SCENARIO,daysOption,"--force"])),
+		("timeseries year",lambda path: runQuietly(timeseriesConverter.makeTimeseriesXLS,path+"timeseries.xls",dataPath,YEAR,SCENARIO,96,days)),
+		("timeseries stream year",lambda path: runQuietly(timeseriesConverter.makeTimeseriesCSV,path+"timeseries.csv",dataPath,YEAR,SCENARIO,96,None,days))]
+	for name,run in runs:
+		yearPath=os.path.join(outputPath,name.replace(" ","-"),"")
+		os.makedirs(yearPath)
+		seconds=timed(run,yearPath)[1]
+		yield name,networkSeconds+max(seconds-networkSeconds,0)*YEAR_DAYS/len(days)
+		shutil.rmtree(yearPath)
+
+	# Scaling of the power flow of the year with the number of worker processes, a chunk of the sample by worker. The
+	# injection store is built before so that the first case does not include its build.
+	injectionStore.openStore(dataPath,YEAR,SCENARIO)
+	for workers in workerCounts():
+		yearPath=os.path.join(outputPath,"powerflow-%s"%workers,"")
+		chunkDays=-(-len(days)//workers)
+		seconds=timed(runQuietly,powerFlowRunner.runYear,dataPath,YEAR,SCENARIO,yearPath,slackBusId,workers,chunkDays,days,True)[1]
+		yield "power flow year %s workers"%workers,seconds*YEAR_DAYS/len(days)
+		shutil.rmtree(yearPath)
+
+## Get the numbers of worker processes of the power flow cases.
+# @return List of the powers of two below the number of cores and the number of cores.
+def workerCounts():
+	cores=os.cpu_count() or 1
+	return sorted(set([2**k for k in range(cores.bit_length()) if 2**k < cores]+[cores]))
+
+## Call a function and measure its time.
+# @param function Function.
+# @param args Arguments of the function.
+# @return Tuple with the result of the function and the time in seconds.
+def timed(function,*args):
+	tic=time.perf_counter()
+	result=function(*args)
+	return result,time.perf_counter()-tic
+
+## Run the main function or a writer of a converter without its output on the console.
+# @param function Function of the converter.
+# @param args Arguments of the function.
+# @return Result of the function.
+def runQuietly(function,*args):
+	with open(os.devnull,'w') as devnull, contextlib.redirect_stdout(devnull):
+		return function(*args)
+
+## Write the matpower files of every period of a day as in the year mode of matpowerConverter.
+# @param outputPath Output folder.
+# @param graph Graph with the daily scenario.
+# @param slackBusId Id of the slack bus.
+# @param day Day of the year.
+def writeMatpowerDay(outputPath,graph,slackBusId,day):
+	for period in range(1,97):
+		caseName='ylpic_y%ss%sd%sp%s' % (YEAR,SCENARIO,day,period)
+		matpowerConverter.makeMatpowerFile('%s%s.m' % (outputPath,caseName),graph,caseName,slackBusId,period-1)
+
+## Write the pyflow files of every period of a day as in the year mode of pyflowConverter.
+# @param outputPath Output folder.
+# @param graph Graph with the daily scenario.
+# @param slackBusId Id of the slack bus.
+# @param day Day of the year.
+def writePyflowDay(outputPath,graph,slackBusId,day):
+	for period in range(1,97):
+		caseName='ylpic_y%ss%sd%sp%s' % (YEAR,SCENARIO,day,period)
+		pyflowConverter.makePyflowFile('%s%s.py' % (outputPath,caseName),graph,caseName,slackBusId,period-1)
+
+## Write the binary pyflow files of a day as in the year mode of pyflowConverter with --npy.
+# @param outputPath Output folder.
+# @param graph Graph with the daily scenario.
+# @param slackBusId Id of the slack bus.
+# @param day Day of the year.
+def writeNpyDay(outputPath,graph,slackBusId,day):
+	topologyPath='%sylpic_y%ss%s_topology.npz' % (outputPath,YEAR,SCENARIO)
+	if not os.path.exists(topologyPath):
+		pyflowConverter.makePyflowTopology(topologyPath,graph,slackBusId)
+	pyflowConverter.makePyflowInjections('%sylpic_y%ss%sd%s_injections.npy' % (outputPath,YEAR,SCENARIO,day),graph)
+
+## Write the files of a day as in dsimaConverter.
+# @param outputPath Output folder.
+# @param graph Graph with the daily scenario.
+# @param pricesData Prices data.
+# @param day Day of the year.
+def writeDsimaDay(outputPath,graph,pricesData,day):
+	dayPath='%s%s' % (outputPath,day)
+	g=copy.deepcopy(graph)
+	dsimaConverter.addRootBus(g,networkArrays.ROOT_BUS)
+	if not os.path.exists(dayPath):
+		os.makedirs(dayPath)
+	dsimaConverter.makeNetworkCSV('%s/network.csv' % dayPath,g)
+	dsimaConverter.makeProducers('%s/producers' % dayPath,g)
+	dsimaConverter.makeRetailers('%s/retailers' % dayPath,g)
+	dsimaConverter.makeQualificationIndicators(dayPath,g)
+	dsimaConverter.makeTSO(dayPath)
+	dsimaConverter.makePrices('%s/prices.csv' % dayPath,pricesData,YEAR,day)
+
+## Make the summary table of the benchmark.
+# @param results Results of runBenchmark.
+# @param sizes List of network sizes in buses.
+# @return Text of the table.
+def summary(results,sizes):
+	text="%-24s"%"Case"+"".join("%12s"%("%s [s]"%s) for s in sizes)+"%10s\n"%"Scaling"
+	for name,times in results.items():
+		text+="%-24s"%name+"".join("%12.3f"%times[s] if s in times else "%12s"%"" for s in sizes)
+		text+="%10s\n"%("%.2f"%scalingExponent(times) if len(times) > 1 else "")
+	return text
+
+## Compute the scaling exponent from the times of the two largest sizes.
+# @param times Dictionary of the times in seconds by size.
+# @return Slope of the time in a log-log scale.
+def scalingExponent(times):
+	(n1,t1),(n2,t2)=sorted(times.items())[-2:]
+	if t1 <= 0 or t2 <= 0 or n1 == n2:
+		return float('nan')
+	return math.log(t2/t1)/math.log(n2/float(n1))
+
+# Starting point from python #
+if __name__ == "__main__":
+	main(sys.argv[1:])
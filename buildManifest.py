@@ -0,0 +1,92 @@
+## Manifest of the generated files with the hashes of the inputs and parameters they came from.
+# The manifest allows the converters to regenerate only the outputs whose dependencies changed since the last run.
+#@author Sebastien MATHIEU
+
+import os, json, hashlib
+
+## Name of the manifest file in the output folder.
+MANIFEST_FILE="manifest.json"
+## Size of the blocks read when hashing a file.
+HASH_BLOCK_SIZE=1<<20
+
+# Cache of the file hashes with their path as a key and (size, modification time, hash) as value.
+fileHashes={}
+
+## Compute the hash of the content of a file.
+# The hash is cached as long as the size and modification time of the file do not change.
+# @param filePath Path to the file.
+# @return Hexadecimal SHA-1 of the file content or None if the file does not exist.
+def hashFile(filePath):
+	try:
+		stat=os.stat(filePath)
+	except OSError:
+		return None
+
+	cached=fileHashes.get(filePath)
+	if cached is not None and cached[0] == stat.st_size and cached[1] == stat.st_mtime:
+		return cached[2]
+
+	h=hashlib.sha1()
+	with open(filePath,'rb') as file:
+		block=file.read(HASH_BLOCK_SIZE)
+		while block:
+			h.update(block)
+			block=file.read(HASH_BLOCK_SIZE)
+	digest=h.hexdigest()
+	fileHashes[filePath]=(stat.st_size,stat.st_mtime,digest)
+	return digest
+
+## Compute the hash of a set of parameters.
+# @param parameters Dictionary of parameters, values are converted to strings if they cannot be serialized in JSON.
+# @return Hexadecimal SHA-1 of the parameters.
+def hashParameters(parameters):
+	return hashlib.sha1(json.dumps(parameters,sort_keys=True,default=str).encode('utf-8')).hexdigest()
+
+## Manifest of the output files of a converter.
+class Manifest:
+	## Constructor, loads the manifest if it exists.
+	# @param filePath Path to the manifest file.
+	# @param force If true, every output is considered as outdated.
+	def __init__(self,filePath,force=False):
+		self.filePath=filePath
+		self.force=force
+		self.entries={}
+		if os.path.exists(filePath):
+			with open(filePath,'r') as file:
+				self.entries=json.load(file)
+
+	## Compute the dependencies of an output.
+	# @param inputFiles List of paths of the input files.
+	# @param parameters Dictionary of the parameters.
+	# @return Dependencies as a dictionary to compare with the recorded ones.
+	def dependencies(self,inputFiles,parameters):
+		return {"inputs":dict((os.path.normpath(f),hashFile(f)) for f in inputFiles),"parameters":hashParameters(parameters)}
+
+	## Check if an output is up to date.
+	# @param outputPath Path to the output file or folder.
+	# @param dependencies Current dependencies of the output.
+	# @return True if the output exists and was generated from the same dependencies.
+	def isUpToDate(self,outputPath,dependencies):
+		if self.force or not os.path.exists(outputPath):
+			return False
+		return self.entries.get(os.path.normpath(outputPath)) == dependencies
+
+	## Record the dependencies of a generated output.
+	# @param outputPath Path to the output file or folder.
+	# @param dependencies Dependencies of the output.
+	def record(self,outputPath,dependencies):
+		self.entries[os.path.normpath(outputPath)]=dependencies
+
+	## Save the manifest.
+	def save(self):
+		tmpPath=self.filePath+".tmp"
+		with open(tmpPath,'w') as file:
+			json.dump(self.entries,file,sort_keys=True,indent=1)
+		os.replace(tmpPath,self.filePath)
+
+	## @var filePath
+	# Path to the manifest file.
+	## @var force
+	# If true, every output is considered as outdated.
+	## @var entries
+	# Dependencies of each output with the normalized output path as a key.
@@ -0,0 +1,51 @@
+## Location of the files derived from a data folder, such as the injection stores and the cached stages.
+# The derived files are written outside the data folder, which may be read-only or shared, in a folder by data folder
+# under the cache root. The cache root is given by the option --cache-folder of the programs, else by the environment
+# variable CACHE_VARIABLE, else it is the folder "ylpic" of the user cache folder. The derived files can be deleted at
+# any time, they are rebuilt when needed.
+#@author Sebastien MATHIEU
+
+import os, hashlib
+
+## Environment variable with the cache root.
+CACHE_VARIABLE="YLPIC_CACHE"
+## Option of the programs with the cache root.
+CACHE_OPTION="--cache-folder="
+
+# Cache root given by the option of the program, None to use the environment variable or the default folder.
+optionRoot=None
+
+## Get the cache root.
+# @return Path of the folder with the derived files of every data folder.
+def cacheRoot():
+	if optionRoot is not None:
+		return optionRoot
+	root=os.environ.get(CACHE_VARIABLE)
+	if root:
+		return root
+	if os.name == 'nt':
+		userCache=os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+	else:
+		userCache=os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'),'.cache')
+	return os.path.join(userCache,'ylpic')
+
+## Get the folder of derived files of a data folder.
+# The folder of a data folder is named by its base name and the hash of its absolute path so that two data folders
+# with the same name do not share their derived files.
+# @param folderPath Folder with the excel files.
+# @param name Name of the kind of derived files, e.g. "stores".
+# @return Path of the folder, which may not exist yet.
+def cacheFolder(folderPath,name):
+	path=os.path.abspath(folderPath)
+	digest=hashlib.sha1(path.encode('utf-8')).hexdigest()[:12]
+	return os.path.join(cacheRoot(),"%s-%s" % (os.path.basename(path) or "data",digest),name)
+
+## Set the cache root from the option --cache-folder of the parameters of a program.
+# @param argv Program parameters.
+# @return Program parameters without the option.
+def cacheFolderOption(argv):
+	global optionRoot
+	for a in argv:
+		if a.startswith(CACHE_OPTION):
+			optionRoot=a[len(CACHE_OPTION):]
+	return [a for a in argv if not a.startswith(CACHE_OPTION)]
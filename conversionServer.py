@@ -0,0 +1,381 @@
+## Resident server converting the cases from the network, calendar, load profiles, scenarios and prices kept in memory.
+# The workbooks are read once at start, then the requests are served from memory by a threaded HTTP server on localhost
+# instead of reloading every workbook at each call of a converter. The graphs of the last requested days are cached.
+# Each response has the header X-Latency-Ms with its processing time and "/stats" returns the latency statistics of each
+# endpoint with the statistics of the instrumented stages. The endpoints, with their parameters in the query string, are:
+# - /convert?format=matpower&year=2020&day=1&scenario=H&period=1&slack=8001 returns the case as text. The format is
+#   matpower, pyflow or dgp, the dgp case only depends on the network.
+# - /injections?year=2020&scenario=H&buses=8001,8002&start=1&end=2 returns the injections in kW and kVAr of the buses
+#   from the first to the last day as JSON, see injectionStore.
+# - /prices?day=1 returns the prices of a day as JSON.
+# - /network returns the number of buses and branches.
+# - /stats returns the latency statistics.
+#@author Sebastien MATHIEU
+
+import sys, os, time, json, copy, threading, collections
+import http.server, urllib.parse
+
+import networkMaker
+import scenariosReader
+import matpowerConverter
+import pyflowConverter
+import DGPConverter
+import dsimaConverter
+import outputSinks
+import instrumentation
+import cacheFolders
+import lazyImport
+injectionStore=lazyImport.lazyModule('injectionStore')
+
+## Host of the server, only local connections are accepted.
+HOST="127.0.0.1"
+## Default port of the server.
+PORT=8765
+## Default number of day graphs kept in memory.
+DAY_CACHE=32
+## Number of the last requests of an endpoint used for the latency percentiles.
+LATENCY_WINDOW=1000
+## File with the prices.
+PRICES_FILE="prices.xlsx"
+
+## Entry point of the program.
+# @param argv Program parameters.
+def main(argv):
+	# Options
+	port=PORT
+	cacheSize=DAY_CACHE
+	argv=cacheFolders.cacheFolderOption(argv)
+	options=[a for a in argv if a.startswith('--')]
+	argv=[a for a in argv if not a.startswith('--')]
+	for o in options:
+		if o.startswith('--port='):
+			port=int(o[len('--port='):])
+		elif o.startswith('--cache='):
+			cacheSize=int(o[len('--cache='):])
+		else:
+			displayHelp()
+			sys.exit(2)
+
+	if len(argv) != 1:
+		displayHelp()
+		sys.exit(2)
+	folderPath=argv[0] if argv[0].endswith(("/","\\")) else argv[0]+"/"
+	if not os.path.exists(folderPath):
+		raise Exception('Folder \"%s\" does not exists.' % folderPath)
+
+	tic=time.time()
+	state=ServerState(folderPath,cacheSize)
+	server=makeServer(state,port)
+	print("Data loaded in %.2fs, serving on http://%s:%s" % (time.time()-tic,HOST,port))
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		server.server_close()
+
+## Display help of the program.
+def displayHelp():
+	text="Usage :\n\tpython3 conversionServer.py dataFolder [--port=%s] [--cache=days] [--cache-folder=folder]\n" % PORT
+	text+="\nServe the conversions of the data folder from memory on http://%s:port with the endpoints\n" % HOST
+	text+="\t/convert?format=matpower|pyflow|dgp&year=2020&day=1&scenario=H&period=1&slack=8001\n"
+	text+="\t/injections?year=2020&scenario=H&buses=8001,8002&start=1&end=2\n"
+	text+="\t/prices?day=1\n\t/network\n\t/stats\n"
+	text+="The graphs of the last requested days are kept in memory, %s by default.\n" % DAY_CACHE
+	print(text)
+
+## Make the server.
+# @param state ServerState with the data.
+# @param port Port of the server, any free port if 0.
+# @return ThreadingHTTPServer, to be started with serve_forever.
+def makeServer(state,port=PORT):
+	server=http.server.ThreadingHTTPServer((HOST,port),RequestHandler)
+	server.daemon_threads=True
+	server.state=state
+	return server
+
+## Get a parameter of a request.
+# @param parameters Dictionary of the parameters.
+# @param name Name of the parameter.
+# @param cast Function converting the parameter.
+# @param default Default value, the parameter is required if None.
+# @return Value of the parameter.
+def parameter(parameters,name,cast=str,default=None):
+	if name not in parameters:
+		if default is None:
+			raise Exception('Missing parameter "%s".' % name)
+		return default
+	return cast(parameters[name])
+
+## Data of the server and the handling of the requests.
+# Every sheet of the workbooks buffered in networkMaker is loaded at start so that the readers run concurrently. The
+# caches of graphs are updated under a lock while each graph and each store is built under its own lock, so that building
+# the graph of a day or the store of a year does not block the other requests. The converters only read the graphs and
+# run concurrently.
+class ServerState:
+	## Constructor, read the network, the workbooks of the scenarios and the prices.
+	# @param folderPath Folder with the excel files.
+	# @param cacheSize Number of day graphs kept in memory.
+	def __init__(self,folderPath,cacheSize=DAY_CACHE):
+		self.folderPath=folderPath
+		self.cacheSize=cacheSize
+		self.lock=threading.Lock()
+		self.statsLock=threading.Lock()
+		self.storeLocks={}
+		self.graphLocks={}
+		self.graph=networkMaker.makeNetwork(folderPath)
+		self.scenarioGraphs={}
+		self.dayGraphs=collections.OrderedDict()
+		self.latencies={}
+
+		# The workbooks stay buffered by scenariosReader once read with the first year of the data
+		years=scenariosReader.scenarioYears(folderPath)
+		if len(years) == 0:
+			raise Exception('No year with a scenario and a calendar in the folder "%s".' % folderPath)
+		year,scenario=years[0]
+		scenariosReader.readScenarios(folderPath,year,1,copy.deepcopy(self.graph),scenario)
+		scenariosReader.loadBuffers()
+		pricesPath=folderPath+PRICES_FILE
+		self.pricesData=dsimaConverter.readPricesData(pricesPath) if os.path.exists(pricesPath) else None
+
+		self.endpoints={"/convert":self.convert,"/injections":self.injections,"/prices":self.prices,"/network":self.network,"/stats":self.stats}
+
+	## Get the lock of the build of a graph, created under the lock of the caches.
+	# @param key Key of the graph in its cache.
+	# @return Lock.
+	def graphLock(self,key):
+		with self.lock:
+			return self.graphLocks.setdefault(key,threading.Lock())
+
+	## Get the graph with the loads of a year and scenario, without the load profiles.
+	# @param year Year of the scenarios.
+	# @param scenario Type of scenario.
+	# @return Network graph with the loads, which must not be modified.
+	def scenarioGraph(self,year,scenario):
+		key=(year,scenario)
+		with self.lock:
+			if key in self.scenarioGraphs:
+				return self.scenarioGraphs[key]
+		with self.graphLock(key):
+			# Built by another request while waiting for the lock
+			with self.lock:
+				if key in self.scenarioGraphs:
+					return self.scenarioGraphs[key]
+			g=copy.deepcopy(self.graph)
+			scenariosReader.readScenariosExcel(self.folderPath+scenariosReader.SCENARIOS_FILE,year,g,scenario)
+			with self.lock:
+				self.scenarioGraphs[key]=g
+			return g
+
+	## Get the graph of a day, from the cache if it was recently requested.
+	# @param year Year of the scenarios.
+	# @param day Day of the year.
+	# @param scenario Type of scenario.
+	# @return Network graph with the daily scenario, which must not be modified.
+	def dayGraph(self,year,day,scenario):
+		key=(year,day,scenario)
+		with self.lock:
+			if key in self.dayGraphs:
+				self.dayGraphs.move_to_end(key)
+				return self.dayGraphs[key]
+		# Only the requests of the same day wait for the build
+		with self.graphLock(key):
+			with self.lock:
+				if key in self.dayGraphs:
+					self.dayGraphs.move_to_end(key)
+					return self.dayGraphs[key]
+			g=copy.deepcopy(self.scenarioGraph(year,scenario))
+			profilesType=scenariosReader.readCalendarExcel(self.folderPath+scenariosReader.CALENDAR_FILE,year,day)
+			baseActiveProfiles,baseReactiveProfiles=scenariosReader.readBaseProfilesExcel(self.folderPath+scenariosReader.LOAD_PROFILES_FILE,day,profilesType)
+			scenariosReader.setLoadProfiles(g,baseActiveProfiles,baseReactiveProfiles)
+			with self.lock:
+				self.dayGraphs[key]=g
+				while len(self.dayGraphs) > self.cacheSize:
+					self.dayGraphs.popitem(last=False)
+			return g
+
+	## Handle a request.
+	# @param path Path of the request.
+	# @param parameters Dictionary of the parameters.
+	# @return Tuple with the HTTP status, the content type and the bytes of the response.
+	def handle(self,path,parameters):
+		if path not in self.endpoints:
+			return 404,"application/json",json.dumps({"error":'Unknown endpoint "%s".' % path}).encode('utf-8')
+		try:
+			contentType,content=self.endpoints[path](parameters)
+			return 200,contentType,content
+		except Exception as e:
+			return 400,"application/json",json.dumps({"error":str(e)}).encode('utf-8')
+
+	## Convert a case.
+	# @param parameters Dictionary with the format, year, day, scenario, period and slack bus id.
+	# @return Tuple with the content type and the bytes of the case.
+	def convert(self,parameters):
+		outputFormat=parameter(parameters,"format")
+		sink=outputSinks.MemorySink()
+		if outputFormat == "dgp":
+			DGPConverter.makeDGPFile("case.csv",self.graph,sink=sink)
+		elif outputFormat in ("matpower","pyflow"):
+			year=parameter(parameters,"year",int)
+			day=parameter(parameters,"day",int)
+			scenario=parameter(parameters,"scenario")
+			period=parameter(parameters,"period",int)
+			slackBusId=parameter(parameters,"slack",int)
+			if not 0<period<=96:
+				raise Exception('Invalid period %s' % period)
+			g=self.dayGraph(year,day,scenario)
+			caseName='ylpic_y%ss%sd%sp%s' % (year,scenario,day,period)
+			if outputFormat == "matpower":
+				matpowerConverter.makeMatpowerFile("case.m",g,caseName,slackBusId,period-1,sink=sink)
+			else:
+				pyflowConverter.makePyflowFile("case.py",g,caseName,slackBusId,period-1,sink=sink)
+		else:
+			raise Exception('Unknown format "%s", expected matpower, pyflow or dgp.' % outputFormat)
+		return "text/plain; charset=utf-8",list(sink.cases.values())[0]
+
+	## Query the injections of buses.
+	# @param parameters Dictionary with the year, scenario, comma separated bus ids, first and optional last day.
+	# @return Tuple with the content type and the JSON bytes of the active and reactive injections.
+	def injections(self,parameters):
+		year=parameter(parameters,"year",int)
+		scenario=parameter(parameters,"scenario")
+		buses=[int(b) for b in parameter(parameters,"buses").split(",")]
+		start=parameter(parameters,"start",int)
+		end=parameter(parameters,"end",int,start)
+		with self.lock:
+			storeLock=self.storeLocks.setdefault((year,scenario),threading.Lock())
+		with storeLock:
+			store=injectionStore.openStore(self.folderPath,year,scenario)
+		active,reactive=store.query(buses,start,end)
+		return "application/json",json.dumps({"buses":buses,"active":active.tolist(),"reactive":reactive.tolist()}).encode('utf-8')
+
+	## Get the prices of a day.
+	# @param parameters Dictionary with the day.
+	# @return Tuple with the content type and the JSON bytes of the prices.
+	def prices(self,parameters):
+		if self.pricesData is None:
+			raise Exception('No prices file "%s".' % (self.folderPath+PRICES_FILE))
+		day=parameter(parameters,"day",int)
+		if day not in self.pricesData:
+			raise Exception('No prices for day %s.' % day)
+		return "application/json",json.dumps(self.pricesData[day]).encode('utf-8')
+
+	## Get the size of the network.
+	# @param parameters Dictionary of the parameters, unused.
+	# @return Tuple with the content type and the JSON bytes of the number of buses and branches.
+	def network(self,parameters):
+		return "application/json",json.dumps({"buses":self.graph.number_of_nodes(),"branches":self.graph.number_of_edges()}).encode('utf-8')
+
+	## Get the latency statistics.
+	# @param parameters Dictionary of the parameters, unused.
+	# @return Tuple with the content type and the JSON bytes of the statistics by endpoint and by stage.
+	def stats(self,parameters):
+		with self.statsLock:
+			requests=dict((path,l.toDict()) for path,l in self.latencies.items())
+		return "application/json",json.dumps({"requests":requests,"dayGraphs":len(self.dayGraphs),
+											"stages":instrumentation.trace()["stages"]},indent=1).encode('utf-8')
+
+	## Record the latency of a request.
+	# @param path Path of the request.
+	# @param seconds Processing time in seconds.
+	# @param error True if the request failed.
+	def recordLatency(self,path,seconds,error=False):
+		with self.statsLock:
+			if path not in self.latencies:
+				self.latencies[path]=LatencyStats()
+			self.latencies[path].add(seconds,error)
+
+	## @var folderPath
+	# Folder with the excel files.
+	## @var cacheSize
+	# Number of day graphs kept in memory.
+	## @var lock
+	# Lock of the caches of graphs and of the locks of the graphs and stores.
+	## @var storeLocks
+	# Lock of the build of each store with the year and scenario as a key.
+	## @var graphLocks
+	# Lock of the build of each graph with the key of the graph in scenarioGraphs or dayGraphs.
+	## @var statsLock
+	# Lock of the latency statistics.
+	## @var graph
+	# Network graph without loads.
+	## @var scenarioGraphs
+	# Graphs with the loads by year and scenario.
+	## @var dayGraphs
+	# Graphs of the last requested days by year, day and scenario, least recently used first.
+	## @var latencies
+	# LatencyStats by path.
+	## @var endpoints
+	# Functions handling the requests by path.
+	## @var pricesData
+	# Prices by day, see dsimaConverter.readPricesData, None without prices file.
+
+## Latency statistics of an endpoint.
+class LatencyStats:
+	## Constructor.
+	def __init__(self):
+		self.count=0
+		self.errors=0
+		self.seconds=0.0
+		self.maximum=0.0
+		self.recent=collections.deque(maxlen=LATENCY_WINDOW)
+
+	## Add a request.
+	# @param seconds Processing time in seconds.
+	# @param error True if the request failed.
+	def add(self,seconds,error=False):
+		self.count+=1
+		self.errors+=int(error)
+		self.seconds+=seconds
+		self.maximum=max(self.maximum,seconds)
+		self.recent.append(seconds)
+
+	## Get the statistics as a dictionary.
+	# @return Dictionary of the statistics, the latencies in milliseconds.
+	def toDict(self):
+		recent=sorted(self.recent)
+		percentile=lambda p: 1000*recent[min(len(recent)-1,int(p*len(recent)))] if len(recent) > 0 else 0.0
+		return {"count":self.count,"errors":self.errors,"meanMs":1000*self.seconds/max(self.count,1),
+				"p50Ms":percentile(0.5),"p95Ms":percentile(0.95),"p99Ms":percentile(0.99),"maxMs":1000*self.maximum}
+
+	## @var count
+	# Number of requests.
+	## @var errors
+	# Number of failed requests.
+	## @var seconds
+	# Total processing time in seconds.
+	## @var maximum
+	# Largest processing time in seconds.
+	## @var recent
+	# Processing times of the last LATENCY_WINDOW requests, for the percentiles.
+
+## Handler of the HTTP requests, calling the ServerState of the server.
+class RequestHandler(http.server.BaseHTTPRequestHandler):
+	## Handle a GET request.
+	def do_GET(self):
+		tic=time.perf_counter()
+		url=urllib.parse.urlparse(self.path)
+		parameters=dict((k,v[-1]) for k,v in urllib.parse.parse_qs(url.query).items())
+		status,contentType,content=self.server.state.handle(url.path,parameters)
+		self.latency=time.perf_counter()-tic
+		self.server.state.recordLatency(url.path,self.latency,status != 200)
+
+		self.send_response(status)
+		self.send_header("Content-Type",contentType)
+		self.send_header("Content-Length",str(len(content)))
+		self.send_header("X-Latency-Ms","%.3f" % (1000*self.latency))
+		self.end_headers()
+		self.wfile.write(content)
+
+	## Log a request with its latency.
+	# @param code HTTP status.
+	# @param size Size of the response.
+	def log_request(self,code='-',size='-'):
+		self.log_message('"%s" %s %.2fms',self.requestline,str(code),1000*getattr(self,'latency',0.0))
+
+	## @var latency
+	# Processing time of the last request in seconds.
+
+# Starting point from python #
+if __name__ == "__main__":
+	main(sys.argv[1:])
@@ -0,0 +1,241 @@
+## Shared-memory data plane publishing NumPy arrays once to the worker processes of a pool.
+# The parent process publishes the arrays in shared memory blocks, or in memory-mapped files if shared memory is not
+# available, and passes a small PlaneDescriptor to the workers. The workers attach to the blocks without copying nor
+# unpickling the arrays, which are read-only views on the shared memory. The blocks are reference counted: the parent
+# holds a reference until release, each attachment of a process holds one until detach, and the blocks are removed when
+# the last reference of the parent is released.
+# Requires numpy which can be installed with "pip3 install numpy".
+#@author Sebastien MATHIEU
+
+import os, shutil, tempfile, uuid
+
+try:
+	from multiprocessing import shared_memory
+except ImportError: # Python < 3.8, memory-mapped files are used instead
+	shared_memory = None
+
+import numpy
+
+import networkArrays
+import injectionStore
+
+## Backend with shared memory blocks.
+SHARED_MEMORY="shm"
+## Backend with memory-mapped files.
+MEMORY_MAP="mmap"
+
+# Attached planes of the process with their id as key and [PlaneView, number of attachments] as value.
+attachedPlanes={}
+
+## Attach to a plane published by another process, or by the same one.
+# The attachments of a process are counted, the blocks are closed at the last detach.
+# @param descriptor PlaneDescriptor of the plane.
+# @return PlaneView.
+def attach(descriptor):
+	if descriptor.id in attachedPlanes:
+		attachedPlanes[descriptor.id][1]+=1
+	else:
+		attachedPlanes[descriptor.id]=[PlaneView(descriptor),1]
+	return attachedPlanes[descriptor.id][0]
+
+## Publish the array model of a network.
+# @param plane DataPlane.
+# @param arrays NetworkArrays.
+# @param prefix Prefix of the names of the arrays in the plane.
+def publishNetworkArrays(plane,arrays,prefix="network"):
+	plane.publishValue(prefix+".baseMVA",arrays.baseMVA)
+	plane.publish(prefix+".buses",numpy.array(arrays.buses,dtype=numpy.int64))
+	plane.publish(prefix+".branches",numpy.array(arrays.branches,dtype=numpy.int64).reshape((len(arrays.branches),3)))
+	for name in ["baseKV","fromBus","toBus","r","x","b","pMax","closed"]:
+		plane.publish("%s.%s"%(prefix,name),getattr(arrays,name))
+
+## Get the array model of a network from a plane, its arrays are views on the plane.
+# @param view PlaneView.
+# @param prefix Prefix of the names of the arrays in the plane.
+# @return NetworkArrays.
+def attachNetworkArrays(view,prefix="network"):
+	arrays=networkArrays.NetworkArrays.__new__(networkArrays.NetworkArrays)
+	arrays.baseMVA=view[prefix+".baseMVA"]
+	arrays.buses=[int(b) for b in view[prefix+".buses"]]
+	arrays.busIndex=dict((n,i) for i,n in enumerate(arrays.buses))
+	arrays.branches=[(int(u),int(v),int(key)) for u,v,key in view[prefix+".branches"]]
+	arrays.branchIndex=dict((b,i) for i,b in enumerate(arrays.branches))
+	arrays.branchIndex.update(((v,u,key),i) for i,(u,v,key) in enumerate(arrays.branches))
+	for name in ["baseKV","fromBus","toBus","r","x","b","pMax","closed"]:
+		setattr(arrays,name,view["%s.%s"%(prefix,name)])
+	return arrays
+
+## Publish an injection store, the coefficients and base profiles of a year.
+# @param plane DataPlane.
+# @param store InjectionStore.
+# @param prefix Prefix of the names of the arrays in the plane.
+def publishInjectionStore(plane,store,prefix="injections"):
+	plane.publishValue(prefix+".year",store.year)
+	plane.publishValue(prefix+".scenario",store.scenario)
+	plane.publishValue(prefix+".profileTypes",store.profileTypes)
+	for name in ["buses","coefficients","activeBase","reactiveBase"]:
+		plane.publish("%s.%s"%(prefix,name),getattr(store,name))
+
+## Get an injection store from a plane, its arrays are views on the plane.
+# @param view PlaneView.
+# @param prefix Prefix of the names of the arrays in the plane.
+# @return InjectionStore.
+def attachInjectionStore(view,prefix="injections"):
+	return injectionStore.InjectionStore(view[prefix+".year"],view[prefix+".scenario"],view[prefix+".buses"],view[prefix+".profileTypes"],
+										view[prefix+".coefficients"],view[prefix+".activeBase"],view[prefix+".reactiveBase"])
+
+## Description of a published plane, small enough to be passed to every worker.
+class PlaneDescriptor:
+	## Constructor.
+	# @param id Id of the plane.
+	# @param backend SHARED_MEMORY or MEMORY_MAP.
+	def __init__(self,id,backend):
+		self.id=id
+		self.backend=backend
+		self.entries={}
+		self.values={}
+
+	## @var id
+	# Id of the plane.
+	## @var backend
+	# SHARED_MEMORY or MEMORY_MAP.
+	## @var entries
+	# Location, shape and type of each array by name, the location is the name of a block or the path of a file.
+	## @var values
+	# Small Python values by name, copied to the workers.
+
+## Data plane of the parent process, owner of the blocks.
+class DataPlane:
+	## Constructor.
+	# @param backend SHARED_MEMORY or MEMORY_MAP. If None, shared memory if available.
+	def __init__(self,backend=None):
+		if backend is None:
+			backend=SHARED_MEMORY if shared_memory is not None else MEMORY_MAP
+		if backend == SHARED_MEMORY and shared_memory is None:
+			raise Exception('Shared memory requires Python 3.8 or later, use the backend "%s".' % MEMORY_MAP)
+		self.descriptor=PlaneDescriptor(uuid.uuid4().hex[:12],backend)
+		self.folder=tempfile.mkdtemp(prefix="ylpic-plane-") if backend == MEMORY_MAP else None
+		self.blocks=[]
+		self.arrays={}
+		self.references=1
+
+	## Publish an array, copied once in the plane.
+	# @param name Name of the array.
+	# @param array NumPy array.
+	# @return Read-only view of the published array.
+	def publish(self,name,array):
+		if self.references <= 0:
+			raise Exception('The plane %s is released.' % self.descriptor.id)
+		array=numpy.ascontiguousarray(array)
+		if self.descriptor.backend == SHARED_MEMORY:
+			location="ylpic_%s_%s" % (self.descriptor.id,len(self.blocks))
+			block=shared_memory.SharedMemory(name=location,create=True,size=max(array.nbytes,1))
+			self.blocks.append(block)
+			shared=numpy.ndarray(array.shape,dtype=array.dtype,buffer=block.buf)
+		else:
+			location=os.path.join(self.folder,"%s.npy" % len(self.blocks))
+			shared=numpy.lib.format.open_memmap(location,mode='w+',dtype=array.dtype,shape=array.shape)
+			self.blocks.append(location)
+		shared[...]=array
+		shared.flags.writeable=False
+		self.descriptor.entries[name]=(location,array.shape,array.dtype.str)
+		self.arrays[name]=shared
+		return shared
+
+	## Publish a small Python value, copied to every worker with the descriptor.
+	# @param name Name of the value.
+	# @param value Value which can be pickled.
+	def publishValue(self,name,value):
+		self.descriptor.values[name]=value
+
+	## Add a reference to the plane.
+	# @return The plane.
+	def acquire(self):
+		self.references+=1
+		return self
+
+	## Remove a reference to the plane, the blocks are removed with the last one.
+	# The arrays of the plane must not be used once removed.
+	def release(self):
+		self.references-=1
+		if self.references > 0:
+			return
+		self.arrays.clear()
+		for block in self.blocks:
+			if self.descriptor.backend == SHARED_MEMORY:
+				try:
+					block.close()
+				except BufferError: # Views still used, the memory is freed with them
+					pass
+				block.unlink()
+		if self.folder is not None:
+			shutil.rmtree(self.folder,ignore_errors=True)
+		self.blocks=[]
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self,*args):
+		self.release()
+
+	## @var descriptor
+	# PlaneDescriptor to pass to the workers.
+	## @var folder
+	# Folder of the memory-mapped files, None with shared memory.
+	## @var blocks
+	# Shared memory blocks or paths of the memory-mapped files.
+	## @var arrays
+	# Read-only views of the published arrays by name.
+	## @var references
+	# Number of references to the plane, the blocks are removed when it reaches 0.
+
+## View of a plane attached by a process, see attach.
+class PlaneView:
+	## Constructor, attach to the blocks of the plane.
+	# @param descriptor PlaneDescriptor of the plane.
+	def __init__(self,descriptor):
+		self.descriptor=descriptor
+		self.blocks=[]
+		self.arrays={}
+		for name,(location,shape,dtype) in descriptor.entries.items():
+			if descriptor.backend == SHARED_MEMORY:
+				block=shared_memory.SharedMemory(name=location)
+				self.blocks.append(block)
+				array=numpy.ndarray(shape,dtype=numpy.dtype(dtype),buffer=block.buf)
+			else:
+				array=numpy.load(location,mmap_mode='r')
+			array.flags.writeable=False
+			self.arrays[name]=array
+
+	## Get an array or a value of the plane.
+	# @param name Name of the array or value.
+	# @return Read-only array or value.
+	def __getitem__(self,name):
+		if name in self.arrays:
+			return self.arrays[name]
+		return self.descriptor.values[name]
+
+	## Detach from the plane, the blocks are closed at the last detach of the process.
+	# The arrays of the view must not be used once closed.
+	def detach(self):
+		entry=attachedPlanes.get(self.descriptor.id)
+		if entry is None:
+			return
+		entry[1]-=1
+		if entry[1] > 0:
+			return
+		del attachedPlanes[self.descriptor.id]
+		self.arrays.clear()
+		for block in self.blocks:
+			try:
+				block.close()
+			except BufferError: # Views still used, the memory is unmapped with them
+				pass
+		self.blocks=[]
+
+	## @var descriptor
+	# PlaneDescriptor of the plane.
+	## @var blocks
+	# Attached shared memory blocks.
+	## @var arrays
+	# Read-only views of the arrays by name.
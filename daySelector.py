@@ -0,0 +1,193 @@
+## Selection of representative days of a year with their weights.
+# The days are described by their profiles of total injection of the network, of PV and wind production and of energy
+# price, averaged by hour. Each profile is scaled so that it has the same weight in the distance between two days. The
+# days are clustered by k-medoids and each medoid represents the days of its cluster, its weight being their number.
+# The converters accept the selected days with the option --days=file, see parseDays.
+# Requires numpy which can be installed with "pip3 install numpy".
+#@author Sebastien MATHIEU
+
+import sys, os
+
+import cacheFolders
+import lazyImport
+numpy=lazyImport.lazyModule('numpy')
+injectionStore=lazyImport.lazyModule('injectionStore')
+dsimaConverter=lazyImport.lazyModule('dsimaConverter')
+
+## Number of periods of a day.
+T=96
+## Number of periods averaged in a feature.
+FEATURE_PERIODS=4
+## Types of base profiles used as features.
+FEATURE_PROFILES=['PV','Wind']
+## Default number of restarts of the k-medoids.
+RESTARTS=10
+## Maximum number of iterations of the k-medoids.
+MAX_ITERATIONS=100
+## File with the prices in the data folder.
+PRICES_FILE="prices.xlsx"
+
+## Entry point of the program.
+# @param argv Program parameters.
+def main(argv):
+	argv=cacheFolders.cacheFolderOption(argv)
+	if len(argv) < 4:
+		displayHelp()
+		sys.exit(2)
+	folderPath=argv[0] if argv[0].endswith(("/","\\")) else argv[0]+"/"
+	if not os.path.exists(folderPath):
+		raise Exception('Folder \"%s\" does not exists.' % folderPath)
+	year=int(argv[1])
+	scenario=argv[2]
+	k=int(argv[3])
+
+	selection=representativeDays(folderPath,year,scenario,k)
+	if len(argv) > 4:
+		writeSelection(argv[4],selection)
+	else:
+		for d,w in selection:
+			print("%s,%s" % (d,w))
+
+## Display help of the program.
+def displayHelp():
+	text="Usage :\n\tpython3 daySelector.py dataFolder year scenario numberOfDays [outputFile] [--cache-folder=folder]\n"
+	text+="\nSelect representative days with k-medoids on the hourly profiles of total injection, PV, wind and energy price.\n"
+	text+="The days and their weights, the number of days they represent, are written as \"day,weight\" lines and can be\n"
+	text+="given to the converters with --days=outputFile.\n"
+	print(text)
+
+## Select representative days of a year.
+# @param folderPath Folder with the excel files.
+# @param year Year of the scenarios.
+# @param scenario Type of scenario.
+# @param k Number of representative days.
+# @param seed Seed of the random initialization.
+# @return List of tuples with the day of the year and its weight, by increasing day.
+def representativeDays(folderPath,year,scenario,k,seed=0):
+	days,features=dayFeatures(folderPath,year,scenario)
+	medoids,labels=kMedoids(features,k,seed=seed)
+	weights=numpy.bincount(labels,minlength=len(medoids))
+	return sorted((int(days[m]),int(w)) for m,w in zip(medoids,weights))
+
+## Compute the features of the days of a year.
+# @param folderPath Folder with the excel files.
+# @param year Year of the scenarios.
+# @param scenario Type of scenario.
+# @return Tuple with the array of the days and the array of shape (days, features).
+def dayFeatures(folderPath,year,scenario):
+	store=injectionStore.openStore(folderPath,year,scenario)
+	days=store.activeBase.shape[1]//T
+	P,Q=store.queryTotal(store.buses,1,days)
+	profiles=[P]+[store.activeBase[store.profileTypes.index(p)] for p in FEATURE_PROFILES if p in store.profileTypes]
+
+	# Energy prices of the days of the year, if the prices cover them
+	pricesPath=folderPath+PRICES_FILE
+	if os.path.exists(pricesPath):
+		pricesData=dsimaConverter.readPricesData(pricesPath)
+		if all(d in pricesData for d in range(1,days+1)):
+			profiles.append(numpy.concatenate([pricesData[d]['energy price'] for d in range(1,days+1)]))
+
+	blocks=[]
+	for profile in profiles:
+		hourly=numpy.asarray(profile,dtype=float).reshape((days,T//FEATURE_PERIODS,FEATURE_PERIODS)).mean(axis=2)
+		scale=hourly.std()*numpy.sqrt(hourly.shape[1])
+		blocks.append((hourly-hourly.mean())/(scale if scale > 0 else 1.0))
+	return numpy.arange(1,days+1),numpy.hstack(blocks)
+
+## Cluster points with k-medoids.
+# The medoids are initialized as in k-means++ and improved by alternating the assignment of the points to their
+# nearest medoid and the choice of the point of each cluster minimizing the distances to the others. The best of
+# several restarts is kept.
+# @param features Array of shape (points, features).
+# @param k Number of clusters.
+# @param restarts Number of random initializations.
+# @param seed Seed of the random initialization.
+# @return Tuple with the array of the indexes of the medoids and the array of the cluster of each point.
+def kMedoids(features,k,restarts=RESTARTS,seed=0):
+	n=features.shape[0]
+	if not 0 < k <= n:
+		raise Exception('Invalid number of clusters %s for %s points.' % (k,n))
+	squares=(features**2).sum(axis=1)
+	distances=numpy.sqrt(numpy.maximum(squares[:,None]+squares[None,:]-2*features@features.T,0))
+
+	random=numpy.random.RandomState(seed)
+	best=None
+	for r in range(restarts):
+		# Initialization, the first medoid is the most central point
+		medoids=[int(numpy.argmin(distances.sum(axis=1)))] if r == 0 else [int(random.randint(n))]
+		while len(medoids) < k:
+			nearest=distances[:,medoids].min(axis=1)**2
+			if nearest.sum() == 0:
+				medoids.append(int(numpy.setdiff1d(numpy.arange(n),medoids)[0]))
+			else:
+				medoids.append(int(random.choice(n,p=nearest/nearest.sum())))
+		medoids=numpy.array(medoids)
+
+		# Alternate assignment and update
+		for iteration in range(MAX_ITERATIONS):
+			labels=numpy.argmin(distances[:,medoids],axis=1)
+			labels[medoids]=numpy.arange(k)
+			updated=medoids.copy()
+			for c in range(k):
+				members=numpy.flatnonzero(labels == c)
+				updated[c]=members[numpy.argmin(distances[numpy.ix_(members,members)].sum(axis=1))]
+			if numpy.array_equal(updated,medoids):
+				break
+			medoids=updated
+
+		labels=numpy.argmin(distances[:,medoids],axis=1)
+		labels[medoids]=numpy.arange(k)
+		cost=distances[numpy.arange(n),medoids[labels]].sum()
+		if best is None or cost < best[0]:
+			best=(cost,medoids,labels)
+	return best[1],best[2]
+
+## Write a selection of days.
+# @param filePath Path to the file.
+# @param selection List of tuples with the day of the year and its weight.
+def writeSelection(filePath,selection):
+	with open(filePath,'w') as file:
+		file.write("day,weight\n")
+		for d,w in selection:
+			file.write("%s,%s\n" % (d,w))
+
+## Read a selection of days.
+# @param filePath Path to the file written by writeSelection.
+# @return List of tuples with the day of the year and its weight.
+def readSelection(filePath):
+	selection=[]
+	with open(filePath) as file:
+		for line in file:
+			line=line.strip()
+			if line == "" or line.startswith("day"):
+				continue
+			d,w=line.split(",")
+			selection.append((int(d),float(w)))
+	return selection
+
+## Parse the days given to a converter.
+# @param text Path to a selection file written by writeSelection or days and ranges of days separated by commas, e.g. "1-31,45".
+# @return List of days of the year.
+def parseDays(text):
+	if os.path.exists(text):
+		return [d for d,w in readSelection(text)]
+	days=[]
+	for part in text.split(","):
+		if "-" in part:
+			first,last=part.split("-")
+			days+=range(int(first),int(last)+1)
+		else:
+			days.append(int(part))
+	return days
+
+## Get the days given with the option --days of a converter.
+# @param argv Program parameters.
+# @param default Days if the option is not given.
+# @return Tuple with the days and the parameters without the option.
+def daysOption(argv,default=None):
+	days=next((parseDays(a[len("--days="):]) for a in argv if a.startswith("--days=")),default)
+	return days,[a for a in argv if not a.startswith("--days=")]
+
+# Starting point from python #
+if __name__ == "__main__":
+	main(sys.argv[1:])
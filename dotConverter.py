@@ -3,12 +3,14 @@
 # Also requires Graphviz to convert the dot file to a pdf.
 #@author Sebastien MATHIEU
 
-import sys,os,subprocess
-import networkx
+import sys,os,subprocess,glob
 
 import networkMaker
-from networkx.drawing.nx_agraph import write_dot # Fix for broken write_dot
+import buildManifest
+import instrumentation
 import scenariosReader
+import lazyImport
+networkx=lazyImport.lazyModule('networkx')
 
 ## Option to display transformers.
 SHOW_TRANSFORMERS = False
@@ -29,11 +31,16 @@ def main(argv):
     scenariosReader.readScenarios(folderPath,2020,1,graph,'H')
 
     # Create simple graph and draw
-    makeNetworkDot(graph)
+    outputFolder=argv[0] if len(argv) > 1 else '.'
+    makeNetworkDot(graph,outputFolder)
 
 ## Make a dot file from a network.
 # @param networkGraph Graph of the network.
-def makeNetworkDot(networkGraph):
+# @param outputFolder Folder of the output files.
+# @param baseName Name of the output files without extension.
+# @param formats List of formats to render the dot file, see renderNetworkDot.
+@instrumentation.instrumented()
+def makeNetworkDot(networkGraph,outputFolder='.',baseName='network',formats=('svg','pdf','gml')):
     # Constants definition
     # List of load types with a generation icon.
     GENERATION_TYPES=['G']
@@ -108,33 +115,67 @@ def makeNetworkDot(networkGraph):
             w=10/(1+edata["length"])
             g.add_edge(uId,vId,{"label":"     .     ","fontsize":10, "id": "LINE%s"%(edata["internalId"]+1)})
 
-    # Detect cycles
-    try:
-        cycles = networkx.cycle_basis(g)
-        for cy in cycles:
-            networkx.set_node_attributes(g,'color',dict(zip(cy,['#FF0000']*len(cy))))
-            print([g.node[b]['xlabel'] for b in cy])
-        print("Cycles: %d" %len(cycles))
-    except Exception as e:
-        print("Error %s" % e)
-
-    if not networkx.is_connected(g):
-        print("Warning: graph is not connected.")
-        components = [c for c in sorted(networkx.connected_components(g), key=len, reverse=True)]
-        print("Warning: graph contains %d connected components:" % len(components))
-        print(components)
+    # Detect cycles and islands
+    report=networkMaker.checkRadiality(networkGraph)
+    for cy in report.cycles:
+        for b in cy:
+            g.node[idToGvId[b]]['color']='#FF0000'
+        print(cy)
+    print("Cycles: %d" %len(report.cycles))
 
-    write_dot(g,'network.gv')
+    if len(report.islands) > 0:
+        print("Warning: graph is not connected.")
+        print("Warning: graph contains %d connected components:" % (len(report.islands)+1))
+        print(report.islands)
+
+    if not os.path.exists(outputFolder):
+        os.makedirs(outputFolder)
+    gvPath=os.path.join(outputFolder,'%s.gv'%baseName)
+    from networkx.drawing.nx_agraph import write_dot # Fix for broken write_dot, imported here as it pulls in pygraphviz
+    write_dot(g,gvPath)
+
+    # Convert to the output formats
+    renderNetworkDot(gvPath,outputFolder,baseName,formats)
+
+## Render a dot file in several formats from a single layout.
+# The layout is computed once by neato and cached as a positioned dot file keyed by the hash of the dot file. The
+# formats are then rendered in parallel from the cached layout without recomputing it.
+# @param gvPath Path to the dot file.
+# @param outputFolder Folder of the output files.
+# @param baseName Name of the output files without extension.
+# @param formats List of output formats, "gml" or any neato output format such as "svg" or "pdf".
+@instrumentation.instrumented()
+def renderNetworkDot(gvPath,outputFolder='.',baseName='network',formats=('svg','pdf','gml')):
+    # Cached layout of the graph
+    digest=buildManifest.hashFile(gvPath)
+    layoutPath=os.path.join(outputFolder,'%s.%s.layout.gv'%(baseName,digest[:16]))
 
-    # Convert to pdf and gml
     with open(os.devnull, 'wb') as devnull:
-        subprocess.check_call(['neato', '-Tsvg', '-onetwork.svg', 'network.gv'], stdout=devnull, stderr=subprocess.STDOUT)
-        subprocess.check_call(['neato', '-Tpdf', '-onetwork.pdf', 'network.gv'], stdout=devnull, stderr=subprocess.STDOUT)
-        subprocess.check_call(['gv2gml', '-onetwork.gml', 'network.gv'], stdout=devnull, stderr=subprocess.STDOUT)
+        if not os.path.exists(layoutPath):
+            # Remove the layouts of previous topologies
+            for oldLayoutPath in glob.glob(os.path.join(glob.escape(outputFolder),'%s.*.layout.gv'%glob.escape(baseName))):
+                os.remove(oldLayoutPath)
+
+            tmpPath=layoutPath+'.tmp'
+            subprocess.check_call(['neato', '-Tdot', '-o%s'%tmpPath, gvPath], stdout=devnull, stderr=subprocess.STDOUT)
+            os.replace(tmpPath,layoutPath)
+
+        # Render from the positioned graph
+        commands=[]
+        for f in formats:
+            outputPath=os.path.join(outputFolder,'%s.%s'%(baseName,f))
+            if f == 'gml':
+                commands.append(['gv2gml', '-o%s'%outputPath, layoutPath])
+            else:
+                commands.append(['neato', '-n2', '-T%s'%f, '-o%s'%outputPath, layoutPath])
+        processes=[subprocess.Popen(c, stdout=devnull, stderr=subprocess.STDOUT) for c in commands]
+        for c,process in zip(commands,processes):
+            if process.wait() != 0:
+                raise subprocess.CalledProcessError(process.returncode,c)
 
 ## Display help of the program.
 def displayHelp():
-    text="Usage :\n\tpython3 dotConverter.py dataFolder\n"
+    text="Usage :\n\tpython3 dotConverter.py [outputFolder] dataFolder\n"
     print(text)
 
 # Starting point from python #
@@ -3,10 +3,14 @@
 #@author Sebastien MATHIEU
 
 import sys,os,shutil,datetime,random, copy
-import xlrd
 
 import networkMaker
 import scenariosReader
+import buildManifest
+import instrumentation
+import daySelector
+import lazyImport
+xlrd=lazyImport.lazyModule('xlrd')
 from dotConverter import makeNetworkDot
 
 ## Default numerical tolerance
@@ -15,6 +19,8 @@ EPS=0.001
 T=96
 ## Periods set
 periods=range(1,T+1)
+## Days converted by default.
+DEFAULT_DAYS=[26,35,51,65,106,138,142,175,263,305,344,360]
 ## Maximal powers of heat pumps (HP) and electric cars (EC) in MW.
 maxPowers={'HP':3.0976390423/1000,'EC':1.25/1000}
 ## Relative upward flexibility by load profile. For the TSO, flex in MW.
@@ -25,6 +31,12 @@ flexD={'I1':0.2,'I2':0,'I3':0,'EC':0.8,'HP':0.25,'R':0, 'TSO': 5}
 ## Entry point of the program.
 # @param argv Program parameters.
 def main(argv):
+    # Regenerate every output, even the ones up to date in the manifest
+    force="--force" in argv
+    argv=[a for a in argv if a != "--force"]
+    # Days to convert, e.g. representative days of daySelector
+    days,argv=daySelector.daysOption(argv,DEFAULT_DAYS)
+
     # Parse arguments
     if len(argv) < 4 :
         displayHelp()
@@ -45,9 +57,6 @@ def main(argv):
         for k in flexD.keys():
             flexD[k]=0
 
-    #days=range(1,366)
-    days={26,35,51,65,106,138,142,175,263,305,344,360}
-
     # Create output folder
     if not os.path.exists(outputPath):
         os.makedirs(outputPath)
@@ -56,34 +65,70 @@ def main(argv):
         if not os.path.exists(dayDirectory):
             os.makedirs(dayDirectory)
 
-    # Read graph
-    graph=networkMaker.makeNetwork(inputPath)
-    addRootBus(graph,8001)
+    # Manifest of the generated files and their dependencies
+    manifest=buildManifest.Manifest('%s%s' % (outputPath,buildManifest.MANIFEST_FILE),force)
+    networkFiles=[inputPath+f for f in networkMaker.NETWORK_FILES]
+    scenarioFiles=[inputPath+f for f in scenariosReader.SCENARIO_FILES]
+    pricesFile='%sprices.xlsx' % inputPath
+    flexParameters={"flexU":flexU,"flexD":flexD,"maxPowers":maxPowers,"EPS":EPS}
 
-    # Read prices data
-    pricesData = readPricesData('%sprices.xlsx' % inputPath)
+    # Graph and prices are read only if an output depending on them is outdated
+    graph=None
+    pricesData=None
 
     # Read day by day
     networkGenerated=False
-    for d in days:
-        print("\t%s" % d)
-        g = copy.deepcopy(graph)
-        scenariosReader.readScenarios(inputPath,year,d,g,scenario)
-
-        if not networkGenerated:
-            makeNetworkDot(g)
-            networkGenerated=True
-
-        makeNetworkCSV("%s/%s/network.csv" % (outputPath,d), g)
-        makeProducers("%s/%s/producers"%(outputPath,d), g)
-        makeRetailers("%s/%s/retailers"%(outputPath,d), g)
-        makeQualificationIndicators("%s/%s"%(outputPath,d),g)
-        makeTSO("%s/%s"%(outputPath,d))
-        makePrices("%s/%s/prices.csv" % (outputPath,d), pricesData, year, d)
+    try:
+        for d in days:
+            dayParameters={"year":year,"scenario":scenario,"day":d}
+
+            # Outputs of the day as (path, writer, input files, parameters, requires the day graph)
+            outputs=[
+                ("%s/%s/network.csv" % (outputPath,d), lambda g,path: makeNetworkCSV(path, g), networkFiles+scenarioFiles, dayParameters, True),
+                ("%s/%s/producers"%(outputPath,d), lambda g,path: makeProducers(path, g), networkFiles+scenarioFiles, dayParameters, True),
+                ("%s/%s/retailers"%(outputPath,d), lambda g,path: makeRetailers(path, g), networkFiles+scenarioFiles, dict(dayParameters,**flexParameters), True),
+                ("%s/%s/qualified-flex.csv"%(outputPath,d), lambda g,path: makeQualificationIndicators(os.path.dirname(path),g), networkFiles+scenarioFiles, dict(dayParameters,**flexParameters), True),
+                ("%s/%s/tso.csv"%(outputPath,d), lambda g,path: makeTSO(os.path.dirname(path)), [], flexParameters, False),
+                ("%s/%s/prices.csv" % (outputPath,d), lambda g,path: makePrices(path, pricesData, year, d), [pricesFile], {"year":year,"day":d,"EPS":EPS}, False),
+            ]
+
+            # Select the outdated outputs
+            outdated=[]
+            for path,writer,inputFiles,parameters,requiresGraph in outputs:
+                dependencies=manifest.dependencies(inputFiles,parameters)
+                if not manifest.isUpToDate(path,dependencies):
+                    outdated.append((path,writer,dependencies,requiresGraph))
+            if len(outdated) == 0:
+                continue
+            print("\t%s" % d)
+
+            # Read the data needed by the outdated outputs
+            g=None
+            if any(requiresGraph for path,writer,dependencies,requiresGraph in outdated):
+                if graph is None:
+                    graph=networkMaker.makeNetwork(inputPath)
+                    addRootBus(graph,8001)
+                g = copy.deepcopy(graph)
+                scenariosReader.readScenarios(inputPath,year,d,g,scenario)
+
+                if not networkGenerated:
+                    makeNetworkDot(g,outputPath)
+                    networkGenerated=True
+            if pricesData is None and any(path.endswith('prices.csv') for path,writer,dependencies,requiresGraph in outdated):
+                pricesData = readPricesData(pricesFile)
+
+            # Write the outdated outputs
+            for path,writer,dependencies,requiresGraph in outdated:
+                writer(g,path)
+                manifest.record(path,dependencies)
+    finally:
+        manifest.save()
 
 ## Display help of the program.
 def displayHelp():
-    text="Usage :\n\tpython3 dsimaConverter.py dataFolder outputFolder year scenario [--static]\n"
+    text="Usage :\n\tpython3 dsimaConverter.py dataFolder outputFolder year scenario [--static] [--force] [--days=days]\n"
+    text+="\nOnly the files whose inputs or parameters changed since the last run are regenerated, use --force to regenerate every file.\n"
+    text+="The days are %s by default, use --days=1-31,45 or --days=selection.csv, a file written by daySelector, to choose them.\n" % ",".join(map(str,DEFAULT_DAYS))
     text+="\nExample:\n\tpython3 dsimaConverter.py ylpic 2020H 2020 H\n"
     print(text)
 
@@ -105,7 +150,9 @@ def addRootBus(graph, connectionId):
 
 ## Make a CSV file for the TSO with its parameters.
 # @param outputPath Output path of the retailers files.
-def makeTSO(outputPath):
+# @param T Number of periods.
+@instrumentation.instrumented(output=lambda outputPath,*args: '%s/tso.csv'%outputPath)
+def makeTSO(outputPath,T=T):
     with open('%s/tso.csv'%outputPath, 'w') as file:
         file.write('# T, pi^S+, pi^S-\n')
         file.write('%s,%s,%s\n'%(T,45.0,-45.0))
@@ -122,6 +169,7 @@ def makeTSO(outputPath):
 ## Make the CSV files with the flexibility qualification indicator.
 # @param outputPath Output path of the retailers files.
 # @param graph Graph with the data.
+@instrumentation.instrumented(output=lambda outputPath,graph: '%s/qualified-flex.csv'%outputPath)
 def makeQualificationIndicators(outputPath,graph):
     with open('%s/qualified-flex.csv'%outputPath, 'w') as file:
         file.write('# N\n%s\n'%len(graph.node))
@@ -151,13 +199,14 @@ def makeQualificationIndicators(outputPath,graph):
 ## Make the retailers.
 # @param outputPath Output path of the retailers files.
 # @param graph Graph with the data.
-def makeRetailers(outputPath, graph):
+# @param T Number of periods of the profiles.
+@instrumentation.instrumented()
+def makeRetailers(outputPath, graph, T=T):
     # Create the output if it doesn't exist
     if not os.path.exists(outputPath):
         os.makedirs(outputPath)
 
     # Periods
-    T = 96
     periods = range(1,T+1)
 
     # Make a retailer for each consumption type
@@ -224,18 +273,20 @@ def makeRetailers(outputPath, graph):
             for t in periods:
                 # Assume 0 external imbalance
                 file.write('%s,%s\n'%(t,0))
+            instrumentation.addBytes(file.tell())
 
 
 ## Make the producers.
 # @param outputPath Output path of the producers files.
 # @param graph Graph with the data.
-def makeProducers(outputPath,graph):
+# @param T Number of periods of the profiles.
+@instrumentation.instrumented()
+def makeProducers(outputPath,graph,T=T):
     # Create the output if it doesn't exist
     if not os.path.exists(outputPath):
         os.makedirs(outputPath)
 
     # Periods
-    T = 96
     periods = range(1,T+1)
 
     # Make a producer for each production type
@@ -284,35 +335,40 @@ def makeProducers(outputPath,graph):
             file.write('# n, g, G\n')
             for n in pNodes:
                 file.write('%s,0,%s\n'%(graph.node[n]['internalId'],graph.node[n]['load'].refPowers[p]/1000))
+            instrumentation.addBytes(file.tell())
 
 
 ## Make the prices csv file.
 # @param outputPath Output path of the prices csv file.
 # @param pricesData Prices data.
 # @param year Year.
-# @param day Day.
-def makePrices(outputPath, pricesData, year, day):
+# @param day Day, the first day of the horizon.
+# @param length Number of consecutive days of the horizon.
+@instrumentation.instrumented(output=lambda outputPath,*args: outputPath)
+def makePrices(outputPath, pricesData, year, day, length=1):
     with open(outputPath, 'w') as file:
         file.write('# T, EPS, pi^l, dt\n')
-        file.write('%s, %s, %s, %s\n'%(T, EPS, 100.0, 0.25)) # Number of periods, accuracy, local imbalance penalty [\euro/MWh], period size [h]
+        file.write('%s, %s, %s, %s\n'%(T*length, EPS, 100.0, 0.25)) # Number of periods, accuracy, local imbalance penalty [\euro/MWh], period size [h]
 
         file.write('# t, pi^E, pi^I+, pi^I-\n')
-        for t in range(T):
-            piE=pricesData[day]['energy price'][t]
+        for h in range(T*length):
+            d,t=day+h//T,h%T
+            piE=pricesData[d]['energy price'][t]
             minImbalancePrice=max([EPS,piE+EPS,-piE+EPS])
 
-            piIU=pricesData[day]['upward imbalance price'][t]
-            piID=pricesData[day]['downward imbalance price'][t]
+            piIU=pricesData[d]['upward imbalance price'][t]
+            piID=pricesData[d]['downward imbalance price'][t]
 
             if piIU < minImbalancePrice:
                 piIU=minImbalancePrice
             if piID < minImbalancePrice:
                 piID=minImbalancePrice
-            file.write('%s,%s,%s,%s\n'%(t+1,piE,piIU,piID))
+            file.write('%s,%s,%s,%s\n'%(h+1,piE,piIU,piID))
 
 ## Create the CSV file with the network.
 # @param outputFilepath Output file path.
 # @param graph Graph.
+@instrumentation.instrumented(output=lambda outputFilepath,graph: outputFilepath)
 def makeNetworkCSV(outputFilepath, graph):
     unknownBuses=[]
     Sb=100 # Base power in MVA
@@ -0,0 +1,206 @@
+## Partition of the network in the independent MV feeders below the root bus.
+# Each feeder is the set of buses connected through closed lines to one line leaving the root bus. The feeders only
+# share the root bus and can be converted, validated or solved independently by different processes.
+#@author Sebastien MATHIEU
+
+import sys, os, copy
+import multiprocessing
+
+import networkMaker
+import networkArrays
+
+## Entry point of the program.
+# @param argv Program parameters.
+def main(argv):
+	if len(argv) < 1:
+		displayHelp()
+		sys.exit(2)
+	folderPath=argv[0] if argv[0].endswith(("/","\\")) else argv[0]+"/"
+	if not os.path.exists(folderPath):
+		raise Exception('Folder \"%s\" does not exists.' % folderPath)
+	root=int(argv[1]) if len(argv) > 1 else networkArrays.ROOT_BUS
+
+	graph=networkMaker.makeNetwork(folderPath)
+	if len(argv) > 2:
+		import scenariosReader
+		scenariosReader.readScenarios(folderPath,int(argv[2]),int(argv[3]) if len(argv) > 3 else 1,graph,argv[4] if len(argv) > 4 else 'H')
+	print(partitionFeeders(graph,root))
+
+## Display help of the program.
+def displayHelp():
+	text="Usage :\n\tpython3 feederPartitioner.py dataFolder [rootBusId] [year [day [scenario]]]\n"
+	text+="\nWith a year, the loads of the day are assigned to the feeders.\n"
+	print(text)
+
+## Partition a network in feeders.
+# The root bus is removed and the remaining buses are grouped with a union-find over the closed lines. A feeder is a
+# group connected to the root bus by a closed line, the other groups are islands.
+# @param graph Network graph, with the loads of a scenario if any.
+# @param root Id of the root bus.
+# @return FeederPartition.
+def partitionFeeders(graph,root=networkArrays.ROOT_BUS):
+	if not graph.has_node(root):
+		raise Exception('Root bus %s not in the network.'%root)
+
+	sets=networkMaker.DisjointSet(n for n in graph.nodes() if n != root)
+	rootLines=[]
+	for u,v,key,edata in graph.edges(keys=True,data=True):
+		if not edata.get("closed",True):
+			continue
+		if u == root or v == root:
+			rootLines.append((root,v if u == root else u,key))
+		else:
+			sets.union(u,v)
+
+	# Feeders named after the first bus after the root, by increasing internal id of the line leaving the root
+	rootLines.sort(key=lambda l: graph[l[0]][l[1]][l[2]].get("internalId",0))
+	feederOf={}
+	feeders={}
+	for r,n,key in rootLines:
+		representative=sets.find(n)
+		if representative not in feederOf:
+			feederOf[representative]=n
+			feeders[n]=FeederData(n)
+		feeders[feederOf[representative]].rootLines.append((r,n,key))
+
+	# Buses and loads of each feeder
+	islands={}
+	busFeeder={}
+	for n,ndata in graph.nodes(data=True):
+		if n == root:
+			continue
+		representative=sets.find(n)
+		if representative not in feederOf:
+			islands.setdefault(representative,set()).add(n)
+			continue
+		feeder=feeders[feederOf[representative]]
+		feeder.buses.add(n)
+		busFeeder[n]=feeder.id
+		if ndata.get('load') is not None:
+			feeder.loads.append(ndata['load'])
+
+	# Open lines inside a feeder or between two feeders
+	tieLines=[]
+	for u,v,key,edata in graph.edges(keys=True,data=True):
+		if edata.get("closed",True):
+			continue
+		fu,fv=busFeeder.get(u),busFeeder.get(v)
+		if fu is not None and fu == fv:
+			feeders[fu].openLines.append((u,v,key))
+		else:
+			tieLines.append((u,v,key))
+
+	return FeederPartition(root,feeders,busFeeder,list(islands.values()),tieLines)
+
+## Make the subnetwork of a feeder with the root bus.
+# @param graph Network graph.
+# @param partition FeederPartition of the graph.
+# @param feederId Id of the feeder.
+# @return Copy of the graph restricted to the root bus, the buses of the feeder and the lines between them.
+def makeFeederNetwork(graph,partition,feederId):
+	feeder=partition.feeders[feederId]
+	subgraph=graph.subgraph(feeder.buses|{partition.root})
+
+	# Lines between the root and the other feeders are removed
+	for u,v,key in list(subgraph.edges(keys=True)):
+		if partition.root in (u,v) and (partition.root,v if u == partition.root else u,key) not in feeder.rootLines:
+			subgraph.remove_edge(u,v,key)
+	return copy.deepcopy(subgraph)
+
+## Apply a function to the subnetwork of every feeder with a pool of processes.
+# @param function Function of the subnetwork of a feeder, must be defined at the top level of a module such as radialPowerFlow.runRadialPowerFlow.
+# @param graph Network graph.
+# @param partition FeederPartition of the graph, computed if None.
+# @param workers Number of worker processes, the number of cores if None. With one worker, the feeders are processed sequentially.
+# @return Dictionary of the results with the feeder ids as keys.
+def mapFeeders(function,graph,partition=None,workers=None):
+	if partition is None:
+		partition=partitionFeeders(graph)
+	if workers is None:
+		workers=os.cpu_count() or 1
+	tasks=[(function,makeFeederNetwork(graph,partition,f),f) for f in partition.feeders]
+
+	# Largest feeders first to balance the workers
+	tasks.sort(key=lambda t: len(t[1]),reverse=True)
+	if workers == 1 or len(tasks) <= 1:
+		return dict(map(applyToFeeder,tasks))
+	with multiprocessing.Pool(min(workers,len(tasks))) as pool:
+		return dict(pool.imap_unordered(applyToFeeder,tasks))
+
+## Apply a function to a feeder, used by mapFeeders.
+# @param task Tuple with the function, the subnetwork of the feeder and the feeder id.
+# @return Tuple with the feeder id and the result.
+def applyToFeeder(task):
+	function,subgraph,feederId=task
+	return feederId,function(subgraph)
+
+## Partition of a network in feeders.
+class FeederPartition:
+	## Constructor.
+	# @param root Id of the root bus.
+	# @param feeders Dictionary of the FeederData with the feeder ids as keys.
+	# @param busFeeder Feeder id of each bus.
+	# @param islands List of the sets of buses not connected to the root bus.
+	# @param tieLines Open lines between two feeders or with an island.
+	def __init__(self,root,feeders,busFeeder,islands,tieLines):
+		self.root=root
+		self.feeders=feeders
+		self.busFeeder=busFeeder
+		self.islands=islands
+		self.tieLines=tieLines
+
+	## Get the feeder of a load.
+	# @param load LoadData.
+	# @return Feeder id, None if the load is on the root bus or on an island.
+	def loadFeeder(self,load):
+		return self.busFeeder.get(load.bus)
+
+	def __str__(self):
+		text="%s feeders from the bus %s:\n"%(len(self.feeders),self.root)
+		for f in sorted(self.feeders.values(),key=lambda f: len(f.buses),reverse=True):
+			text+="\t%s\n"%f
+		if len(self.tieLines) > 0:
+			text+="%s open tie lines:\n\t%s\n"%(len(self.tieLines),self.tieLines)
+		if len(self.islands) > 0:
+			text+="%s islands not connected to the bus %s:\n\t%s\n"%(len(self.islands),self.root,self.islands)
+		return text
+
+	## @var root
+	# Id of the root bus.
+	## @var feeders
+	# Dictionary of the FeederData with the feeder ids as keys.
+	## @var busFeeder
+	# Feeder id of each bus but the root bus and the buses of the islands.
+	## @var islands
+	# List of the sets of buses not connected to the root bus by closed lines.
+	## @var tieLines
+	# Open lines between two feeders or with an island as (from bus, to bus, line id).
+
+## Data of a feeder.
+class FeederData:
+	## Constructor.
+	# @param id Id of the feeder, the first bus after the root bus.
+	def __init__(self,id):
+		self.id=id
+		self.buses=set()
+		self.loads=[]
+		self.rootLines=[]
+		self.openLines=[]
+
+	def __str__(self):
+		return "Feeder%s: %s buses, %s loads"%(self.id,len(self.buses),len(self.loads))
+
+	## @var id
+	# Id of the feeder, the first bus after the root bus.
+	## @var buses
+	# Set of the buses of the feeder, without the root bus.
+	## @var loads
+	# List of the LoadData of the buses of the feeder.
+	## @var rootLines
+	# Closed lines between the root bus and the feeder as (root bus, feeder bus, line id), several lines if the feeder is meshed through the root.
+	## @var openLines
+	# Open lines between two buses of the feeder.
+
+# Starting point from python #
+if __name__ == "__main__":
+	main(sys.argv[1:])
@@ -0,0 +1,227 @@
+## Flow sensitivity matrix of a radial network for the screening of the congestions.
+# In a radial network, neglecting the losses and the shunt admittances, the flow of a branch is the sum of the
+# injections of the buses below it. The sparse sensitivity matrix has a row by branch and a column by bus, with a
+# non-zero entry for each bus below the branch, so that the flows of every period are a single sparse product with the
+# injections. With the injection store, the matrix is first multiplied by the coefficients of the buses, giving a small
+# dense matrix by profile type, and the flows of the 35,040 periods of a year are its product with the base profiles.
+# The periods with a branch above a margin of its capacity are flagged before running the full power flow.
+# Requires numpy and scipy which can be installed with "pip3 install numpy scipy".
+#@author Sebastien MATHIEU
+
+import sys, os
+
+import numpy
+import scipy.sparse
+
+import networkArrays
+import daySelector
+import cacheFolders
+
+## Number of periods of a day.
+T=96
+## Default fraction of the capacity above which a branch is flagged, covering the losses and voltages neglected by the screening.
+MARGIN=0.9
+## Default number of days screened together.
+CHUNK_DAYS=31
+
+# Cache of the sensitivity matrices with the topology hash and the root as a key.
+sensitivityCache={}
+
+## Entry point of the program.
+# @param argv Program parameters.
+def main(argv):
+	# Options
+	root=networkArrays.ROOT_BUS
+	margin=MARGIN
+	outputPath=None
+	days,argv=daySelector.daysOption(argv)
+	argv=cacheFolders.cacheFolderOption(argv)
+	options=[a for a in argv if a.startswith('--')]
+	argv=[a for a in argv if not a.startswith('--')]
+	for o in options:
+		if o.startswith("--root="):
+			root=int(o[len("--root="):])
+		elif o.startswith("--margin="):
+			margin=float(o[len("--margin="):])
+		elif o.startswith("--output="):
+			outputPath=o[len("--output="):]
+		else:
+			raise Exception('Unknown option "%s".' % o)
+
+	if len(argv) < 3:
+		displayHelp()
+		sys.exit(2)
+	folderPath=argv[0] if argv[0].endswith(("/","\\")) else argv[0]+"/"
+	if not os.path.exists(folderPath):
+		raise Exception('Folder \"%s\" does not exists.' % folderPath)
+	year=int(argv[1])
+	scenario=argv[2]
+
+	import networkMaker
+	import injectionStore
+
+	graph=networkMaker.makeNetwork(folderPath)
+	sensitivity=makeFlowSensitivity(graph,root)
+	result=sensitivity.screenStore(injectionStore.openStore(folderPath,year,scenario),days,margin)
+
+	print("%s of %s periods flagged above %.0f%% of a branch capacity, on %s days." % (len(result.congestedPeriods()),len(result.maxLoading),100*margin,len(result.congestedDays())))
+	branches=numpy.flatnonzero(result.branchCounts)
+	for k in branches[numpy.argsort(-result.branchMaxLoading[branches])]:
+		print("\tbranch %s: %s periods, maximal loading %.1f%%" % (sensitivity.arrays.branches[k],result.branchCounts[k],100*result.branchMaxLoading[k]))
+	if outputPath is not None:
+		with open(outputPath,'w') as file:
+			file.write("day,period,loading,branch\n")
+			for i in result.congestedPeriods():
+				file.write('%s,%s,%.6g,"%s"\n' % (result.days[i//T],i%T+1,result.maxLoading[i],sensitivity.arrays.branches[result.maxBranch[i]]))
+
+## Display help of the program.
+def displayHelp():
+	text="Usage :\n\tpython3 flowSensitivity.py dataFolder year scenario [--root=busId] [--margin=fraction] [--days=days] [--output=file] [--cache-folder=folder]\n"
+	text+="\nScreen the flows of every period of the year, or of the days of --days, with the sensitivity matrix from the root bus\n"
+	text+="(%s by default) and flag the periods with a branch loaded above the margin (%.2f by default) of its capacity.\n" % (networkArrays.ROOT_BUS,MARGIN)
+	text+="The flagged periods are written in the file of --output as \"day,period,loading,branch\" lines.\n"
+	print(text)
+
+## Make the flow sensitivity matrix of a network.
+# The matrix is cached with the hash of the topology and the root.
+# @param graph Network graph from networkMaker.makeNetwork.
+# @param root Id of the root bus.
+# @return FlowSensitivity.
+def makeFlowSensitivity(graph,root=networkArrays.ROOT_BUS):
+	key=(networkArrays.topologyHash(graph),root)
+	sensitivity=sensitivityCache.get(key)
+	if sensitivity is None:
+		arrays=networkArrays.makeNetworkArrays(graph)
+		sensitivity=FlowSensitivity(arrays,networkArrays.makeRadialTree(arrays,root))
+		sensitivityCache[key]=sensitivity
+	return sensitivity
+
+## Sensitivity of the flows of the branches of a radial network to the injections of the buses.
+class FlowSensitivity:
+	## Constructor.
+	# @param arrays Array model of the network.
+	# @param tree Radial tree of the network from the root bus.
+	def __init__(self,arrays,tree):
+		self.arrays=arrays
+		self.tree=tree
+		n=len(arrays.buses)
+
+		# Branches from the root to each bus, the buses being in breadth first order
+		paths=[None]*n
+		paths[tree.root]=[]
+		for b in tree.order[1:]:
+			paths[b]=paths[tree.parent[b]]+[tree.parentBranch[b]]
+		buses=tree.order[1:]
+		rows=numpy.array([k for b in buses for k in paths[b]],dtype=numpy.intp)
+		cols=numpy.repeat(buses,tree.depth[buses])
+
+		# The flow from the "from" bus is minus the injections below it if the "to" bus is the child
+		child=numpy.full(len(arrays.branches),-1,dtype=numpy.intp)
+		child[tree.parentBranch[buses]]=buses
+		sign=numpy.where(arrays.toBus == child,-1.0,1.0)
+		self.matrix=scipy.sparse.csr_matrix((sign[rows],(rows,cols)),shape=(len(arrays.branches),n))
+		self.inTree=child >= 0
+
+	## Compute the flows of the branches.
+	# @param P Array of shape (periods, buses) with the active injections in MW, productions are positive.
+	# @param Q Array of shape (periods, buses) with the reactive injections in MVar.
+	# @return Array of shape (periods, branches) with the complex power in MVA from the "from" bus of each branch, without losses.
+	def flows(self,P,Q):
+		return numpy.asarray(self.matrix@(numpy.atleast_2d(P)+1j*numpy.atleast_2d(Q)).T).T
+
+	## Compute the loading of the branches.
+	# @param flows Array of shape (periods, branches) of flows in MVA.
+	# @return Array of shape (periods, branches) with the flows relative to the capacities, null for the branches not in the tree.
+	def loading(self,flows):
+		pMax=numpy.where(self.inTree & (self.arrays.pMax > 0),self.arrays.pMax,numpy.inf)
+		return numpy.abs(flows)/pMax
+
+	## Screen injections.
+	# @param P Array of shape (periods, buses) with the active injections in MW, productions are positive.
+	# @param Q Array of shape (periods, buses) with the reactive injections in MVar.
+	# @param margin Fraction of the capacity above which a branch is flagged.
+	# @return ScreeningResult.
+	def screen(self,P,Q,margin=MARGIN):
+		result=ScreeningResult(len(self.arrays.branches),margin)
+		result.add(self.loading(self.flows(P,Q)))
+		return result
+
+	## Screen the injections of a year and scenario by products with the base profiles of the store.
+	# @param store InjectionStore of the year and scenario.
+	# @param days Days of the year, all the days of the store if None.
+	# @param margin Fraction of the capacity above which a branch is flagged.
+	# @param chunkDays Number of days screened together.
+	# @return ScreeningResult.
+	def screenStore(self,store,days=None,margin=MARGIN,chunkDays=CHUNK_DAYS):
+		if days is None:
+			days=list(range(1,store.activeBase.shape[1]//T+1))
+		days=list(days)
+		result=ScreeningResult(len(self.arrays.branches),margin,days)
+
+		# Flows of the branches by unit of base profile, in MW as the store is in kW
+		coefficients=numpy.asarray(self.matrix@store.coefficients[store.rows(self.arrays.buses)])/1e3
+		for i in range(0,len(days),chunkDays):
+			periods=numpy.concatenate([numpy.arange(*store.periods(d).indices(store.activeBase.shape[1])) for d in days[i:i+chunkDays]])
+			flows=(coefficients@(store.activeBase[:,periods]+1j*store.reactiveBase[:,periods])).T
+			result.add(self.loading(flows))
+		return result
+
+	## @var arrays
+	# Array model of the network.
+	## @var tree
+	# Radial tree of the network from the root bus.
+	## @var matrix
+	# Sparse matrix of shape (branches, buses), -1 or 1 for the buses below a branch according to the direction of the branch.
+	## @var inTree
+	# Boolean array of the branches in the radial tree, the flows of the other branches are null.
+
+## Result of the screening of the periods.
+class ScreeningResult:
+	## Constructor.
+	# @param branches Number of branches.
+	# @param margin Fraction of the capacity above which a branch is flagged.
+	# @param days Days of the screened periods, None if the periods are not days of a year.
+	def __init__(self,branches,margin,days=None):
+		self.margin=margin
+		self.days=days
+		self.maxLoading=numpy.zeros(0)
+		self.maxBranch=numpy.zeros(0,dtype=numpy.intp)
+		self.branchCounts=numpy.zeros(branches,dtype=numpy.int64)
+		self.branchMaxLoading=numpy.zeros(branches)
+
+	## Add the loadings of the next periods.
+	# @param loading Array of shape (periods, branches) with the loading of the branches.
+	def add(self,loading):
+		self.maxBranch=numpy.concatenate((self.maxBranch,numpy.argmax(loading,axis=1)))
+		self.maxLoading=numpy.concatenate((self.maxLoading,loading.max(axis=1)))
+		self.branchCounts+=numpy.count_nonzero(loading >= self.margin,axis=0)
+		self.branchMaxLoading=numpy.maximum(self.branchMaxLoading,loading.max(axis=0))
+
+	## Get the flagged periods.
+	# @return Array of the indexes of the periods with a branch above the margin.
+	def congestedPeriods(self):
+		return numpy.flatnonzero(self.maxLoading >= self.margin)
+
+	## Get the days with flagged periods.
+	# @return List of the days of the year.
+	def congestedDays(self):
+		if self.days is None:
+			raise Exception('The screened periods are not days of a year.')
+		return sorted(set(self.days[i//T] for i in self.congestedPeriods()))
+
+	## @var margin
+	# Fraction of the capacity above which a branch is flagged.
+	## @var days
+	# Days of the screened periods, None if the periods are not days of a year.
+	## @var maxLoading
+	# Array with the largest loading of a branch at each period.
+	## @var maxBranch
+	# Array with the index of the most loaded branch at each period.
+	## @var branchCounts
+	# Array with the number of flagged periods of each branch.
+	## @var branchMaxLoading
+	# Array with the largest loading of each branch over the periods.
+
+# Starting point from python #
+if __name__ == "__main__":
+	main(sys.argv[1:])
@@ -0,0 +1,172 @@
+## Builder of DSIMA instances over horizons of several consecutive days for rolling-horizon studies.
+# A horizon of length days has length*96 periods, e.g. 672 for a week, and the successive horizons start every stride
+# days so that they overlap when the stride is shorter than the length. The loads of the network and the prices are read
+# once through the cached stages of stageGraph, and the base profiles of a horizon are a slice of the base profiles of
+# the year in the injection store, so that the days shared by overlapping horizons are never parsed again. The files of
+# an instance are written by the functions of dsimaConverter with the number of periods of the horizon.
+# Requires numpy which can be installed with "pip3 install numpy".
+#@author Sebastien MATHIEU
+
+import sys, os, copy
+
+import scenariosReader
+import dsimaConverter
+import stageGraph
+import cacheFolders
+import lazyImport
+injectionStore=lazyImport.lazyModule('injectionStore')
+
+## Number of periods of a day.
+T=96
+## Default number of days of a horizon.
+LENGTH=7
+## Default number of days between the first days of two successive horizons.
+STRIDE=1
+## Bus connected to the root bus of the instances, as in dsimaConverter.
+CONNECTION_BUS=8001
+## File with the prices in the data folder.
+PRICES_FILE="prices.xlsx"
+
+## Entry point of the program.
+# @param argv Program parameters.
+def main(argv):
+	# Options
+	length=LENGTH
+	stride=STRIDE
+	start=1
+	end=None
+	argv=cacheFolders.cacheFolderOption(argv)
+	options=[a for a in argv if a.startswith('--')]
+	argv=[a for a in argv if not a.startswith('--')]
+	for o in options:
+		if o.startswith("--length="):
+			length=int(o[len("--length="):])
+		elif o.startswith("--stride="):
+			stride=int(o[len("--stride="):])
+		elif o.startswith("--start="):
+			start=int(o[len("--start="):])
+		elif o.startswith("--end="):
+			end=int(o[len("--end="):])
+		else:
+			raise Exception('Unknown option "%s".' % o)
+
+	if len(argv) < 4:
+		displayHelp()
+		sys.exit(2)
+	folderPath=argv[0] if argv[0].endswith(("/","\\")) else argv[0]+"/"
+	if not os.path.exists(folderPath):
+		raise Exception('Folder \"%s\" does not exists.' % folderPath)
+	outputPath=argv[1] if argv[1].endswith(("/","\\")) else argv[1]+"/"
+	year=int(argv[2])
+	scenario=argv[3]
+
+	builder=HorizonBuilder(folderPath,year,scenario)
+	if end is None:
+		end=builder.coveredDays()
+	for first,last in horizons(start,end,length,stride):
+		missing=builder.missingDays(first,length)
+		if len(missing) > 0:
+			print("Warning: horizon %s-%s skipped, the days %s are not covered by the injection store or the prices." % (first,last,missing))
+			continue
+		print("\t%s-%s" % (first,last))
+		builder.build("%s%s-%s" % (outputPath,first,last),first,length)
+
+## Display help of the program.
+def displayHelp():
+	text="Usage :\n\tpython3 horizonBuilder.py dataFolder outputFolder year scenario [--length=days] [--stride=days] [--start=day] [--end=day] [--cache-folder=folder]\n"
+	text+="\nBuild a DSIMA instance of length days (%s by default) every stride days (%s by default) from the start day to the end day\n" % (LENGTH,STRIDE)
+	text+="of the year. The instance of the days first to last is written in the folder \"first-last\" of the output folder.\n"
+	text+="The end day is by default the last day covered by both the injection store and the prices, the horizons with a day\n"
+	text+="which is not covered are skipped with a warning.\n"
+	text+="\nExample:\n\tpython3 horizonBuilder.py ylpic 2020H-weeks 2020 H --length=7 --stride=7\n"
+	print(text)
+
+## Get the horizons between two days.
+# @param start First day of the first horizon.
+# @param end Last day of the last horizon.
+# @param length Number of days of a horizon.
+# @param stride Number of days between the first days of two successive horizons.
+# @return List of tuples with the first and last days of each horizon.
+def horizons(start,end,length=LENGTH,stride=STRIDE):
+	if length < 1 or stride < 1:
+		raise Exception('Invalid horizon length %s or stride %s.' % (length,stride))
+	return [(first,first+length-1) for first in range(start,end-length+2,stride)]
+
+## Builder of the instances of the horizons of a year and scenario.
+class HorizonBuilder:
+	## Constructor, read the loads, the base profiles and the prices of the year.
+	# @param folderPath Folder with the excel files.
+	# @param year Year of the scenarios.
+	# @param scenario Type of scenario. Usually 'L' or 'H'.
+	# @param stages StageGraph, the one of the data folder if None.
+	def __init__(self,folderPath,year,scenario,stages=None):
+		if stages is None:
+			stages=stageGraph.openStageGraph(folderPath)
+		self.store=injectionStore.openStore(folderPath,year,scenario)
+		self.year=year
+
+		# Network with the loads, their profiles are replaced by the ones of each horizon
+		self.graph=copy.deepcopy(stageGraph.loadsStage(stages,folderPath,year,scenario).value)
+		dsimaConverter.addRootBus(self.graph,CONNECTION_BUS)
+
+		self.pricesData=stages.run("prices",dsimaConverter.readPricesData,[folderPath+PRICES_FILE]).value
+
+	## Get the number of consecutive days from the first day of the year covered by both the store and the prices.
+	# @return Number of days.
+	def coveredDays(self):
+		days=self.store.activeBase.shape[1]//T
+		for d in range(1,days+1):
+			if d not in self.pricesData:
+				return d-1
+		return days
+
+	## Get the days of a horizon which are not covered by the store or the prices.
+	# @param first First day of the horizon.
+	# @param length Number of days of the horizon.
+	# @return List of the missing days.
+	def missingDays(self,first,length):
+		days=self.store.activeBase.shape[1]//T
+		return [d for d in range(first,first+length) if not 1 <= d <= days or d not in self.pricesData]
+
+	## Get the base profiles of a horizon.
+	# @param first First day of the horizon.
+	# @param length Number of days of the horizon.
+	# @return Tuple of dictionaries with the active and reactive base profiles of the horizon by type.
+	def baseProfiles(self,first,length):
+		periods=self.store.periods(first,first+length-1)
+		active=dict((p,self.store.activeBase[k,periods].tolist()) for k,p in enumerate(self.store.profileTypes))
+		reactive=dict((p,self.store.reactiveBase[k,periods].tolist()) for k,p in enumerate(self.store.profileTypes))
+		return active,reactive
+
+	## Build the instance of a horizon.
+	# @param outputPath Folder of the instance.
+	# @param first First day of the horizon.
+	# @param length Number of days of the horizon.
+	def build(self,outputPath,first,length):
+		missing=self.missingDays(first,length)
+		if len(missing) > 0:
+			raise Exception('No profiles or prices for the days %s of the horizon starting on day %s.' % (missing,first))
+		if not os.path.exists(outputPath):
+			os.makedirs(outputPath)
+
+		baseActiveProfiles,baseReactiveProfiles=self.baseProfiles(first,length)
+		scenariosReader.setLoadProfiles(self.graph,baseActiveProfiles,baseReactiveProfiles)
+		dsimaConverter.makeNetworkCSV("%s/network.csv" % outputPath,self.graph)
+		dsimaConverter.makeProducers("%s/producers" % outputPath,self.graph,length*T)
+		dsimaConverter.makeRetailers("%s/retailers" % outputPath,self.graph,length*T)
+		dsimaConverter.makeQualificationIndicators(outputPath,self.graph)
+		dsimaConverter.makeTSO(outputPath,length*T)
+		dsimaConverter.makePrices("%s/prices.csv" % outputPath,self.pricesData,self.year,first,length)
+
+	## @var store
+	# InjectionStore of the year and scenario with the base profiles of every period.
+	## @var year
+	# Year of the scenarios.
+	## @var graph
+	# Network graph with the root bus and the loads, with the profiles of the last horizon built.
+	## @var pricesData
+	# Time series of the prices by day, see dsimaConverter.readPricesData.
+
+# Starting point from python #
+if __name__ == "__main__":
+	main(sys.argv[1:])
@@ -0,0 +1,254 @@
+## Indexed store of the injections of the buses for a whole year and scenario.
+# The injection of a bus is the sum of its reference powers times base profiles, so that the store keeps a matrix of
+# coefficients (buses x profile types) and the base profiles of every period of the year (profile types x periods).
+# A query of a set of buses over a date range is a small matrix product which does not need the network graph nor the
+# Excel files once the store is built.
+# Requires numpy which can be installed with "pip3 install numpy".
+#@author Sebastien MATHIEU
+
+import sys, os, datetime, threading
+
+import numpy
+
+import networkMaker
+import scenariosReader
+import buildManifest
+import cacheFolders
+
+## Number of periods of a day.
+T=96
+## Folder of the stores in the folder of derived files of the data folder, see cacheFolders.
+STORE_FOLDER="stores"
+
+# Opened stores by path.
+openedStores={}
+# Lock of the manifest of the stores, shared by the stores built concurrently.
+manifestLock=threading.Lock()
+
+## Entry point of the program.
+# @param argv Program parameters.
+def main(argv):
+	argv=cacheFolders.cacheFolderOption(argv)
+	if len(argv) < 5:
+		displayHelp()
+		sys.exit(2)
+	folderPath=argv[0] if argv[0].endswith(("/","\\")) else argv[0]+"/"
+	if not os.path.exists(folderPath):
+		raise Exception('Folder \"%s\" does not exists.' % folderPath)
+	year=int(argv[1])
+	scenario=argv[2]
+	buses=[int(b) for b in argv[3].split(',')]
+	start=datetime.datetime.strptime(argv[4],'%Y-%m-%d').date()
+	end=datetime.datetime.strptime(argv[5],'%Y-%m-%d').date() if len(argv) > 5 else start
+
+	store=openStore(folderPath,year,scenario)
+	P,Q=store.query(buses,start,end)
+	print("# period, %s" % ", ".join("P%s, Q%s" % (b,b) for b in buses))
+	for t in range(P.shape[0]):
+		print("%s, %s" % (t,", ".join("%s, %s" % (P[t,i],Q[t,i]) for i in range(len(buses)))))
+
+## Display help of the program.
+def displayHelp():
+	text="Usage :\n\tpython3 injectionStore.py dataFolder year scenario bus[,bus...] startDate [endDate] [--cache-folder=folder]\n"
+	text+="\nDates are given as YYYY-MM-DD, the end date is included. The store is built if needed in the folder \"%s\" of the\n"%STORE_FOLDER
+	text+="derived files of the data folder, under the folder of --cache-folder, of the environment variable %s or \"%s\".\n"%(cacheFolders.CACHE_VARIABLE,cacheFolders.cacheRoot())
+	print(text)
+
+## Open the store of a year and scenario, building it if it is missing or if the Excel files changed.
+# @param folderPath Folder with the excel files.
+# @param year Year of the scenarios.
+# @param scenario Type of scenario. Usually 'L' or 'H'.
+# @param storeFolder Folder of the stores, the folder STORE_FOLDER of the derived files of the data folder if None, see cacheFolders.
+# @return InjectionStore.
+def openStore(folderPath,year,scenario,storeFolder=None):
+	if storeFolder is None:
+		storeFolder=cacheFolders.cacheFolder(folderPath,STORE_FOLDER)
+	filePath=os.path.join(storeFolder,"injections_y%ss%s.npz"%(year,scenario))
+
+	manifest=buildManifest.Manifest(os.path.join(storeFolder,buildManifest.MANIFEST_FILE))
+	inputFiles=[folderPath+f for f in networkMaker.NETWORK_FILES+scenariosReader.SCENARIO_FILES]
+	dependencies=manifest.dependencies(inputFiles,{"year":year,"scenario":scenario})
+	if not manifest.isUpToDate(filePath,dependencies):
+		if not os.path.exists(storeFolder):
+			os.makedirs(storeFolder)
+		buildStore(folderPath,year,scenario).save(filePath)
+		with manifestLock:
+			# Read again as another store may have been recorded during the build
+			manifest=buildManifest.Manifest(manifest.filePath)
+			manifest.record(filePath,dependencies)
+			manifest.save()
+		openedStores.pop(filePath,None)
+
+	if filePath not in openedStores:
+		openedStores[filePath]=InjectionStore.load(filePath)
+	return openedStores[filePath]
+
+## Build the store of a year and scenario from the Excel files.
+# @param folderPath Folder with the excel files.
+# @param year Year of the scenarios.
+# @param scenario Type of scenario. Usually 'L' or 'H'.
+# @param graph Network graph without loads, read from the folder if None.
+# @return InjectionStore.
+def buildStore(folderPath,year,scenario,graph=None):
+	if graph is None:
+		graph=networkMaker.makeNetwork(folderPath)
+	scenariosReader.clearLoads(graph)
+	scenariosReader.readScenariosExcel(folderPath+scenariosReader.SCENARIOS_FILE,year,graph,scenario)
+	days=scenariosReader.profileDays(folderPath+scenariosReader.LOAD_PROFILES_FILE,year)
+	if days < scenariosReader.YEAR_DAYS:
+		raise Exception('The load profiles of "%s" cover %s days, less than the %s days of a year.'%(folderPath+scenariosReader.LOAD_PROFILES_FILE,days,scenariosReader.YEAR_DAYS))
+
+	# Base profiles of every day
+	profileTypes=None
+	for d in range(1,days+1):
+		profilesType=scenariosReader.readCalendarExcel(folderPath+scenariosReader.CALENDAR_FILE,year,d)
+		baseActiveProfiles,baseReactiveProfiles=scenariosReader.readBaseProfilesExcel(folderPath+scenariosReader.LOAD_PROFILES_FILE,d,profilesType)
+		if profileTypes is None:
+			profileTypes=sorted(baseActiveProfiles.keys())
+			activeBase=numpy.zeros((len(profileTypes),days*T))
+			reactiveBase=numpy.zeros((len(profileTypes),days*T))
+		for k,pType in enumerate(profileTypes):
+			activeBase[k,(d-1)*T:d*T]=baseActiveProfiles[pType]
+			reactiveBase[k,(d-1)*T:d*T]=baseReactiveProfiles[pType]
+
+	# Coefficients of the buses, buses by increasing internal id
+	nodes=sorted(graph.nodes(data=True),key=lambda n: (0,n[1]["internalId"]) if "internalId" in n[1] else (1,n[0]))
+	buses=numpy.array([n for n,ndata in nodes])
+	typeIndex=dict((pType,k) for k,pType in enumerate(profileTypes))
+	coefficients=numpy.zeros((len(buses),len(profileTypes)))
+	for i,(n,ndata) in enumerate(nodes):
+		if ndata.get('load') is None:
+			continue
+		for name,pType,refPower in scenariosReader.loadProfiles(ndata['load'],typeIndex):
+			coefficients[i,typeIndex[pType]]+=refPower
+
+	return InjectionStore(year,scenario,buses,profileTypes,coefficients,activeBase,reactiveBase)
+
+## Injections of the buses for every period of a year and scenario.
+class InjectionStore:
+	## Constructor.
+	# @param year Year of the scenario.
+	# @param scenario Type of scenario.
+	# @param buses Array of the bus ids.
+	# @param profileTypes List of the types of the base profiles.
+	# @param coefficients Array of shape (buses, profile types) with the reference powers.
+	# @param activeBase Array of shape (profile types, periods) with the active base profiles.
+	# @param reactiveBase Array of shape (profile types, periods) with the reactive base profiles.
+	def __init__(self,year,scenario,buses,profileTypes,coefficients,activeBase,reactiveBase):
+		self.year=year
+		self.scenario=scenario
+		self.buses=numpy.asarray(buses)
+		self.busIndex=dict((int(b),i) for i,b in enumerate(self.buses))
+		self.profileTypes=list(profileTypes)
+		self.coefficients=numpy.asarray(coefficients)
+		self.activeBase=numpy.asarray(activeBase)
+		self.reactiveBase=numpy.asarray(reactiveBase)
+
+	## Load a store from a file.
+	# @param filePath Path to the store.
+	# @return InjectionStore.
+	@staticmethod
+	def load(filePath):
+		with numpy.load(filePath) as data:
+			return InjectionStore(int(data["year"]),str(data["scenario"]),data["buses"],[str(p) for p in data["profileTypes"]],
+								data["coefficients"],data["activeBase"],data["reactiveBase"])
+
+	## Save the store in a file.
+	# @param filePath Path to the store.
+	def save(self,filePath):
+		temporaryPath=filePath+".tmp.npz"
+		numpy.savez(temporaryPath,year=self.year,scenario=self.scenario,buses=self.buses,profileTypes=numpy.array(self.profileTypes),
+					coefficients=self.coefficients,activeBase=self.activeBase,reactiveBase=self.reactiveBase)
+		os.replace(temporaryPath,filePath)
+
+	## Get the range of periods of a range of days.
+	# @param start First day as a date or a day of the year.
+	# @param end Last day included as a date or a day of the year, the first day if None.
+	# @return Slice of the periods.
+	def periods(self,start,end=None):
+		if end is None:
+			end=start
+		first=self.dayOfYear(start)
+		last=self.dayOfYear(end)
+		if not 1 <= first <= last <= self.activeBase.shape[1]//T:
+			raise Exception('Invalid day range %s to %s for the year %s.'%(start,end,self.year))
+		return slice((first-1)*T,last*T)
+
+	## Get the day of the year of a date.
+	# @param day Date or day of the year.
+	# @return Day of the year.
+	def dayOfYear(self,day):
+		if isinstance(day,datetime.date):
+			if day.year != self.year:
+				raise Exception('Date %s not in the year %s of the store.'%(day,self.year))
+			return day.timetuple().tm_yday
+		return int(day)
+
+	## Get the injections of buses over a range of days.
+	# @param buses Bus id or iterable of bus ids.
+	# @param start First day as a date or a day of the year.
+	# @param end Last day included as a date or a day of the year, the first day if None.
+	# @return Tuple of arrays with the active and reactive injections in kW and kVAr with the periods as rows and the buses as columns, 1-D arrays for a single bus. Productions are positive.
+	def query(self,buses,start,end=None):
+		single=numpy.isscalar(buses)
+		rows=self.rows([buses] if single else buses)
+		periods=self.periods(start,end)
+		coefficients=self.coefficients[rows]
+		P=(coefficients@self.activeBase[:,periods]).T
+		Q=(coefficients@self.reactiveBase[:,periods]).T
+		if single:
+			return P[:,0],Q[:,0]
+		return P,Q
+
+	## Get the total injection of a set of buses over a range of days.
+	# @param buses Iterable of bus ids.
+	# @param start First day as a date or a day of the year.
+	# @param end Last day included as a date or a day of the year, the first day if None.
+	# @return Tuple of arrays with the total active and reactive injections in kW and kVAr by period.
+	def queryTotal(self,buses,start,end=None):
+		coefficients=self.coefficients[self.rows(buses)].sum(axis=0)
+		periods=self.periods(start,end)
+		return coefficients@self.activeBase[:,periods],coefficients@self.reactiveBase[:,periods]
+
+	## Get the injections of the buses of a feeder over a range of days.
+	# @param partition FeederPartition of the network.
+	# @param feederId Id of the feeder.
+	# @param start First day as a date or a day of the year.
+	# @param end Last day included as a date or a day of the year, the first day if None.
+	# @param total If true, return the total injection of the feeder instead of the injection of each bus.
+	# @return Tuple with the sorted bus ids of the feeder and the result of query, or the result of queryTotal if total.
+	def queryFeeder(self,partition,feederId,start,end=None,total=False):
+		buses=sorted(partition.feeders[feederId].buses)
+		if total:
+			return self.queryTotal(buses,start,end)
+		return (buses,)+self.query(buses,start,end)
+
+	## Get the rows of buses in the coefficients.
+	# @param buses Iterable of bus ids.
+	# @return Array of the rows.
+	def rows(self,buses):
+		try:
+			return numpy.array([self.busIndex[int(b)] for b in buses],dtype=numpy.intp)
+		except KeyError as e:
+			raise Exception('Bus %s not in the injection store.'%e.args[0])
+
+	## @var year
+	# Year of the scenario.
+	## @var scenario
+	# Type of scenario.
+	## @var buses
+	# Array of the bus ids.
+	## @var busIndex
+	# Row of each bus id in the coefficients.
+	## @var profileTypes
+	# List of the types of the base profiles.
+	## @var coefficients
+	# Array of shape (buses, profile types) with the reference powers of the loads of each bus.
+	## @var activeBase
+	# Array of shape (profile types, periods of the year) with the active base profiles, positive for a production.
+	## @var reactiveBase
+	# Array of shape (profile types, periods of the year) with the reactive base profiles, positive for a production.
+
+# Starting point from python #
+if __name__ == "__main__":
+	main(sys.argv[1:])
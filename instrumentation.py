@@ -0,0 +1,170 @@
+## Timing and throughput statistics of the stages of the readers and writers.
+# Each instrumented function is a stage recording its number of calls, wall time, rows parsed, bytes written and the
+# peak resident memory of the process. The cost is a few microseconds per call so that it can be left on. If the
+# environment variable YLPIC_TRACE is set, a JSON trace is written to this path at exit and the summary is printed.
+#@author Sebastien MATHIEU
+
+import sys, os, time, json, atexit, functools, threading
+
+try:
+	import resource
+except ImportError: # Not available on Windows
+	resource = None
+
+## Environment variable with the path of the JSON trace written at exit.
+TRACE_VARIABLE="YLPIC_TRACE"
+
+## If false, the stages are not recorded.
+enabled=True
+# Statistics of each stage by name.
+stages={}
+# Stages being executed by each thread, see activeStages.
+threadStages=threading.local()
+# Time of the start of the process.
+startTime=time.perf_counter()
+
+## Get the peak resident memory of the process.
+# @return Peak resident memory in bytes, 0 if unknown.
+def peakRss():
+	if resource is None:
+		return 0
+	rss=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	return rss if sys.platform == 'darwin' else rss*1024 # In bytes on macOS, in kB on Linux
+
+## Get the current resident memory of the process.
+# @return Resident memory in bytes, the peak resident memory if the current one is unknown.
+def currentRss():
+	try:
+		with open('/proc/self/statm') as file:
+			return int(file.read().split()[1])*os.sysconf('SC_PAGE_SIZE')
+	except (IOError,OSError,ValueError,AttributeError): # Not on Linux
+		return peakRss()
+
+## Get the stages being executed by the current thread.
+# @return List of the stages, innermost last.
+def activeStages():
+	stack=getattr(threadStages,'stack',None)
+	if stack is None:
+		stack=threadStages.stack=[]
+	return stack
+
+## Decorator recording the calls of a function as a stage.
+# Nested stages are included in the time of the stages calling them.
+# @param name Name of the stage, the name of the function if None.
+# @param output Function of the arguments of the decorated function returning the path or list of paths of the written files, whose size is added to the bytes written.
+# @return Decorator.
+def instrumented(name=None,output=None):
+	def decorator(function):
+		stageName=name if name is not None else function.__name__
+		@functools.wraps(function)
+		def wrapper(*args,**kwargs):
+			if not enabled:
+				return function(*args,**kwargs)
+			stage=stages.get(stageName)
+			if stage is None:
+				stage=stages[stageName]=StageStats(stageName)
+			active=activeStages()
+			active.append(stage)
+			rssBefore=peakRss()
+			tic=time.perf_counter()
+			try:
+				return function(*args,**kwargs)
+			finally:
+				stage.seconds+=time.perf_counter()-tic
+				stage.calls+=1
+				rss=peakRss()
+				stage.peakRss=max(stage.peakRss,rss)
+				stage.peakRssIncrease+=rss-rssBefore
+				active.pop()
+				if output is not None:
+					paths=output(*args,**kwargs)
+					for path in [paths] if isinstance(paths,str) else paths:
+						if os.path.exists(path):
+							stage.bytes+=os.path.getsize(path)
+		return wrapper
+	return decorator
+
+## Add parsed rows to the innermost stage being executed.
+# @param rows Number of rows.
+def addRows(rows):
+	active=activeStages()
+	if enabled and len(active) > 0:
+		active[-1].rows+=rows
+
+## Add written bytes to the innermost stage being executed.
+# @param count Number of bytes.
+def addBytes(count):
+	active=activeStages()
+	if enabled and len(active) > 0:
+		active[-1].bytes+=count
+
+## Reset the statistics of every stage.
+def reset():
+	global startTime
+	stages.clear()
+	startTime=time.perf_counter()
+
+## Get the trace of the stages.
+# @return Dictionary with the wall time, the peak resident memory and the statistics of each stage.
+def trace():
+	return {"wallTime":time.perf_counter()-startTime,"peakRss":peakRss(),
+			"stages":dict((s.name,s.toDict()) for s in sorted(stages.values(),key=lambda s: s.seconds,reverse=True))}
+
+## Write the JSON trace of the stages.
+# @param filePath Path of the trace.
+def writeTrace(filePath):
+	with open(filePath,'w') as file:
+		json.dump(trace(),file,indent=1)
+
+## Make the summary table of the stages, by decreasing time.
+# @return Text of the table.
+def summary():
+	wallTime=time.perf_counter()-startTime
+	text="%-28s %8s %10s %7s %12s %12s %10s %10s\n"%("Stage","Calls","Time [s]","Time %","Rows","Bytes","Calls/s","Peak [MB]")
+	for s in sorted(stages.values(),key=lambda s: s.seconds,reverse=True):
+		text+="%-28s %8d %10.3f %6.1f%% %12d %12d %10.1f %10.1f\n"%(s.name,s.calls,s.seconds,100*s.seconds/max(wallTime,1e-9),
+																		s.rows,s.bytes,s.calls/max(s.seconds,1e-9),s.peakRss/2**20)
+	text+="Wall time %.3fs, peak memory %.1f MB\n"%(wallTime,peakRss()/2**20)
+	return text
+
+## Write the trace and print the summary at exit if the environment variable TRACE_VARIABLE is set.
+def traceAtExit():
+	filePath=os.environ.get(TRACE_VARIABLE)
+	if filePath and len(stages) > 0:
+		writeTrace(filePath)
+		sys.stderr.write(summary())
+atexit.register(traceAtExit)
+
+## Statistics of a stage.
+class StageStats:
+	## Constructor.
+	# @param name Name of the stage.
+	def __init__(self,name):
+		self.name=name
+		self.calls=0
+		self.seconds=0.0
+		self.rows=0
+		self.bytes=0
+		self.peakRss=0
+		self.peakRssIncrease=0
+
+	## Get the statistics as a dictionary.
+	# @return Dictionary of the statistics.
+	def toDict(self):
+		return {"calls":self.calls,"seconds":self.seconds,"rows":self.rows,"bytes":self.bytes,
+				"peakRss":self.peakRss,"peakRssIncrease":self.peakRssIncrease}
+
+	## @var name
+	# Name of the stage.
+	## @var calls
+	# Number of calls.
+	## @var seconds
+	# Total wall time of the calls, including the nested stages.
+	## @var rows
+	# Number of rows parsed.
+	## @var bytes
+	# Number of bytes written.
+	## @var peakRss
+	# Largest peak resident memory of the process at the end of a call in bytes.
+	## @var peakRssIncrease
+	# Total increase of the peak resident memory during the calls in bytes, showing which stages raise the peak.
@@ -0,0 +1,31 @@
+## Lazy import of the heavy modules so that the programs start fast.
+# networkx, xlrd, xlwt and numpy take most of the start time of the converters while the help text, the up to date
+# outputs of the manifest and many options never use some of them. A lazy module is imported at the first access to
+# one of its attributes, then behaves as the module itself.
+#@author Sebastien MATHIEU
+
+import sys
+import importlib.util
+
+## Get a module imported at the first access to one of its attributes.
+# @param name Name of a top-level module.
+# @return Module, already imported if it was in sys.modules.
+def lazyModule(name):
+	if name in sys.modules:
+		return sys.modules[name]
+	spec=importlib.util.find_spec(name)
+	if spec is None:
+		raise ImportError('No module named "%s".' % name)
+	loader=importlib.util.LazyLoader(spec.loader)
+	spec.loader=loader
+	module=importlib.util.module_from_spec(spec)
+	sys.modules[name]=module
+	loader.exec_module(module)
+	return module
+
+## Check if a module has been imported and executed, not only registered as a lazy module.
+# @param name Name of the module.
+# @return True if the module is loaded.
+def isLoaded(name):
+	module=sys.modules.get(name)
+	return module is not None and not isinstance(module,importlib.util._LazyModule)
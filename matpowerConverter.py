@@ -8,16 +8,34 @@
 #TODO Transformers
 #TODO Shunt admittances at buses
 
-import sys, os, copy
-import networkx
+import sys, os, copy, itertools
 import math
 
 import networkMaker
 import scenariosReader
+import buildManifest
+import instrumentation
+import outputSinks
+import daySelector
+import lazyImport
+networkReducer=lazyImport.lazyModule('networkReducer')
 
 ## Entry point of the program.
 # @param argv Program parameters: data folder path, slack bus id, period of interest (scenario hardcoded for now).
 def main(argv):
+	# Regenerate every output, even the ones up to date in the manifest
+	force="--force" in argv
+	# Remove the passive buses before writing the cases
+	reduce="--reduce" in argv
+	# Stream the days through a single graph, with an optional memory budget in MB
+	stream=any(a.startswith("--stream") for a in argv)
+	memoryBudget=next((int(a[len("--stream="):]) for a in argv if a.startswith("--stream=")),None)
+	# Archive or container of the cases of the year mode
+	sinkPath=next((a[len("--sink="):] for a in argv if a.startswith("--sink=")),None)
+	argv=[a for a in argv if a not in ("--force","--reduce") and not a.startswith(("--stream","--sink="))]
+	# Days of the year mode, e.g. representative days of daySelector
+	days,argv=daySelector.daysOption(argv,range(1,366))
+
 	# Provide slack bus external ID as second argument
 	if len(argv) == 3:
 		folderPath=argv[0] if argv[0].endswith(("/","\\")) else argv[0]+"/"
@@ -36,9 +54,11 @@ def main(argv):
 
 		# Read power information, select time horizon, day number, and scenario type.
 		scenariosReader.readScenarios(folderPath,2020,1,graph,'H')
+		if reduce:
+			graph,reduction=networkReducer.reduceNetwork(graph,keep=(slackBusId,))
 
-		# Output
-		makeMatpowerFile('caseYlpic.m', graph, 'ylpic', slackBusId, period)
+		# Output, the period starts from 1 and the profiles from 0 as in the year mode
+		makeMatpowerFile('caseYlpic.m', graph, 'ylpic', slackBusId, period-1)
 
 	elif len(argv) == 4 or len(argv) == 5:
 		folderPath=argv[0] if argv[0].endswith(("/","\\")) else argv[0]+"/"
@@ -49,25 +69,87 @@ def main(argv):
 		if len(argv) == 5:
 			outputPath = argv[4] + "/"
 
-		# Read network data (all but power information)
-		graph=networkMaker.makeNetwork(folderPath)
+		# Cases written in a single archive, which is always written entirely
+		sink=None
+		if sinkPath is not None:
+			sink=outputSinks.openSink(sinkPath)
+
+		# Manifest of the generated files and their dependencies, not used with a sink
+		manifest=None
+		if sink is None:
+			manifest=buildManifest.Manifest('%s%s' % (outputPath,buildManifest.MANIFEST_FILE),force)
+		inputFiles=[folderPath+f for f in networkMaker.NETWORK_FILES+scenariosReader.SCENARIO_FILES]
+
+		# Days with their outdated periods
+		def outdatedDays():
+			for d in days:
+				outdated=[]
+				for period in range(1,97):
+					caseName='ylpic_y%ss%sd%sp%s' % (year, scenario, d, period)
+					fileName='%s%s.m' % (outputPath,caseName)
+					dependencies=None
+					if manifest is not None:
+						dependencies=manifest.dependencies(inputFiles,{"year":year,"scenario":scenario,"day":d,"period":period,"slackBusId":slackBusId,"reduce":reduce})
+						if manifest.isUpToDate(fileName,dependencies):
+							continue
+					outdated.append((period,caseName,fileName,dependencies))
+				if len(outdated) > 0:
+					yield d,outdated
 
-		days=range(1,366)
-		for d in days:
-			print("\t%s" % d)
-			g = copy.deepcopy(graph)
-			scenariosReader.readScenarios(folderPath,year,d,g,scenario)
-
-			for period in range(1,97):
-				makeMatpowerFile('%sylpic_y%ss%sd%sp%s.m' % (outputPath,year, scenario, d, period), g, 'ylpic_y%ss%sd%sp%s' % (year, scenario, d, period), slackBusId, period-1)
+		try:
+			# Network data (all but power information), read only if a day has to be generated
+			pendingDays=outdatedDays()
+			firstDay=next(pendingDays,None)
+			if firstDay is None:
+				return
+			graph=networkMaker.makeNetwork(folderPath)
+			pendingDays=itertools.chain([firstDay],pendingDays)
+
+			# Outdated periods by day, filled as iterateScenarios takes the days
+			outdatedPeriods={}
+			def pendingDayNumbers():
+				for d,outdated in pendingDays:
+					outdatedPeriods[d]=outdated
+					yield d
+
+			# Graphs of the days, a copy by day or the same graph when streaming
+			reduced=None
+			for d,g in scenariosReader.iterateScenarios(folderPath,year,pendingDayNumbers(),graph,scenario,memoryBudget,copyGraph=not stream):
+				print("\t%s" % d)
+				outdated=outdatedPeriods.pop(d)
+				if reduce:
+					# The topology and the loaded buses do not change with the day, the network is reduced once
+					if reduced is None:
+						reduced,reduction=networkReducer.reduceNetwork(g,keep=(slackBusId,))
+					g=networkReducer.updateLoads(reduced,reduction,g)
+
+				for period,caseName,fileName,dependencies in outdated:
+					if sink is None:
+						makeMatpowerFile(fileName, g, caseName, slackBusId, period-1)
+						manifest.record(fileName,dependencies)
+					else:
+						makeMatpowerFile('%s.m' % caseName, g, caseName, slackBusId, period-1, sink=sink)
+		finally:
+			# The archive is closed even if the loop failed, so that the cases already written are kept
+			if sink is not None:
+				sink.close()
+			else:
+				manifest.save()
 	else:
 		displayHelp()
 		sys.exit(2)
 
 ## Display help of the program.
 def displayHelp():
-	text="Usage :\n\tpython matpowerConverter.py dataFolder slackBusId period\n"
-	text+="\tpython matpowerConverter.py dataFolder slackBusId year scenario [outputFolder]\n"
+	text="Usage :\n\tpython matpowerConverter.py dataFolder slackBusId period [--reduce]\n"
+	text+="\tpython matpowerConverter.py dataFolder slackBusId year scenario [outputFolder] [--force] [--reduce] [--stream[=MB]] [--sink=archive] [--days=days]\n"
+	text+="\nIn year mode, only the files whose inputs or parameters changed since the last run are regenerated.\n"
+	text+="Use --force to regenerate every file.\n"
+	text+="Use --reduce to remove the buses without load of dead ends and to merge the chains of such buses, see networkReducer.\n"
+	text+="Use --stream to read the days one after the other on the same graph so that the memory does not grow with the number of days.\n"
+	text+="With --stream=MB, the buffered Excel files are also released when the memory exceeds MB megabytes.\n"
+	text+="Use --sink=cases.zip or --sink=cases.chunks to write every case of the year in a single compressed archive, see outputSinks.\n"
+	text+="Use --days=1-31,45 or --days=selection.csv, a file written by daySelector, to convert only some days of the year.\n"
 	print(text)
 
 
@@ -76,7 +158,8 @@ def writeLine(outFile,str2Write):
 	outFile.write("""    %s\n""" % str2Write)
 	return
 
-def makeMatpowerFile(fileName, networkGraph, caseName, slackBusId, period):
+@instrumentation.instrumented(output=lambda fileName,*args,**kwargs: fileName if kwargs.get('sink') is None else [])
+def makeMatpowerFile(fileName, networkGraph, caseName, slackBusId, period, sink=None):
 
 	# Constants for conversion to per unit
 	baseMVA = 100 # MVA
@@ -86,7 +169,7 @@ def makeMatpowerFile(fileName, networkGraph, caseName, slackBusId, period):
 	VLimitDown = 0.95
 	VLimitUp = 1.05
 
-	outFile = open(fileName,'w')
+	outFile = open(fileName,'w') if sink is None else sink.open(fileName)
 
 	# write front matter
 	outFile.write("""function mpc = %s\n""" % caseName)
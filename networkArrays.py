@@ -0,0 +1,188 @@
+## Array model of the network built from the graph of networkMaker.
+# The buses and branches are numbered from 0 by increasing internal id and their characteristics are stored in NumPy
+# arrays in per unit, which is the input of the numerical tools such as the admittance matrix or the power flow.
+# Requires numpy which can be installed with "pip3 install numpy".
+#@author Sebastien MATHIEU
+
+import hashlib
+from math import pi
+
+import numpy
+import scipy.sparse
+import scipy.sparse.csgraph
+
+## Bus connecting the network to the transmission grid.
+ROOT_BUS=8001
+## Default system MVA base.
+BASE_MVA=100
+## Base frequency of the network in Hz.
+BASE_FREQUENCY=50
+
+## Compute the hash of the topology and electrical characteristics of a network.
+# Loads are not taken into account.
+# @param graph Network graph.
+# @return Hexadecimal SHA-1.
+def topologyHash(graph):
+	h=hashlib.sha1()
+	for n,ndata in sorted(graph.nodes(data=True),key=lambda n: n[0]):
+		h.update(("%s,%s;"%(n,ndata.get("baseVoltage"))).encode('utf-8'))
+	edges=[]
+	for u,v,key,edata in graph.edges(keys=True,data=True):
+		if u > v:
+			u,v=v,u
+		edges.append("%s,%s,%s,%r,%r,%r,%r,%s;"%(u,v,key,edata["R1"],edata["X1"],edata["C1"],edata["pMax"],edata["closed"]))
+	for e in sorted(edges):
+		h.update(e.encode('utf-8'))
+	return h.hexdigest()
+
+## Make the array model of a network.
+# @param graph Network graph.
+# @param baseMVA System MVA base.
+# @param baseKV Base voltage in kV of every bus. If None, the base voltage of each bus is used.
+# @return NetworkArrays.
+def makeNetworkArrays(graph,baseMVA=BASE_MVA,baseKV=None):
+	return NetworkArrays(graph,baseMVA,baseKV)
+
+## Make the arrays of the active and reactive injections of the loads for each period.
+# @param graph Network graph with the daily scenario.
+# @param arrays Array model of the network.
+# @param periods Number of periods.
+# @return Tuple of arrays of shape (periods, buses) with the active injections in MW and the reactive injections in MVar, productions are positive.
+def makeInjections(graph,arrays,periods=96):
+	P=numpy.zeros((periods,len(arrays.buses)))
+	Q=numpy.zeros((periods,len(arrays.buses)))
+	for n,ndata in graph.nodes(data=True):
+		loadData=ndata.get('load')
+		if loadData is None or n not in arrays.busIndex:
+			continue
+		i=arrays.busIndex[n]
+		for baseline in loadData.activeProfiles.values():
+			P[:,i]+=numpy.asarray(baseline[:periods])/1e3 # Convert to MW as in matpowerConverter
+		for baseline in loadData.reactiveProfiles.values():
+			Q[:,i]+=numpy.asarray(baseline[:periods])/1e3 # Convert to MVAr as in matpowerConverter
+	return P,Q
+
+## Make the radial tree of the closed branches from a root bus.
+# @param arrays Array model of the network.
+# @param root Id of the root bus.
+# @return RadialTree.
+def makeRadialTree(arrays,root=ROOT_BUS):
+	return RadialTree(arrays,root)
+
+## Array model of a network.
+class NetworkArrays:
+	## Constructor.
+	# @param graph Network graph.
+	# @param baseMVA System MVA base.
+	# @param baseKV Base voltage in kV of every bus. If None, the base voltage of each bus is used.
+	def __init__(self,graph,baseMVA=BASE_MVA,baseKV=None):
+		self.baseMVA=baseMVA
+
+		# Buses by increasing internal id, buses without data at the end
+		nodes=sorted(graph.nodes(data=True),key=lambda n: (0,n[1]["internalId"]) if "internalId" in n[1] else (1,n[0]))
+		self.buses=[n for n,ndata in nodes]
+		self.busIndex=dict((n,i) for i,n in enumerate(self.buses))
+		defaultKV=baseKV
+		if defaultKV is None:
+			defaultKV=next((ndata["baseVoltage"]/1e3 for n,ndata in nodes if "baseVoltage" in ndata),1.0)
+		self.baseKV=numpy.array([baseKV if baseKV is not None else ndata.get("baseVoltage",defaultKV*1e3)/1e3 for n,ndata in nodes],dtype=float)
+
+		# Branches by increasing internal id
+		edges=sorted(graph.edges(keys=True,data=True),key=lambda e: e[3]["internalId"])
+		self.branches=[(u,v,key) for u,v,key,edata in edges]
+		self.branchIndex=dict((b,i) for i,b in enumerate(self.branches))
+		self.branchIndex.update(((v,u,key),i) for i,(u,v,key) in enumerate(self.branches))
+		self.fromBus=numpy.array([self.busIndex[u] for u,v,key in self.branches],dtype=numpy.intp)
+		self.toBus=numpy.array([self.busIndex[v] for u,v,key in self.branches],dtype=numpy.intp)
+
+		# Per unit characteristics with the base impedance of the "from" bus
+		Zb=(self.baseKV[self.fromBus]*1e3)**2/(baseMVA*1e6) # in Ohm
+		self.r=numpy.array([edata["R1"] for u,v,key,edata in edges],dtype=float)/Zb
+		self.x=numpy.array([edata["X1"] for u,v,key,edata in edges],dtype=float)/Zb
+		self.b=2*pi*BASE_FREQUENCY*numpy.array([edata["C1"] for u,v,key,edata in edges],dtype=float)*1e-6*Zb
+		self.pMax=numpy.array([edata["pMax"] for u,v,key,edata in edges],dtype=float)/1e6 # in MVA
+		self.closed=numpy.array([bool(edata["closed"]) for u,v,key,edata in edges],dtype=bool)
+
+	## @var baseMVA
+	# System MVA base.
+	## @var buses
+	# List of bus ids by index.
+	## @var busIndex
+	# Index of each bus id.
+	## @var baseKV
+	# Base voltage of each bus in kV.
+	## @var branches
+	# List of branches as (from bus, to bus, line id) by index.
+	## @var branchIndex
+	# Index of each branch with (from bus, to bus, line id) and (to bus, from bus, line id) as keys.
+	## @var fromBus
+	# Index of the "from" bus of each branch.
+	## @var toBus
+	# Index of the "to" bus of each branch.
+	## @var r
+	# Series resistance of each branch in p.u.
+	## @var x
+	# Series reactance of each branch in p.u.
+	## @var b
+	# Total shunt susceptance of each branch in p.u.
+	## @var pMax
+	# Capacity of each branch in MVA.
+	## @var closed
+	# Status of each branch.
+
+## Radial tree of the closed branches of a network from a root bus.
+# Buses not connected to the root by closed branches are not in the tree.
+class RadialTree:
+	## Constructor.
+	# @param arrays Array model of the network.
+	# @param root Id of the root bus.
+	def __init__(self,arrays,root=ROOT_BUS):
+		if root not in arrays.busIndex:
+			raise Exception('Root bus %s not in the network.'%root)
+		n=len(arrays.buses)
+		self.root=arrays.busIndex[root]
+
+		# Breadth first search over the closed branches
+		c=numpy.flatnonzero(arrays.closed)
+		f=arrays.fromBus[c]
+		t=arrays.toBus[c]
+		adjacency=scipy.sparse.csr_matrix((numpy.ones(2*len(c)),(numpy.concatenate((f,t)),numpy.concatenate((t,f)))),shape=(n,n))
+		self.order,predecessors=scipy.sparse.csgraph.breadth_first_order(adjacency,self.root,directed=False,return_predecessors=True)
+		self.reachable=numpy.zeros(n,dtype=bool)
+		self.reachable[self.order]=True
+		inTree=self.reachable[f] & self.reachable[t]
+		if numpy.count_nonzero(inTree) != len(self.order)-1:
+			raise Exception('The closed branches connected to the bus %s are not radial, see networkMaker.checkRadiality.'%root)
+
+		# Parent bus and branch of each bus
+		self.parent=numpy.where(predecessors < 0,-1,predecessors).astype(numpy.intp)
+		self.parentBranch=numpy.full(n,-1,dtype=numpy.intp)
+		c=c[inTree]
+		f=arrays.fromBus[c]
+		t=arrays.toBus[c]
+		toIsChild=self.parent[t] == f
+		self.parentBranch[numpy.where(toIsChild,t,f)]=c
+
+		# Depth and levels of the buses
+		self.depth=numpy.full(n,-1,dtype=numpy.intp)
+		self.depth[self.root]=0
+		for b in self.order[1:]:
+			self.depth[b]=self.depth[self.parent[b]]+1
+		byDepth=self.order[numpy.argsort(self.depth[self.order],kind='stable')]
+		bounds=numpy.searchsorted(self.depth[byDepth],numpy.arange(self.depth.max()+2))
+		self.levels=[byDepth[bounds[k]:bounds[k+1]] for k in range(len(bounds)-1)]
+
+	## @var root
+	# Index of the root bus.
+	## @var order
+	# Indexes of the buses of the tree in breadth first order from the root.
+	## @var reachable
+	# Boolean array of the buses in the tree.
+	## @var parent
+	# Index of the parent bus of each bus, -1 for the root and the buses not in the tree.
+	## @var parentBranch
+	# Index of the branch between each bus and its parent, -1 for the root and the buses not in the tree.
+	## @var depth
+	# Number of branches between each bus and the root, -1 for the buses not in the tree.
+	## @var levels
+	# List of arrays with the indexes of the buses at each depth.
@@ -2,9 +2,13 @@
 # Requires xlrd and networkx which can be installed with "pip3 install xlrd" and "pip install networkx".
 #@author Sebastien MATHIEU
 
-import xlrd
-import networkx
-from math import sqrt
+from math import sqrt, pi
+
+import instrumentation
+import lazyImport
+xlrd=lazyImport.lazyModule('xlrd')
+networkx=lazyImport.lazyModule('networkx')
+numpy=lazyImport.lazyModule('numpy')
 
 # Constants
 ## File with the information on the buses.
@@ -15,10 +19,15 @@ CABLES_FILE="cables.xlsx"
 LINES_FILE="feedersMT.xlsx"
 ## File with the information about the MV-LV transformers.
 LV_TRANSFORMERS_FILE="transfo MTBT.xlsx"
+## Base frequency of the network in Hz.
+BASE_FREQUENCY=50
+## Files read by makeNetwork.
+NETWORK_FILES=[BUSES_FILE,CABLES_FILE,LINES_FILE,LV_TRANSFORMERS_FILE]
 
 ## Read the buses excel file.
 # @param filePath Path to the buses excel file.
 # @param graph Networkx graph to which the buses should be added as nodes.
+@instrumentation.instrumented()
 def readBusesExcel(filePath,graph):
 	# Constants of the buses excel files
 	# Number of the column of the id of the bus in the bus file.
@@ -37,6 +46,7 @@ def readBusesExcel(filePath,graph):
 	xl = xlrd.open_workbook(filePath,on_demand=True)
 	busCount=1
 	for sheet in xl.sheets():
+		instrumentation.addRows(sheet.nrows-1)
 		for row in range(1,sheet.nrows):
 			id=excelStr2int(sheet.cell_value(row, BUS_ID_COLUMN))
 			v=sheet.cell_value(row, BUS_VOLTAGE_COLUMN)
@@ -65,6 +75,7 @@ def excelStr2int(s):
 ## Make the network structure from the parameters given in excel files.
 # @param folderPath Folder with the excel files.
 # @return Graph.
+@instrumentation.instrumented()
 def makeNetwork(folderPath):
 	graph=networkx.MultiGraph()
 
@@ -73,14 +84,14 @@ def makeNetwork(folderPath):
 	readLinesExcel(folderPath+LINES_FILE,cables,graph)
 	readLvTransformersExcel(folderPath+LV_TRANSFORMERS_FILE,graph)
 
-	#TODO: check graph is radial when accounting for open and closed lines.
-	#TODO: check sum of length of segments equals encoded line length
+	# The radiality when accounting for open and closed lines can be checked with checkRadiality.
 
 	return graph
 
 ## Read the cables excel file content.
 # @param filePath Path to the cables excel file.
 # @return Map of cables with their type as a key.
+@instrumentation.instrumented()
 def readCablesExcel(filePath):
 	# Constants of the cables excel files
 	# Number of the column of the type of the cable.
@@ -97,6 +108,7 @@ def readCablesExcel(filePath):
 
 	# Open and parse the cable sheet
 	sheet=xlrd.open_workbook(filePath,on_demand=True).sheet_by_index(0)
+	instrumentation.addRows(sheet.nrows-1)
 	cables={}
 	for row in range(1,sheet.nrows):
 		cableType=sheet.cell_value(row,CABLE_TYPE_COLUMN)
@@ -175,6 +187,7 @@ def getCable(cables, row, sheet):
 # @param filePath Path to the excel file with the information on the lines.
 # @param cables Cables data as a map.
 # @param graph Graph to add edges to.
+@instrumentation.instrumented()
 def readLinesExcel(filePath,cables,graph):
 	# Constants of the buses excel files
 	# Number of the column of the id of the line.
@@ -201,8 +214,11 @@ def readLinesExcel(filePath,cables,graph):
 	# Open and parse the line sheet
 	lineCount=1
 	sheet=xlrd.open_workbook(filePath,on_demand=True).sheet_by_index(0)
+	instrumentation.addRows(sheet.nrows-1)
 	unknownBuses=set()
 	openLines=set()
+	# Line data and list of segments as (cable, length) with the line id and the sorted buses as a key
+	lineSegments={}
 	for row in range(1,sheet.nrows):
 		# Line information
 		id=excelStr2int(sheet.cell_value(row, LINE_ID_COLUMN))
@@ -213,7 +229,9 @@ def readLinesExcel(filePath,cables,graph):
 			continue
 
 		cable = getCable(cables, row, sheet)
-		if graph.get_edge_data(fromBus,toBus,id) is None:
+		key = (id,min(fromBus,toBus),max(fromBus,toBus))
+		voltage=float(sheet.cell_value(row, LINE_VOLTAGE_COLUMN))
+		if key not in lineSegments:
 			# This is the first (and maybe only) segment of the link between these buses
 			fromBusBar = excelStr2int(sheet.cell_value(row, FROM_BUSBAR_COLUMN))
 			fromCell = excelStr2int(sheet.cell_value(row, FROM_CELL_COLUMN))
@@ -240,14 +258,10 @@ def readLinesExcel(filePath,cables,graph):
 			if not closed:
 				openLines.add(id)
 
-			# Get the length and compute the characteristics
+			# Get the length, the electrical characteristics are computed from the segments once all are read
 			lineAttr={}
 			lineAttr["id"]=id
 			lineAttr["length"]=float(sheet.cell_value(row, LINE_LENGTH_COLUMN))*1e-3 # in km
-			voltage=float(sheet.cell_value(row, LINE_VOLTAGE_COLUMN))
-			lineAttr["R1"]=lineAttr["length"]*cable.R1 # in Ohm
-			lineAttr["X1"]=lineAttr["length"]*cable.X1 # in Ohm
-			lineAttr["C1"]=lineAttr["length"]*cable.C1 # in microFarad
 			lineAttr["pMax"]=sqrt(3)*voltage*cable.iMax # in VA
 			lineAttr["internalId"]=lineCount
 			lineAttr["closed"]=closed
@@ -256,55 +270,21 @@ def readLinesExcel(filePath,cables,graph):
 
 			# Add the line to the list
 			graph.add_edge(fromBus,toBus,id,lineAttr)
+			lineSegments[key]=(graph.get_edge_data(fromBus,toBus,id),[])
 		else:
-			edgeData = graph.get_edge_data(fromBus,toBus,id)
-			# We have several segments, compute the overall impedance!!!
-			R1 = edgeData["R1"] # in Ohm
-			X1 = edgeData["X1"] # in Ohm
-			C1 = edgeData["C1"] # in microFarad
-
-			from math import pi
-			baseFrequency = 50
-			omega = 2*pi*baseFrequency
-
-			# First pi-model
-			Z1 = R1 + 1j*X1
-			B1 = omega*C1*1e-6
-
-			#Second pi-model
-			length = float(sheet.cell_value(row, SEGMENT_LENGTH_COLUMN))*1e-3
-			Z2 = length*cable.R1 + 1j *length*cable.X1
-			B2 = omega*length*cable.C1 * 1e-6
-
-			# Residual shunt admittance "in the middle"
-			Y3 = 1j*(B1+B2)/2
-
-			if abs(Y3) > 0:
-				# Start to triangle
-				Z3 = 1/Y3
-				YY1 = Z3/(Z1*Z2+Z1*Z3+Z2*Z3)
-				YY2 = Z2/(Z1*Z2+Z1*Z3+Z2*Z3)
-				YY3 = Z1/(Z1*Z2+Z1*Z3+Z2*Z3)
-
-				Y12 = YY2+1j*B1/2
-				Y13 = YY3+1j*B2/2
-
-				Yaverage23 = Y12+Y13/2
-				RR1=1/YY1
-				edgeData["R1"] = RR1.real # in Ohm
-				edgeData["X1"] = RR1.imag # in Ohm
-				edgeData["C1"] = Yaverage23.imag/omega * 1e6 # in microFarad
-			else:
-				# Just sum up the two line impedances
-				Z = Z1+Z2
-				edgeData["R1"] = Z.real # in Ohm
-				edgeData["X1"] = Z.imag # in Ohm
-				edgeData["C1"] = 0 # in microFarad
-
-			# Maximum capacity is the minimum of the capacity of the two segments
-			voltage=float(sheet.cell_value(row, LINE_VOLTAGE_COLUMN))
+			# Maximum capacity is the minimum of the capacity of the segments
+			edgeData = lineSegments[key][0]
 			edgeData["pMax"] = min(edgeData["pMax"], sqrt(3)*voltage*cable.iMax)
 
+		segmentLength=sheet.cell_value(row, SEGMENT_LENGTH_COLUMN)
+		segmentLength=float(segmentLength)*1e-3 if segmentLength != '' else None # in km
+		lineSegments[key][1].append((cable,segmentLength))
+
+	# Compute the overall impedance of the lines from their segments
+	mismatchLengths=setLinesImpedances(lineSegments.values())
+	if len(mismatchLengths) > 0:
+		print("%s lines with a sum of segment lengths different from the line length in the lines file \"%s\":\n\t%s"%(len(mismatchLengths),filePath,sorted(mismatchLengths)))
+
 	if len(unknownBuses) > 0:
 		print("%s unknown buses in the lines file \"%s\":\n\t%s"%(len(unknownBuses),filePath,sorted(unknownBuses)))
 	if len(openLines) > 0:
@@ -316,9 +296,87 @@ def readLinesExcel(filePath,cables,graph):
 		print("%s buses alone according to the lines file \"%s\":\n\t%s"%(len(aloneBuses),filePath,sorted(aloneBuses)))
 
 
+## Set the impedances of the lines from their segments.
+# Lines with a single segment take the characteristics of their cable over the line length. The segments of the other
+# lines are chained as pi-models and reduced at once by reducePiChains. The length of a segment which is not given is
+# the remaining length of the line.
+# @param lines Iterable of (line data, segments) where the segments are (cable, length in km or None).
+# @param tolerance Relative tolerance on the sum of the lengths of the segments.
+# @return Set of ids of the lines whose sum of segment lengths differs from the line length.
+def setLinesImpedances(lines,tolerance=0.01):
+	omega = 2*pi*BASE_FREQUENCY
+	mismatchLengths=set()
+	chains=[]
+	for lineAttr,segments in lines:
+		length=lineAttr["length"]
+
+		# Fill the unknown lengths and check the total length
+		knownLength=sum(l for c,l in segments if l is not None)
+		unknownCount=sum(1 for c,l in segments if l is None)
+		if unknownCount > 0:
+			remainingLength=max(0.0,length-knownLength)/unknownCount
+			segments=[(c,l if l is not None else remainingLength) for c,l in segments]
+		elif abs(knownLength-length) > tolerance*length+1e-3:
+			mismatchLengths.add(lineAttr["id"])
+
+		if len(segments) == 1:
+			cable=segments[0][0]
+			lineAttr["R1"]=length*cable.R1 # in Ohm
+			lineAttr["X1"]=length*cable.X1 # in Ohm
+			lineAttr["C1"]=length*cable.C1 # in microFarad
+		else:
+			chains.append((lineAttr,segments))
+
+	if len(chains) == 0:
+		return mismatchLengths
+
+	# Series impedances and shunt admittances of the segments, padded with null segments which are identities
+	maxSegments=max(len(segments) for lineAttr,segments in chains)
+	Z=numpy.zeros((len(chains),maxSegments),dtype=complex)
+	Y=numpy.zeros((len(chains),maxSegments),dtype=complex)
+	for i,(lineAttr,segments) in enumerate(chains):
+		for j,(cable,l) in enumerate(segments):
+			Z[i,j]=l*cable.R1+1j*l*cable.X1 # in Ohm
+			Y[i,j]=1j*omega*l*cable.C1*1e-6 # in Siemens
+
+	Zeq,Yeq=reducePiChains(Z,Y)
+	for i,(lineAttr,segments) in enumerate(chains):
+		lineAttr["R1"]=float(Zeq[i].real) # in Ohm
+		lineAttr["X1"]=float(Zeq[i].imag) # in Ohm
+		lineAttr["C1"]=float(Yeq[i].imag/omega*1e6) # in microFarad
+
+	return mismatchLengths
+
+## Reduce chains of pi-models to equivalent pi-models.
+# The two-port (ABCD) matrices of the segments are multiplied for all the chains at once. The equivalent pi-model has
+# the series impedance B and the total shunt admittance (A+D-2)/B, split equally on both ends.
+# @param Z Array of shape (chains, segments) with the series impedances, null for missing segments.
+# @param Y Array of shape (chains, segments) with the total shunt admittances, null for missing segments.
+# @return Tuple with the arrays of the equivalent series impedances and total shunt admittances.
+def reducePiChains(Z,Y):
+	Z=numpy.asarray(Z,dtype=complex)
+	Y=numpy.asarray(Y,dtype=complex)
+	A=numpy.ones(Z.shape[0],dtype=complex)
+	B=numpy.zeros(Z.shape[0],dtype=complex)
+	C=numpy.zeros(Z.shape[0],dtype=complex)
+	D=numpy.ones(Z.shape[0],dtype=complex)
+	for j in range(Z.shape[1]):
+		# Two-port of the segment
+		a=1+Z[:,j]*Y[:,j]/2
+		b=Z[:,j]
+		c=Y[:,j]*(1+Z[:,j]*Y[:,j]/4)
+
+		A,B,C,D=A*a+B*c,A*b+B*a,C*a+D*c,C*b+D*a
+
+	# Without series impedance, the shunt admittances are in parallel
+	zero=numpy.abs(B) < 1e-12
+	Yeq=numpy.where(zero,Y.sum(axis=1),(A+D-2)/numpy.where(zero,1,B))
+	return B,Yeq
+
 ## Read the lines excel file with the MV-LV transformers.
 # @param filePath Path to the excel file with the information on the transformers.
 # @param graph Graph to add edges to.
+@instrumentation.instrumented()
 def readLvTransformersExcel(filePath,graph):
 	# Constants of the transformers excel files
 	# Number of the column of the bus the transformer is attached to.
@@ -331,6 +389,7 @@ def readLvTransformersExcel(filePath,graph):
 	# Open and parse the transformer sheet
 	transformerCount=1
 	sheet=xlrd.open_workbook(filePath,on_demand=True).sheet_by_index(0)
+	instrumentation.addRows(sheet.nrows-1)
 	unknownBuses=set()
 	for row in range(1,sheet.nrows):
 		# Get the bus and check existence
@@ -384,6 +443,159 @@ class TransformerData:
 	# Maximal power of the transformer.
 
 ## Detect the buses at the end of the network without loads.
-def detectEndBuses(g):
+# @param g Network graph.
+# @param verbose If true, print the end buses.
+# @return Set of end buses.
+def detectEndBuses(g,verbose=True):
 	endBuses=set(filter(lambda n: len(g.neighbors(n)) == 1 and ('load' not in g.node[n] or g.node[n]['load'] is None), g.nodes()))
-	print("End buses:\n\t%s"%endBuses)
+	if verbose:
+		print("End buses:\n\t%s"%endBuses)
+	return endBuses
+
+## Disjoint-set forest (union-find) with union by size and path halving.
+class DisjointSet:
+	## Constructor.
+	# @param elements Initial elements, each in its own set.
+	def __init__(self,elements=()):
+		self.parent={}
+		self.size={}
+		for e in elements:
+			self.parent[e]=e
+			self.size[e]=1
+
+	## Find the representative of the set of an element, adding the element if unknown.
+	# @param e Element.
+	# @return Representative element.
+	def find(self,e):
+		parent=self.parent
+		if e not in parent:
+			parent[e]=e
+			self.size[e]=1
+			return e
+		while parent[e] != e:
+			parent[e]=parent[parent[e]]
+			e=parent[e]
+		return e
+
+	## Merge the sets of two elements.
+	# @param e1 First element.
+	# @param e2 Second element.
+	# @return True if the sets were merged, False if the elements were already in the same set.
+	def union(self,e1,e2):
+		r1=self.find(e1)
+		r2=self.find(e2)
+		if r1 == r2:
+			return False
+		if self.size[r1] < self.size[r2]:
+			r1,r2=r2,r1
+		self.parent[r2]=r1
+		self.size[r1]+=self.size[r2]
+		return True
+
+	## @var parent
+	# Parent of each element in the forest.
+	## @var size
+	# Size of the set of each representative.
+
+## Check the network is radial and connected when accounting only for the closed lines.
+# Runs in near-linear time in the number of buses and lines with a union-find over the closed lines.
+# @param graph Network graph.
+# @param root Bus from which the buses should be reachable, e.g. 8001. If None, the largest component is taken as reference.
+# @return RadialityReport.
+def checkRadiality(graph,root=None):
+	sets=DisjointSet(graph.nodes())
+	forest={}
+	cycleLines=[]
+	openLines=[]
+	for u,v,key,edata in graph.edges(keys=True,data=True):
+		if not edata.get("closed",True):
+			openLines.append((u,v,key))
+		elif sets.union(u,v):
+			forest.setdefault(u,[]).append(v)
+			forest.setdefault(v,[]).append(u)
+		else:
+			cycleLines.append((u,v,key))
+
+	# Connected components
+	components={}
+	for n in graph.nodes():
+		components.setdefault(sets.find(n),set()).add(n)
+	components=sorted(components.values(),key=len,reverse=True)
+	if root is not None and not graph.has_node(root):
+		raise Exception('Root bus %s not in the network.'%root)
+	reference=sets.find(root) if root is not None else (sets.find(next(iter(components[0]))) if len(components) > 0 else None)
+	islands=[c for c in components if sets.find(next(iter(c))) != reference]
+	unreachableBuses=set()
+	for c in islands:
+		unreachableBuses.update(c)
+
+	# Spanning forest rooted at the reference bus, then at any bus of the islands
+	parent={}
+	depth={}
+	starts=[root] if root is not None else []
+	starts+=[next(iter(c)) for c in components]
+	for s in starts:
+		if s in depth:
+			continue
+		parent[s]=None
+		depth[s]=0
+		stack=[s]
+		while len(stack) > 0:
+			n=stack.pop()
+			for m in forest.get(n,()):
+				if m not in depth:
+					parent[m]=n
+					depth[m]=depth[n]+1
+					stack.append(m)
+
+	# Cycle closed by each line not in the spanning forest
+	cycles=[]
+	for u,v,key in cycleLines:
+		uPath=[u]
+		vPath=[v]
+		while uPath[-1] != vPath[-1]:
+			if depth[uPath[-1]] >= depth[vPath[-1]]:
+				uPath.append(parent[uPath[-1]])
+			else:
+				vPath.append(parent[vPath[-1]])
+		cycles.append(uPath+vPath[-2::-1])
+
+	return RadialityReport(root,cycles,cycleLines,islands,unreachableBuses,openLines)
+
+## Result of checkRadiality.
+class RadialityReport:
+	## Constructor.
+	# @param root Reference bus.
+	# @param cycles List of cycles as lists of buses.
+	# @param cycleLines Lines closing each cycle as (from bus, to bus, line id).
+	# @param islands Components not connected to the reference bus, as sets of buses.
+	# @param unreachableBuses Buses not connected to the reference bus.
+	# @param openLines Open lines as (from bus, to bus, line id).
+	def __init__(self,root,cycles,cycleLines,islands,unreachableBuses,openLines):
+		self.root=root
+		self.cycles=cycles
+		self.cycleLines=cycleLines
+		self.islands=islands
+		self.unreachableBuses=unreachableBuses
+		self.openLines=openLines
+
+	## Check the network is radial and connected.
+	# @return True if the closed lines form a tree.
+	def isRadial(self):
+		return len(self.cycles) == 0 and len(self.islands) == 0
+
+	def __str__(self):
+		return "%s cycles, %s islands, %s unreachable buses, %s open lines"%(len(self.cycles),len(self.islands),len(self.unreachableBuses),len(self.openLines))
+
+	## @var root
+	# Reference bus, None if the largest component is the reference.
+	## @var cycles
+	# List of cycles as lists of buses, the first and last buses are the ends of the line closing the cycle.
+	## @var cycleLines
+	# Lines closing each cycle as (from bus, to bus, line id).
+	## @var islands
+	# Components not connected to the reference bus, as sets of buses, by decreasing size.
+	## @var unreachableBuses
+	# Buses not connected to the reference bus.
+	## @var openLines
+	# Open lines as (from bus, to bus, line id).
@@ -0,0 +1,195 @@
+## Reduction of the network topology by removing the passive buses.
+# Dead-end buses without load are removed and series chains through buses without load and with two neighbours are
+# merged into equivalent branches. A ReductionMap keeps the link with the original buses and branches so that the
+# results computed on the reduced network can be expanded back.
+# Requires numpy which can be installed with "pip3 install numpy".
+#@author Sebastien MATHIEU
+
+import copy
+from math import pi
+
+import numpy
+
+import networkMaker
+import networkArrays
+
+## Reduce a network.
+# A bus is passive if it has no load, is not kept and all its lines are closed. Passive dead-end buses are removed
+# iteratively, then chains of passive buses connected to exactly two lines of the same voltage level are merged into a
+# single line whose pi-model is the reduction of the pi-models of the chain. The charging of the lines of the removed
+# dead ends is neglected.
+# @param graph Network graph, with the loads of the scenario if any.
+# @param keep Buses to keep in the reduced network, such as the root bus.
+# @return Tuple with the reduced graph and the ReductionMap.
+def reduceNetwork(graph,keep=(networkArrays.ROOT_BUS,)):
+	reduced=copy.deepcopy(graph)
+	reduction=ReductionMap()
+	keep=set(keep)
+
+	def isPassive(n):
+		ndata=reduced.node[n]
+		if n in keep or ndata.get('load') is not None:
+			return False
+		return all(edata.get('closed',True) for m,edges in reduced[n].items() for edata in edges.values())
+
+	# Remove the dead ends, starting from the end buses
+	anchors={}
+	candidates=[n for n in networkMaker.detectEndBuses(reduced,verbose=False) if isPassive(n)]
+	while len(candidates) > 0:
+		n=candidates.pop()
+		if not reduced.has_node(n) or len(reduced.neighbors(n)) != 1 or not isPassive(n):
+			continue
+		m=reduced.neighbors(n)[0]
+		for key in reduced[n][m]:
+			reduction.removedBranches.add((m,n,key))
+		reduced.remove_node(n)
+		anchors[n]=m
+		if len(reduced.neighbors(m)) == 1 and isPassive(m):
+			candidates.append(m)
+
+	# Buses of the removed dead ends are represented by the bus their branch was hanging from
+	for n in anchors:
+		m=anchors[n]
+		while m in anchors:
+			m=anchors[m]
+		reduction.removedBuses[n]=m
+
+	# Find the chains of passive buses with two lines
+	def isChainBus(n):
+		neighbors=reduced.neighbors(n)
+		if len(neighbors) != 2 or reduced.degree(n) != 2 or not isPassive(n):
+			return False
+		baseVoltage=reduced.node[n].get('baseVoltage')
+		return all(reduced.node[m].get('baseVoltage') == baseVoltage for m in neighbors)
+
+	visited=set()
+	chains=[]
+	for n in reduced.nodes():
+		if n in visited or not isChainBus(n):
+			continue
+
+		# Walk to both ends of the chain
+		ends=[]
+		loop=False
+		for start in reduced.neighbors(n):
+			path=[n]
+			previous,current=n,start
+			while current not in visited and current != n and isChainBus(current):
+				path.append(current)
+				visited.add(current)
+				previous,current=current,[m for m in reduced.neighbors(current) if m != previous][0]
+			if current == n:
+				loop=True # Isolated loop of passive buses, the walk came back to its start
+				break
+			ends.append((current,path))
+		visited.add(n)
+		if loop:
+			continue # Loop of passive buses, left unchanged
+
+		# Ordered buses and branches from one end to the other
+		(a,pathA),(b,pathB)=ends
+		buses=[a]+pathA[:0:-1]+pathB+[b]
+		if a == b:
+			continue # Loop of passive buses through a single other bus, left unchanged
+		branches=[(buses[i],buses[i+1],list(reduced[buses[i]][buses[i+1]].keys())[0]) for i in range(len(buses)-1)]
+		chains.append((buses,branches))
+
+	if len(chains) == 0:
+		return reduced,reduction
+
+	# Equivalent pi-models of all the chains at once
+	omega=2*pi*networkMaker.BASE_FREQUENCY
+	maxBranches=max(len(branches) for buses,branches in chains)
+	Z=numpy.zeros((len(chains),maxBranches),dtype=complex)
+	Y=numpy.zeros((len(chains),maxBranches),dtype=complex)
+	for i,(buses,branches) in enumerate(chains):
+		for j,(u,v,key) in enumerate(branches):
+			edata=reduced[u][v][key]
+			Z[i,j]=edata['R1']+1j*edata['X1'] # in Ohm
+			Y[i,j]=1j*omega*edata['C1']*1e-6 # in Siemens
+	Zeq,Yeq=networkMaker.reducePiChains(Z,Y)
+
+	# Replace the chains
+	for i,(buses,branches) in enumerate(chains):
+		first=reduced[branches[0][0]][branches[0][1]][branches[0][2]]
+		lineAttr=dict(first)
+		lineAttr["length"]=sum(reduced[u][v][key]["length"] for u,v,key in branches) # in km
+		lineAttr["pMax"]=min(reduced[u][v][key]["pMax"] for u,v,key in branches) # in VA
+		lineAttr["R1"]=float(Zeq[i].real) # in Ohm
+		lineAttr["X1"]=float(Zeq[i].imag) # in Ohm
+		lineAttr["C1"]=float(Yeq[i].imag/omega*1e6) # in microFarad
+
+		a,b=buses[0],buses[-1]
+		branch=(a,b,branches[0][2])
+		reduction.mergedBranches[branch]=branches
+
+		# Position of the buses along the chain relative to the series impedance
+		cumulative=numpy.cumsum(numpy.abs(Z[i,:len(branches)]))
+		for n,position in zip(buses[1:-1],cumulative[:-1]/max(cumulative[-1],1e-12)):
+			reduction.chainBuses[n]=(branch,float(position))
+
+		reduced.remove_nodes_from(buses[1:-1])
+		reduced.add_edge(a,b,branches[0][2],lineAttr)
+
+	return reduced,reduction
+
+## Set the loads of the original network on its reduced network.
+# The reduction only depends on the topology and on the buses with a load, which are the same for every day of a year
+# and scenario, so that the network is reduced once and the loads of each day are set on the reduced graph.
+# @param reduced Reduced graph from reduceNetwork, modified.
+# @param reduction ReductionMap of the reduced graph.
+# @param graph Original network graph with the loads of the day.
+# @return The reduced graph with the loads of the day.
+def updateLoads(reduced,reduction,graph):
+	removed=[n for n in list(reduction.removedBuses)+list(reduction.chainBuses) if graph.node[n].get('load') is not None]
+	if len(removed) > 0:
+		raise Exception('Buses %s with a load were removed by the reduction, reduce the network again.' % removed)
+	for n,ndata in reduced.nodes(data=True):
+		if 'load' in graph.node[n]:
+			ndata['load']=graph.node[n]['load']
+	return reduced
+
+## Link between a reduced network and the original one.
+class ReductionMap:
+	## Constructor.
+	def __init__(self):
+		self.removedBuses={}
+		self.removedBranches=set()
+		self.chainBuses={}
+		self.mergedBranches={}
+
+	## Expand values of the buses of the reduced network to the original buses.
+	# Removed dead-end buses take the value of their anchor bus, buses of merged chains are interpolated between the ends
+	# of the chain relative to the series impedance.
+	# @param values Dictionary of values with the reduced buses as keys, the values support the addition and the multiplication by a scalar.
+	# @return Dictionary with the original buses as keys.
+	def expandBusValues(self,values):
+		expanded=dict(values)
+		for n,((a,b,key),position) in self.chainBuses.items():
+			expanded[n]=(1-position)*values[a]+position*values[b]
+		for n,m in self.removedBuses.items():
+			expanded[n]=expanded[m]
+		return expanded
+
+	## Expand values of the branches of the reduced network to the original branches.
+	# The branches of a merged chain take the value of the equivalent branch, the branches of removed dead ends have a
+	# null value.
+	# @param values Dictionary of values with the reduced branches (from bus, to bus, line id) as keys.
+	# @return Dictionary with the original branches as keys.
+	def expandBranchValues(self,values):
+		expanded={}
+		for branch,value in values.items():
+			for original in self.mergedBranches.get(branch,[branch]):
+				expanded[original]=value
+		for branch in self.removedBranches:
+			expanded[branch]=0*next(iter(values.values())) if len(values) > 0 else 0
+		return expanded
+
+	## @var removedBuses
+	# Removed dead-end buses with the bus of the reduced network representing them.
+	## @var removedBranches
+	# Set of branches of the removed dead ends as (anchor bus, removed bus, line id).
+	## @var chainBuses
+	# Buses of the merged chains with their equivalent branch and position along it, from 0 at its "from" bus to 1 at its "to" bus.
+	## @var mergedBranches
+	# Equivalent branches with the list of original branches of the chain as (from bus, to bus, line id), ordered from the "from" bus.
@@ -0,0 +1,250 @@
+## Output sinks writing the cases of the year mode in a folder, a zip archive or a chunked container.
+# A year of cases is 35,040 small files. The zip archive and the chunked container write them in a single compressed
+# file with an index, so that a single case can be read back by its name without extracting the others.
+# The chunked container compresses each case with zstd if the zstandard package is installed ("pip3 install zstandard")
+# and with gzip otherwise.
+#@author Sebastien MATHIEU
+
+import sys, os, io, json, struct, zlib, zipfile
+
+try:
+	import zstandard
+except ImportError: # Optional, gzip is used instead
+	zstandard = None
+
+import instrumentation
+
+## Extension of the zip archives.
+ZIP_EXTENSION=".zip"
+## Extension of the chunked containers.
+CHUNKED_EXTENSION=".chunks"
+## Magic bytes at the start of a chunked container.
+CHUNKED_MAGIC=b"YLPICCHK"
+## Format of the footer of a chunked container: offset and size of the index.
+CHUNKED_FOOTER=struct.Struct("<QQ")
+
+## Entry point of the program.
+# @param argv Program parameters.
+def main(argv):
+	if len(argv) < 1:
+		displayHelp()
+		sys.exit(2)
+	if len(argv) == 1:
+		for name in listCases(argv[0]):
+			print(name)
+	else:
+		sys.stdout.write(readCase(argv[0],argv[1]))
+
+## Display help of the program.
+def displayHelp():
+	text="Usage :\n\tpython3 outputSinks.py sink [caseName]\n"
+	text+="\nList the cases of a sink or print a case. A sink is a folder, a zip archive (%s) or a chunked container (%s).\n"%(ZIP_EXTENSION,CHUNKED_EXTENSION)
+	print(text)
+
+## Open a sink to write cases, the type of sink depends on the extension of its path.
+# @param path Path of a folder, of a zip archive or of a chunked container.
+# @param compression Compression of the chunked container, 'zstd' or 'gzip'. If None, zstd if available.
+# @return FolderSink, ZipSink or ChunkedSink.
+def openSink(path,compression=None):
+	if path.endswith(ZIP_EXTENSION):
+		return ZipSink(path)
+	elif path.endswith(CHUNKED_EXTENSION):
+		return ChunkedSink(path,compression)
+	return FolderSink(path)
+
+## List the cases of a sink.
+# @param path Path of the sink.
+# @return List of the case names.
+def listCases(path):
+	if path.endswith(ZIP_EXTENSION):
+		with zipfile.ZipFile(path) as archive:
+			return archive.namelist()
+	elif path.endswith(CHUNKED_EXTENSION):
+		return list(readChunkedIndex(path)["cases"].keys())
+	return sorted(os.listdir(path))
+
+## Read a case of a sink.
+# @param path Path of the sink.
+# @param name Name of the case.
+# @return Content of the case.
+def readCase(path,name):
+	if path.endswith(ZIP_EXTENSION):
+		with zipfile.ZipFile(path) as archive:
+			return archive.read(name).decode('utf-8')
+	elif path.endswith(CHUNKED_EXTENSION):
+		index=readChunkedIndex(path)
+		if name not in index["cases"]:
+			raise Exception('Case "%s" not in "%s".'%(name,path))
+		offset,size=index["cases"][name]
+		with open(path,'rb') as file:
+			file.seek(offset)
+			return decompress(file.read(size),index["compression"]).decode('utf-8')
+	with open(os.path.join(path,name)) as file:
+		return file.read()
+
+## Read the index of a chunked container.
+# @param path Path of the container.
+# @return Dictionary with the compression and the offset and size of each case.
+def readChunkedIndex(path):
+	with open(path,'rb') as file:
+		if file.read(len(CHUNKED_MAGIC)) != CHUNKED_MAGIC:
+			raise Exception('"%s" is not a chunked container.'%path)
+		file.seek(-CHUNKED_FOOTER.size,os.SEEK_END)
+		offset,size=CHUNKED_FOOTER.unpack(file.read(CHUNKED_FOOTER.size))
+		file.seek(offset)
+		return json.loads(file.read(size).decode('utf-8'))
+
+## Decompress a case of a chunked container.
+# @param data Compressed bytes.
+# @param compression Compression, 'zstd' or 'gzip'.
+# @return Bytes.
+def decompress(data,compression):
+	if compression == 'zstd':
+		if zstandard is None:
+			raise Exception('The zstandard package is required to read zstd containers.')
+		return zstandard.ZstdDecompressor().decompress(data)
+	return zlib.decompress(data,zlib.MAX_WBITS|16)
+
+## Text file of a case, stored in its sink when closed.
+class SinkFile(io.StringIO):
+	## Constructor.
+	# @param sink Sink of the case.
+	# @param name Name of the case.
+	def __init__(self,sink,name):
+		io.StringIO.__init__(self)
+		self.sink=sink
+		self.name=name
+
+	## Store the content in the sink and close the file.
+	def close(self):
+		if not self.closed:
+			self.sink.write(self.name,self.getvalue().encode('utf-8'))
+		io.StringIO.close(self)
+
+## Sink writing each case in a file of a folder.
+class FolderSink:
+	## Constructor.
+	# @param path Path of the folder.
+	def __init__(self,path):
+		self.path=path
+		if not os.path.exists(path):
+			os.makedirs(path)
+
+	## Open a case to write it.
+	# @param name Name of the case.
+	# @return Text file.
+	def open(self,name):
+		return open(os.path.join(self.path,name),'w')
+
+	## Close the sink.
+	def close(self):
+		pass
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self,*args):
+		self.close()
+
+## Sink keeping the cases in memory.
+class MemorySink(FolderSink):
+	## Constructor.
+	def __init__(self):
+		self.cases={}
+
+	## Open a case to write it.
+	# @param name Name of the case.
+	# @return Text file, stored in the sink when closed.
+	def open(self,name):
+		return SinkFile(self,name)
+
+	## Write a case.
+	# @param name Name of the case.
+	# @param data Bytes of the case.
+	def write(self,name,data):
+		self.cases[name]=data
+
+	## @var cases
+	# Bytes of each case by name.
+
+## Sink writing the cases in a deflate compressed zip archive.
+class ZipSink(FolderSink):
+	## Constructor.
+	# @param path Path of the archive.
+	def __init__(self,path):
+		folder=os.path.dirname(path)
+		if folder != '' and not os.path.exists(folder):
+			os.makedirs(folder)
+		self.path=path
+		self.archive=zipfile.ZipFile(path,'w',zipfile.ZIP_DEFLATED)
+
+	## Open a case to write it.
+	# @param name Name of the case.
+	# @return Text file, written in the archive when closed.
+	def open(self,name):
+		return SinkFile(self,name)
+
+	## Write a case.
+	# @param name Name of the case.
+	# @param data Bytes of the case.
+	def write(self,name,data):
+		self.archive.writestr(name,data)
+		instrumentation.addBytes(self.archive.getinfo(name).compress_size)
+
+	## Close the sink and write the index of the archive.
+	def close(self):
+		self.archive.close()
+
+## Sink writing the cases compressed one by one in a single container followed by its index.
+# The container starts with CHUNKED_MAGIC, then the compressed cases, the JSON index and the footer CHUNKED_FOOTER.
+class ChunkedSink(ZipSink):
+	## Constructor.
+	# @param path Path of the container.
+	# @param compression Compression, 'zstd' or 'gzip'. If None, zstd if available.
+	def __init__(self,path,compression=None):
+		folder=os.path.dirname(path)
+		if folder != '' and not os.path.exists(folder):
+			os.makedirs(folder)
+		if compression is None:
+			compression='zstd' if zstandard is not None else 'gzip'
+		if compression == 'zstd' and zstandard is None:
+			raise Exception('The zstandard package is required for the zstd compression.')
+		self.path=path
+		self.compression=compression
+		self.compressor=zstandard.ZstdCompressor() if compression == 'zstd' else None
+		self.index={}
+		self.file=open(path+".tmp",'wb')
+		self.file.write(CHUNKED_MAGIC)
+
+	## Write a case.
+	# @param name Name of the case.
+	# @param data Bytes of the case.
+	def write(self,name,data):
+		if self.compressor is not None:
+			data=self.compressor.compress(data)
+		else:
+			compressor=zlib.compressobj(6,zlib.DEFLATED,zlib.MAX_WBITS|16)
+			data=compressor.compress(data)+compressor.flush()
+		self.index[name]=(self.file.tell(),len(data))
+		self.file.write(data)
+		instrumentation.addBytes(len(data))
+
+	## Close the sink, write the index and move the container to its path.
+	def close(self):
+		if self.file.closed:
+			return
+		index=json.dumps({"compression":self.compression,"cases":self.index}).encode('utf-8')
+		offset=self.file.tell()
+		self.file.write(index)
+		self.file.write(CHUNKED_FOOTER.pack(offset,len(index)))
+		self.file.close()
+		os.replace(self.path+".tmp",self.path)
+
+	## @var compression
+	# Compression of the cases, 'zstd' or 'gzip'.
+	## @var index
+	# Offset and size of each case in the container.
+
+# Starting point from python #
+if __name__ == "__main__":
+	main(sys.argv[1:])
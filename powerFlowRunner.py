@@ -0,0 +1,244 @@
+## Run the radial power flow of every period of a year with a pool of processes.
+# The year is split in chunks of consecutive days solved by worker processes. Each period of a day is warm-started from
+# the voltages of the same period of the previous day and the results are written in memory-mapped arrays shared by the workers.
+# With the option --shared, the network arrays and the injection store are published once in a dataPlane to which the
+# workers attach, so that they neither read the Excel files nor unpickle the network.
+# Requires numpy and scipy which can be installed with "pip3 install numpy scipy".
+#@author Sebastien MATHIEU
+
+import sys, os, time, json
+import multiprocessing
+
+import numpy
+
+import networkMaker
+import scenariosReader
+import networkArrays
+import radialPowerFlow
+import injectionStore
+import dataPlane
+import daySelector
+import flowSensitivity
+import cacheFolders
+
+## Number of periods of a day.
+T=96
+## Default number of days of a chunk.
+CHUNK_DAYS=7
+## File with the voltages in the output folder.
+VOLTAGES_FILE="voltages.npy"
+## File with the flows in the output folder.
+FLOWS_FILE="flows.npy"
+## File with the description of the arrays in the output folder.
+DESCRIPTION_FILE="powerflow.json"
+
+# State of a worker process, set by initWorker.
+workerState={}
+
+## Entry point of the program.
+# @param argv Program parameters.
+def main(argv):
+	# Options
+	workers=None
+	chunkDays=CHUNK_DAYS
+	shared=False
+	screen=None
+	days,argv=daySelector.daysOption(argv)
+	argv=cacheFolders.cacheFolderOption(argv)
+	options=[a for a in argv if a.startswith('--')]
+	argv=[a for a in argv if not a.startswith('--')]
+	for o in options:
+		if o.startswith('--workers='):
+			workers=int(o[len('--workers='):])
+		elif o.startswith('--chunk='):
+			chunkDays=int(o[len('--chunk='):])
+		elif o == '--shared':
+			shared=True
+		elif o.startswith('--screen'):
+			screen=float(o[len('--screen='):]) if o.startswith('--screen=') else flowSensitivity.MARGIN
+		else:
+			displayHelp()
+			sys.exit(2)
+
+	if len(argv) < 4:
+		displayHelp()
+		sys.exit(2)
+	folderPath=argv[0] if argv[0].endswith(("/","\\")) else argv[0]+"/"
+	if not os.path.exists(folderPath):
+		raise Exception('Folder \"%s\" does not exists.' % folderPath)
+	year=int(argv[1])
+	scenario=argv[2]
+	outputPath=argv[3]
+	root=int(argv[4]) if len(argv) > 4 else networkArrays.ROOT_BUS
+
+	runYear(folderPath,year,scenario,outputPath,root=root,workers=workers,chunkDays=chunkDays,days=days,shared=shared,screen=screen)
+
+## Display help of the program.
+def displayHelp():
+	text="Usage :\n\tpython3 powerFlowRunner.py dataFolder year scenario outputFolder [rootBusId] [--workers=N] [--chunk=days] [--shared] [--days=days] [--screen[=margin]] [--cache-folder=folder]\n"
+	text+="\nThe voltages and flows of every period are written in \"%s\" and \"%s\" of shape (periods, buses) and (periods, branches).\n"%(VOLTAGES_FILE,FLOWS_FILE)
+	text+="With --shared, the injections are computed from the injection store of the year, published with the network arrays in shared memory.\n"
+	text+="With --days=1-31,45 or --days=selection.csv, a file written by daySelector, only these days of the year are solved.\n"
+	text+="With --screen, only the days with a branch above the margin (%.2f by default) of its capacity in the screening of\n" % flowSensitivity.MARGIN
+	text+="flowSensitivity are solved.\n"
+	print(text)
+
+## Run the power flow of every period of a year.
+# @param folderPath Folder with the excel files.
+# @param year Year of the scenarios.
+# @param scenario Type of scenario. Usually 'L' or 'H'.
+# @param outputPath Folder of the memory-mapped result arrays.
+# @param root Id of the slack bus.
+# @param workers Number of worker processes, the number of cores if None.
+# @param chunkDays Number of consecutive days solved by a worker with warm starts.
+# @param days Days of the year, the scenariosReader.YEAR_DAYS days of the converters if None.
+# @param shared If true, the workers attach to the network arrays and the injection store published in a dataPlane.
+# @param screen Margin of the screening of the flows, only the days with a branch above the margin of its capacity are solved. None to solve all the days.
+# @return Throughput in snapshots per second.
+def runYear(folderPath,year,scenario,outputPath,root=networkArrays.ROOT_BUS,workers=None,chunkDays=CHUNK_DAYS,days=None,shared=False,screen=None):
+	tic=time.time()
+	if days is None:
+		days=list(range(1,scenariosReader.YEAR_DAYS+1))
+	if workers is None:
+		workers=os.cpu_count() or 1
+	if not os.path.exists(outputPath):
+		os.makedirs(outputPath)
+
+	# Shapes of the results from the network
+	graph=networkMaker.makeNetwork(folderPath)
+	arrays=networkArrays.makeNetworkArrays(graph)
+	networkArrays.makeRadialTree(arrays,root) # Check the network is radial before starting the workers
+
+	# Days with a period flagged by the screening of the flows
+	if screen is not None:
+		screening=flowSensitivity.makeFlowSensitivity(graph,root).screenStore(injectionStore.openStore(folderPath,year,scenario),days,screen)
+		days=screening.congestedDays()
+		print("%s periods on %s days flagged by the screening" % (len(screening.congestedPeriods()),len(days)))
+		if len(days) == 0:
+			return 0
+
+	# Memory-mapped results, one row per period
+	voltagesPath=os.path.join(outputPath,VOLTAGES_FILE)
+	flowsPath=os.path.join(outputPath,FLOWS_FILE)
+	numpy.lib.format.open_memmap(voltagesPath,mode='w+',dtype=complex,shape=(len(days)*T,len(arrays.buses))).flush()
+	numpy.lib.format.open_memmap(flowsPath,mode='w+',dtype=complex,shape=(len(days)*T,len(arrays.branches))).flush()
+	with open(os.path.join(outputPath,DESCRIPTION_FILE),'w') as file:
+		json.dump({"year":year,"scenario":scenario,"root":root,"periods":T,"days":days,
+					"buses":arrays.buses,"branches":arrays.branches},file)
+
+	# Chunks of consecutive days with their first row in the results
+	chunks=[(i*T,days[i:i+chunkDays]) for i in range(0,len(days),chunkDays)]
+
+	# Data published once for the workers
+	plane=None
+	initializer,initArgs=initWorker,(folderPath,year,scenario,root,voltagesPath,flowsPath)
+	if shared:
+		plane=dataPlane.DataPlane()
+		dataPlane.publishNetworkArrays(plane,arrays)
+		dataPlane.publishInjectionStore(plane,injectionStore.openStore(folderPath,year,scenario))
+		initializer,initArgs=initSharedWorker,(plane.descriptor,root,voltagesPath,flowsPath)
+
+	# Solve
+	snapshots=0
+	print("Power flow of %s days with %s workers" % (len(days),workers))
+	if workers == 1:
+		# The network read above is used by the worker of this process
+		if shared:
+			initializer(*initArgs)
+		else:
+			initializer(*initArgs,graph=graph,arrays=arrays)
+		results=map(solveChunk,chunks)
+	else:
+		pool=multiprocessing.Pool(workers,initializer,initArgs)
+		results=pool.imap_unordered(solveChunk,chunks)
+	try:
+		for solvedDays,chunkSnapshots,seconds in results:
+			snapshots+=chunkSnapshots
+			print("\tdays %s-%s: %.1f snapshots/s" % (solvedDays[0],solvedDays[-1],chunkSnapshots/seconds))
+	finally:
+		if workers != 1:
+			pool.close()
+			pool.join()
+		elif shared:
+			workerState.pop("view").detach()
+		if plane is not None:
+			plane.release()
+
+	elapsed=time.time()-tic
+	throughput=snapshots/elapsed
+	print('%s snapshots solved in %.2fs: %.1f snapshots/s' % (snapshots,elapsed,throughput))
+	return throughput
+
+## Initialize a worker process by reading the network and opening the result arrays.
+# @param folderPath Folder with the excel files.
+# @param year Year of the scenarios.
+# @param scenario Type of scenario.
+# @param root Id of the slack bus.
+# @param voltagesPath Path to the voltages array.
+# @param flowsPath Path to the flows array.
+# @param graph Network graph already read, which is modified, read from the folder if None.
+# @param arrays Array model of the graph, made from the graph if None.
+def initWorker(folderPath,year,scenario,root,voltagesPath,flowsPath,graph=None,arrays=None):
+	if graph is None:
+		graph=networkMaker.makeNetwork(folderPath)
+	if arrays is None:
+		arrays=networkArrays.makeNetworkArrays(graph)
+	workerState.update({"folderPath":folderPath,"year":year,"scenario":scenario,"graph":graph,"arrays":arrays,
+						"tree":networkArrays.makeRadialTree(arrays,root),
+						"voltages":numpy.load(voltagesPath,mmap_mode='r+'),"flows":numpy.load(flowsPath,mmap_mode='r+')})
+
+## Initialize a worker process by attaching to the data plane and opening the result arrays.
+# @param descriptor PlaneDescriptor of the plane with the network arrays and the injection store.
+# @param root Id of the slack bus.
+# @param voltagesPath Path to the voltages array.
+# @param flowsPath Path to the flows array.
+def initSharedWorker(descriptor,root,voltagesPath,flowsPath):
+	view=dataPlane.attach(descriptor)
+	arrays=dataPlane.attachNetworkArrays(view)
+	workerState.update({"view":view,"arrays":arrays,"store":dataPlane.attachInjectionStore(view),
+						"tree":networkArrays.makeRadialTree(arrays,root),
+						"voltages":numpy.load(voltagesPath,mmap_mode='r+'),"flows":numpy.load(flowsPath,mmap_mode='r+')})
+
+## Get the injections of a day in a worker.
+# @param day Day of the year.
+# @return Tuple of arrays of shape (periods, buses) with the active injections in MW and the reactive injections in MVar.
+def dayInjections(day):
+	arrays=workerState["arrays"]
+	if "store" in workerState:
+		P,Q=workerState["store"].query(arrays.buses,day)
+		return P/1e3,Q/1e3 # Convert from kW to MW as in networkArrays.makeInjections
+	graph=workerState["graph"]
+	scenariosReader.clearLoads(graph)
+	scenariosReader.readScenarios(workerState["folderPath"],workerState["year"],day,graph,workerState["scenario"])
+	return networkArrays.makeInjections(graph,arrays,T)
+
+## Solve a chunk of consecutive days in a worker.
+# The first day starts from a flat voltage profile, each period of the following days from the voltages of the same period
+# of the previous day, whose injections follow the same daily pattern.
+# @param chunk Tuple with the first row of the chunk in the results and the list of days.
+# @return Tuple with the days, the number of snapshots and the computation time in seconds.
+def solveChunk(chunk):
+	tic=time.time()
+	row,days=chunk
+	arrays=workerState["arrays"]
+	tree=workerState["tree"]
+
+	initialVoltages=None
+	for d in days:
+		P,Q=dayInjections(d)
+		result=radialPowerFlow.solveRadialPowerFlow(arrays,tree,P,Q,initialVoltages=initialVoltages)
+		if not result.converged:
+			print("Warning: power flow of day %s not converged after %s iterations." % (d,result.iterations))
+
+		workerState["voltages"][row:row+T]=result.voltages
+		workerState["flows"][row:row+T]=result.flows
+		initialVoltages=result.voltages
+		row+=T
+
+	workerState["voltages"].flush()
+	workerState["flows"].flush()
+	return days,len(days)*T,time.time()-tic
+
+# Starting point from python #
+if __name__ == "__main__":
+	main(sys.argv[1:])
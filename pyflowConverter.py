@@ -9,15 +9,44 @@
 #TODO Shunt admittances at buses
 
 import sys, os, copy
-import networkx
 import math
 
 import networkMaker
 import scenariosReader
+import instrumentation
+import outputSinks
+import daySelector
+import lazyImport
+numpy=lazyImport.lazyModule('numpy')
+networkReducer=lazyImport.lazyModule('networkReducer')
+
+## System MVA base.
+BASE_MVA = 100 # MVA
+## Base frequency.
+BASE_FREQUENCY = 50 # Hz
+## Lower operational limit of the voltage.
+V_LIMIT_DOWN = 0.95
+## Upper operational limit of the voltage.
+V_LIMIT_UP = 1.05
 
 ## Entry point of the program.
 # @param argv Program parameters: data folder path, slack bus id, period of interest (scenario hardcoded for now).
 def main(argv):
+	# Binary export of the cases
+	binary="--npy" in argv
+	# Remove the passive buses before writing the cases
+	reduce="--reduce" in argv
+	# Stream the days through a single graph, with an optional memory budget in MB
+	stream=any(a.startswith("--stream") for a in argv)
+	memoryBudget=next((int(a[len("--stream="):]) for a in argv if a.startswith("--stream=")),None)
+	# Archive or container of the cases of the year mode
+	sinkPath=next((a[len("--sink="):] for a in argv if a.startswith("--sink=")),None)
+	argv=[a for a in argv if a not in ("--npy","--reduce") and not a.startswith(("--stream","--sink="))]
+	# Days of the year mode, e.g. representative days of daySelector
+	days,argv=daySelector.daysOption(argv,range(1,366))
+	if binary and sinkPath is not None:
+		raise Exception('The option --sink cannot be used with --npy.')
+
 	# Provide slack bus external ID as second argument
 	if len(argv) == 3:
 		folderPath=argv[0] if argv[0].endswith(("/","\\")) else argv[0]+"/"
@@ -36,9 +65,16 @@ def main(argv):
 
 		# Read power information, select time horizon, day number, and scenario type.
 		scenariosReader.readScenarios(folderPath,2020,1,graph,'H')
+		if reduce:
+			graph,reduction=networkReducer.reduceNetwork(graph,keep=(slackBusId,))
 
-		# Output
-		makePyflowFile('caseYlpic.py', graph, 'ylpic', slackBusId, period)
+		# Output, the period starts from 1 and the profiles from 0 as in the year mode
+		if binary:
+			# Every period of the day, the period is read with loadPyflowCase(topology, injections, period-1)
+			makePyflowTopology('caseYlpic_topology.npz', graph, slackBusId)
+			makePyflowInjections('caseYlpic_injections.npy', graph)
+		else:
+			makePyflowFile('caseYlpic.py', graph, 'ylpic', slackBusId, period-1)
 
 	elif len(argv) == 4 or len(argv) == 5:
 		folderPath=argv[0] if argv[0].endswith(("/","\\")) else argv[0]+"/"
@@ -52,22 +88,59 @@ def main(argv):
 		# Read network data (all but power information)
 		graph=networkMaker.makeNetwork(folderPath)
 
-		days=range(1,366)
-		for d in days:
-			print("\t%s" % d)
-			g = copy.deepcopy(graph)
-			scenariosReader.readScenarios(folderPath,year,d,g,scenario)
+		# The topology is shared by every period in binary mode, the loaded buses do not change with the day
+		reduced=None
+		if binary:
+			topology=graph
+			if reduce:
+				topology=copy.deepcopy(graph)
+				scenariosReader.readScenarios(folderPath,year,1,topology,scenario)
+				topology,reduction=networkReducer.reduceNetwork(topology,keep=(slackBusId,))
+				reduced=topology
+			makePyflowTopology('%sylpic_y%ss%s_topology.npz' % (outputPath,year, scenario), topology, slackBusId)
+
+		# Cases written in a single archive
+		sink=outputSinks.openSink(sinkPath) if sinkPath is not None else None
 
-			for period in range(1,97):
-				makePyflowFile('%sylpic_y%ss%sd%sp%s.py' % (outputPath,year, scenario, d, period), g, 'ylpic_y%ss%sd%sp%s' % (year, scenario, d, period), slackBusId, period-1)
+		# Graphs of the days, a copy by day or the same graph when streaming
+		try:
+			for d,g in scenariosReader.iterateScenarios(folderPath,year,days,graph,scenario,memoryBudget,copyGraph=not stream):
+				print("\t%s" % d)
+				if reduce:
+					# The topology and the loaded buses do not change with the day, the network is reduced once
+					if reduced is None:
+						reduced,reduction=networkReducer.reduceNetwork(g,keep=(slackBusId,))
+					g=networkReducer.updateLoads(reduced,reduction,g)
+
+				if binary:
+					makePyflowInjections('%sylpic_y%ss%sd%s_injections.npy' % (outputPath,year, scenario, d), g)
+					continue
+
+				for period in range(1,97):
+					caseName='ylpic_y%ss%sd%sp%s' % (year, scenario, d, period)
+					if sink is None:
+						makePyflowFile('%s%s.py' % (outputPath,caseName), g, caseName, slackBusId, period-1)
+					else:
+						makePyflowFile('%s.py' % caseName, g, caseName, slackBusId, period-1, sink=sink)
+		finally:
+			if sink is not None:
+				sink.close()
 	else:
 		displayHelp()
 		sys.exit(2)
 
 ## Display help of the program.
 def displayHelp():
-	text="Usage :\n\tpython pyflowConverter.py dataFolder slackBusId period\n"
-	text+="\tpython pyflowConverter.py dataFolder slackBusId year scenario [outputFolder]\n"
+	text="Usage :\n\tpython pyflowConverter.py dataFolder slackBusId period [--npy] [--reduce]\n"
+	text+="\tpython pyflowConverter.py dataFolder slackBusId year scenario [outputFolder] [--npy] [--reduce] [--stream[=MB]] [--sink=archive] [--days=days]\n"
+	text+="\nWith the option --npy, the cases are written as a shared NumPy topology file (.npz) and daily injection arrays\n"
+	text+="(.npy) of shape (periods, buses, 2) to be read with loadPyflowCase and the period minus one.\n"
+	text+="With the option --reduce, the buses without load of dead ends are removed and the chains of such buses are merged, see networkReducer.\n"
+	text+="With the option --stream, the days of the year mode are read one after the other on the same graph so that the memory does not\n"
+	text+="grow with the number of days. With --stream=MB, the buffered Excel files are also released when the memory exceeds MB megabytes.\n"
+	text+="With the option --sink=cases.zip or --sink=cases.chunks, every case of the year mode is written in a single compressed archive,\n"
+	text+="see outputSinks. This option cannot be used with --npy.\n"
+	text+="With the option --days=1-31,45 or --days=selection.csv, a file written by daySelector, only these days of the year are converted.\n"
 	print(text)
 
 ## Convenience function
@@ -75,31 +148,15 @@ def writeLine(outFile,str2Write):
 	outFile.write("""    %s\n""" % str2Write)
 	return
 
-## Make the file input for pyflow.
-# @param fileName Output file name.
+## Make the bus data in the pypower format, ordered by internal id.
 # @param networkGraph Graph with the daily scenario.
-# @param caseName
 # @param slackBusId Id of the slack bus.
-# @param period.
-def makePyflowFile(fileName, networkGraph, caseName, slackBusId, period):
-	# Constants for conversion to per unit
-	baseMVA = 100 # MVA
+# @param period Period of the injections, None for null injections.
+# @return Tuple with the base voltage in kV and the list of buses as ["bus_i", "type", "Pd", "Qd", "Gs", "Bs", "area", "Vm", "Va", "baseKV", "zone", "Vmax", "Vmin"].
+def makeBusData(networkGraph, slackBusId, period=None):
 	baseKV = -1.0 # Dummy value to start with, will be read from data
-	baseFrequency = 50 # Hz
-	# Constants for operational limits
-	VLimitDown = 0.95
-	VLimitUp = 1.05
-
-	outFile = open(fileName,'w')
-
-	# write front matter
-	outFile.write("""from numpy import array\n\ndef %s():\n\n""" % caseName)
-	writeLine(outFile,"""ppc = {"version": '2'}""")
-	writeLine(outFile,"""## system MVA base""")
-	writeLine(outFile,"""ppc["baseMVA"] = %f""" % baseMVA)
 
-	# Write buses in the format ["bus_i", "type", "Pd", "Qd", "Gs", "Bs", "area", "Vm", "Va", "baseKV", "zone", "Vmax", "Vmin"] (cf. pypower data format)
-	# First, filtering the data and ordering it according to the internalId
+	# Filtering the data and ordering it according to the internalId
 	busData = {}
 	for n,ndata in networkGraph.nodes(data=True):
 		# Type, 1: load, 2: generator, 3: slack bus
@@ -114,7 +171,7 @@ def makePyflowFile(fileName, networkGraph, caseName, slackBusId, period):
 		Qd = 0 # MVar
 		try:
 			loadData = ndata['load']
-			if loadData is not None:
+			if loadData is not None and period is not None:
 				for baseline in loadData.activeProfiles.values():
 					Pd += baseline[period]/1e3 # Convert from W to MW
 				for baseline in loadData.reactiveProfiles.values():
@@ -133,13 +190,61 @@ def makePyflowFile(fileName, networkGraph, caseName, slackBusId, period):
 		if baseKV == -1:
 			baseKV = ndata['baseVoltage']/1e3
 
-		busData[ndata['internalId']] = [n, type, Pd, Qd, Gs, Bs, 1, 1, 0,baseKV,1,VLimitUp,VLimitDown]
+		busData[ndata['internalId']] = [n, type, Pd, Qd, Gs, Bs, 1, 1, 0,baseKV,1,V_LIMIT_UP,V_LIMIT_DOWN]
+
+	return baseKV, [data for n,data in sorted(busData.items())]
+
+## Make the generator data in the pypower format.
+# @param slackBusId Id of the slack bus.
+# @return List of generators as ["bus","Pg","Qg","Qmax","Qmin","Vg","mBase","status","Pmax","Pmin","Pc1","Pc2","Qc1min","Qc1max","Qc2min","Qc2max","ramp_agc","ramp_10","ramp_30","ramp_q","apf"].
+def makeGenData(slackBusId):
+	# Slack bus
+	genData = [[slackBusId, 0,   0, 300, -300, 1, 100, 1, 250, -250, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]]
+
+	# Generators
+	generators = [] # As a list of values
+	for gen in generators: 	# TODO
+		genData.append(gen)
+	return genData
+
+## Make the branch data in the pypower format, ordered by internal id.
+# @param networkGraph Graph with the daily scenario.
+# @param baseKV Base voltage in kV.
+# @return List of branches as ["fbus", "tbus", "r", "x", "b", "rateA", "rateB", "rateC", "ratio", "angle", "status", "angmin", "angmax"].
+def makeBranchData(networkGraph, baseKV):
+	branchData = {}
+	for u,v,edata in networkGraph.edges(data=True):
+		Zb = (baseKV*1e3)**2/(BASE_MVA*1e6) # in Ohm
+		r = round(edata['R1'] / Zb,6) # in p.u.
+		x = round(edata['X1'] / Zb,6) # in p.u.
+		b = 0 if edata['C1'] == 0 else round(edata['C1']*1e-6 * Zb * BASE_FREQUENCY,6) # in p.u. !!!
+		branchData[edata['internalId']] = [u,v,r,x,b,round(edata['pMax']/1e6,6),0,0,0,0,int(edata['closed']),-360,360]
+	return [data for n,data in sorted(branchData.items())]
+
+## Make the file input for pyflow.
+# @param fileName Output file name.
+# @param networkGraph Graph with the daily scenario.
+# @param caseName
+# @param slackBusId Id of the slack bus.
+# @param period.
+@instrumentation.instrumented(output=lambda fileName,*args,**kwargs: fileName if kwargs.get('sink') is None else [])
+def makePyflowFile(fileName, networkGraph, caseName, slackBusId, period, sink=None):
+	outFile = open(fileName,'w') if sink is None else sink.open(fileName)
+
+	# write front matter
+	outFile.write("""from numpy import array\n\ndef %s():\n\n""" % caseName)
+	writeLine(outFile,"""ppc = {"version": '2'}""")
+	writeLine(outFile,"""## system MVA base""")
+	writeLine(outFile,"""ppc["baseMVA"] = %f""" % BASE_MVA)
+
+	# Write buses in the format ["bus_i", "type", "Pd", "Qd", "Gs", "Bs", "area", "Vm", "Va", "baseKV", "zone", "Vmax", "Vmin"] (cf. pypower data format)
+	baseKV, busData = makeBusData(networkGraph, slackBusId, period)
 
 	# Finally printing to the file by increasing internal id.
 	writeLine(outFile,"""## Bus data""")
 	writeLine(outFile,"""ppc["bus"] = array([""")
 	writeLine(outFile,'    #["bus_i", "type", "Pd", "Qd", "Gs", "Bs", "area", "Vm", "Va", "baseKV", "zone", "Vmax", "Vmin"]')
-	for n,data in sorted(busData.items()):
+	for data in busData:
 		writeLine(outFile,"""    %s,""" % data)
 	writeLine(outFile,"""])""")
 
@@ -147,30 +252,15 @@ def makePyflowFile(fileName, networkGraph, caseName, slackBusId, period):
 	writeLine(outFile,"""## Gen data""")
 	writeLine(outFile,"""ppc["gen"] = array([""")
 	writeLine(outFile,'    #["bus","Pg","Qg","Qmax","Qmin","Vg","mBase","status","Pmax","Pmin","Pc1","Pc2","Qc1min","Qc1max","Qc2min","Qc2max","ramp_agc","ramp_10","ramp_30","ramp_q","apf"]')
-	# Write slack bus
-	writeLine(outFile, """    %s,""" % [slackBusId, 0,   0, 300, -300, 1, 100, 1, 250, -250, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0])
-
-    # Write generators
-	generators = [] # As a list of values
-	for gen in generators: 	# TODO
+	for gen in makeGenData(slackBusId):
 		writeLine(outFile,"""    %s,""" % gen)
 	writeLine(outFile,"""])""")
 
 	# Write branches as ["fbus", "tbus", "r", "x", "b", "rateA", "rateB", "rateC", "ratio", "angle", "status", "angmin", "angmax"]
-	# First, filtering the data and ordering it according to the internalId
-	branchData = {}
-	for u,v,edata in networkGraph.edges(data=True):
-		Zb = (baseKV*1e3)**2/(baseMVA*1e6) # in Ohm
-		r = round(edata['R1'] / Zb,6) # in p.u.
-		x = round(edata['X1'] / Zb,6) # in p.u.
-		b = 0 if edata['C1'] == 0 else round(edata['C1']*1e-6 * Zb * baseFrequency,6) # in p.u. !!!
-		branchData[edata['internalId']] = [u,v,r,x,b,round(edata['pMax']/1e6,6),0,0,0,0,int(edata['closed']),-360,360]
-
-	# Writing to file
 	writeLine(outFile,"""## Branch data""")
 	writeLine(outFile,"""ppc["branch"] = array([""")
 	writeLine(outFile,'    #["fbus", "tbus", "r", "x", "b", "rateA", "rateB", "rateC", "ratio", "angle", "status", "angmin", "angmax"]')
-	for n,data in sorted(branchData.items()):
+	for data in makeBranchData(networkGraph, baseKV):
 		writeLine(outFile,"""    %s,""" % data)
 	writeLine(outFile,"""])""")
 
@@ -178,6 +268,50 @@ def makePyflowFile(fileName, networkGraph, caseName, slackBusId, period):
 	writeLine(outFile,"""return ppc""")
 	outFile.close()
 
+## Make the binary topology file of the pypower case.
+# The bus data is written with null injections, the injections of each period are written by makePyflowInjections.
+# @param fileName Output file name, usually with the ".npz" extension.
+# @param networkGraph Graph of the network.
+# @param slackBusId Id of the slack bus.
+@instrumentation.instrumented(output=lambda fileName,*args,**kwargs: fileName)
+def makePyflowTopology(fileName, networkGraph, slackBusId):
+	baseKV, busData = makeBusData(networkGraph, slackBusId)
+	numpy.savez(fileName, baseMVA=numpy.array(BASE_MVA, dtype=float), bus=numpy.array(busData, dtype=float),
+				gen=numpy.array(makeGenData(slackBusId), dtype=float), branch=numpy.array(makeBranchData(networkGraph, baseKV), dtype=float))
+
+## Make the binary file with the injections of each period.
+# The array has the shape (periods, buses, 2) with the buses ordered as in the topology file and the active (Pd) and
+# reactive (Qd) injections in MW and MVar as last dimension.
+# @param fileName Output file name, usually with the ".npy" extension.
+# @param networkGraph Graph with the daily scenario.
+# @param periods Number of periods.
+@instrumentation.instrumented(output=lambda fileName,*args,**kwargs: fileName)
+def makePyflowInjections(fileName, networkGraph, periods=96):
+	nodes = sorted(networkGraph.nodes(data=True), key=lambda n: n[1]['internalId'])
+	injections = numpy.zeros((periods, len(nodes), 2))
+	for i,(n,ndata) in enumerate(nodes):
+		loadData = ndata.get('load')
+		if loadData is None:
+			continue
+		for baseline in loadData.activeProfiles.values():
+			injections[:,i,0] += numpy.asarray(baseline[:periods])/1e3 # Convert from W to MW
+		for baseline in loadData.reactiveProfiles.values():
+			injections[:,i,1] += numpy.asarray(baseline[:periods])/1e3 # Convert from VAr to MVAr
+	numpy.save(fileName, injections)
+
+## Load a pypower case from the binary files.
+# The injections are memory mapped, only the requested period is read.
+# @param topologyFileName Topology file written by makePyflowTopology.
+# @param injectionsFileName Injections file written by makePyflowInjections.
+# @param period Period, starting from 0.
+# @return Pypower case as a dictionary.
+def loadPyflowCase(topologyFileName, injectionsFileName, period):
+	with numpy.load(topologyFileName) as topology:
+		ppc = {"version": '2', "baseMVA": float(topology['baseMVA']), "bus": topology['bus'].copy(), "gen": topology['gen'], "branch": topology['branch']}
+	injections = numpy.load(injectionsFileName, mmap_mode='r')
+	ppc["bus"][:,2:4] = injections[period]
+	return ppc
+
 # Starting point from python #
 if __name__ == "__main__":
 	main(sys.argv[1:])
\ No newline at end of file
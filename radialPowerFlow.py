@@ -0,0 +1,181 @@
+## Backward/forward sweep power flow of a radial network, solved for many periods at once.
+# Every period is a column of the voltage and current arrays so that each sweep is a batched computation over all the
+# periods of a day or of a year.
+# Requires numpy and scipy which can be installed with "pip3 install numpy scipy".
+#@author Sebastien MATHIEU
+
+import sys, os
+
+import numpy
+
+import networkArrays
+
+## Default tolerance on the voltage update in p.u.
+TOLERANCE=1e-8
+## Default maximal number of sweeps.
+MAX_ITERATIONS=50
+
+## Entry point of the program.
+# @param argv Program parameters.
+def main(argv):
+	if len(argv) < 3:
+		displayHelp()
+		sys.exit(2)
+	folderPath=argv[0] if argv[0].endswith(("/","\\")) else argv[0]+"/"
+	if not os.path.exists(folderPath):
+		raise Exception('Folder \"%s\" does not exists.' % folderPath)
+	year=int(argv[1])
+	day=int(argv[2])
+	scenario=argv[3] if len(argv) > 3 else 'H'
+
+	import networkMaker
+	import scenariosReader
+
+	graph=networkMaker.makeNetwork(folderPath)
+	scenariosReader.readScenarios(folderPath,year,day,graph,scenario)
+	result=runRadialPowerFlow(graph)
+
+	if result.converged:
+		print("Converged in %s iterations." % result.iterations)
+	else:
+		print("Warning: not converged after %s iterations." % result.iterations)
+	print("Voltage magnitude: %.4f to %.4f p.u." % (numpy.nanmin(numpy.abs(result.voltages)),numpy.nanmax(numpy.abs(result.voltages))))
+	print("Losses: %.4f MWh" % (result.totalLosses().real.sum()/4))
+	print("Maximal loading: %.2f%%" % (100*numpy.nanmax(result.loading)))
+
+## Display help of the program.
+def displayHelp():
+	text="Usage :\n\tpython3 radialPowerFlow.py dataFolder year day [scenario]\n"
+	print(text)
+
+## Run the power flow of every period of the daily scenario of a graph.
+# @param graph Network graph with the daily scenario.
+# @param root Id of the slack bus.
+# @param periods Number of periods.
+# @return PowerFlowResult.
+def runRadialPowerFlow(graph,root=networkArrays.ROOT_BUS,periods=96):
+	arrays=networkArrays.makeNetworkArrays(graph)
+	tree=networkArrays.makeRadialTree(arrays,root)
+	P,Q=networkArrays.makeInjections(graph,arrays,periods)
+	return solveRadialPowerFlow(arrays,tree,P,Q)
+
+## Solve the power flow of a radial network for several periods.
+# The shunt admittances of the branches are split on their end buses. The buses not connected to the root have
+# undefined (NaN) voltages.
+# @param arrays Array model of the network.
+# @param tree Radial tree of the network from the slack bus.
+# @param P Array of shape (periods, buses) with the active injections in MW, productions are positive.
+# @param Q Array of shape (periods, buses) with the reactive injections in MVar.
+# @param slackVoltage Voltage of the slack bus in p.u.
+# @param initialVoltages Array of shape (buses,) or (periods, buses) with the initial voltages in p.u., the slack voltage if None.
+# @param tolerance Tolerance on the largest voltage update in p.u.
+# @param maxIterations Maximal number of sweeps.
+# @return PowerFlowResult.
+def solveRadialPowerFlow(arrays,tree,P,Q,slackVoltage=1.0,initialVoltages=None,tolerance=TOLERANCE,maxIterations=MAX_ITERATIONS):
+	P=numpy.atleast_2d(P)
+	Q=numpy.atleast_2d(Q)
+	n=len(arrays.buses)
+	periods=P.shape[0]
+	children=tree.order[1:]
+
+	# Injections in p.u. with buses as rows
+	S=(P.T+1j*Q.T)/arrays.baseMVA
+
+	# Series impedance of the branch to the parent and shunt admittance of each bus
+	z=numpy.zeros(n,dtype=complex)
+	z[children]=arrays.r[tree.parentBranch[children]]+1j*arrays.x[tree.parentBranch[children]]
+	yShunt=numpy.zeros(n,dtype=complex)
+	c=numpy.flatnonzero(arrays.closed)
+	numpy.add.at(yShunt,arrays.fromBus[c],1j*arrays.b[c]/2)
+	numpy.add.at(yShunt,arrays.toBus[c],1j*arrays.b[c]/2)
+	yShunt=yShunt[:,numpy.newaxis]
+
+	# Initial voltages
+	V=numpy.full((n,periods),numpy.nan,dtype=complex)
+	if initialVoltages is None:
+		V[tree.order]=slackVoltage
+	else:
+		V0=numpy.asarray(initialVoltages,dtype=complex)
+		V[tree.order]=(V0[:,numpy.newaxis] if V0.ndim == 1 else V0.T)[tree.order]
+	V[tree.root]=slackVoltage
+
+	I=numpy.zeros((n,periods),dtype=complex)
+	iterations=0
+	converged=False
+	while iterations < maxIterations:
+		iterations+=1
+
+		# Backward sweep: current drawn by each bus, accumulated from the leaves to the root
+		I[:]=0
+		I[tree.order]=-numpy.conj(S[tree.order]/V[tree.order])+yShunt[tree.order]*V[tree.order]
+		for level in reversed(tree.levels[1:]):
+			numpy.add.at(I,tree.parent[level],I[level])
+
+		# Forward sweep: voltage drops from the root to the leaves
+		previousV=V.copy()
+		for level in tree.levels[1:]:
+			V[level]=V[tree.parent[level]]-z[level,numpy.newaxis]*I[level]
+
+		if numpy.max(numpy.abs(V[children]-previousV[children]),initial=0) < tolerance:
+			converged=True
+			break
+
+	return PowerFlowResult(arrays,tree,V.T,I.T,iterations,converged)
+
+## Result of the radial power flow.
+class PowerFlowResult:
+	## Constructor.
+	# @param arrays Array model of the network.
+	# @param tree Radial tree of the network.
+	# @param voltages Array of shape (periods, buses) with the complex voltages in p.u.
+	# @param currents Array of shape (periods, buses) with the current from the parent of each bus in p.u.
+	# @param iterations Number of sweeps.
+	# @param converged True if the voltage update of the last sweep is below the tolerance.
+	def __init__(self,arrays,tree,voltages,currents,iterations,converged):
+		self.arrays=arrays
+		self.tree=tree
+		self.voltages=voltages
+		self.iterations=iterations
+		self.converged=converged
+
+		# Flows of the branches in the tree, from their "from" bus to their "to" bus
+		periods=voltages.shape[0]
+		children=tree.order[1:]
+		branches=tree.parentBranch[children]
+		parents=tree.parent[children]
+		sending=voltages[:,parents]*numpy.conj(currents[:,children])*arrays.baseMVA
+		receiving=voltages[:,children]*numpy.conj(currents[:,children])*arrays.baseMVA
+		forward=arrays.fromBus[branches] == parents
+
+		self.flows=numpy.zeros((periods,len(arrays.branches)),dtype=complex)
+		self.flows[:,branches]=numpy.where(forward,sending,-receiving)
+		self.losses=numpy.zeros((periods,len(arrays.branches)),dtype=complex)
+		self.losses[:,branches]=sending-receiving
+		self.loading=numpy.zeros((periods,len(arrays.branches)))
+		self.loading[:,branches]=numpy.maximum(numpy.abs(sending),numpy.abs(receiving))/arrays.pMax[branches]
+
+	## Compute the total losses of each period.
+	# @return Array of the losses in MVA by period.
+	def totalLosses(self):
+		return self.losses.sum(axis=1)
+
+	## @var arrays
+	# Array model of the network.
+	## @var tree
+	# Radial tree of the network.
+	## @var voltages
+	# Array of shape (periods, buses) with the complex voltages in p.u., NaN for the buses not connected to the slack bus.
+	## @var iterations
+	# Number of sweeps.
+	## @var converged
+	# True if the voltage update of the last sweep is below the tolerance.
+	## @var flows
+	# Array of shape (periods, branches) with the complex power in MVA entering the series impedance of each branch at its "from" bus, null for the branches not in the tree.
+	## @var losses
+	# Array of shape (periods, branches) with the complex losses of each branch in MVA.
+	## @var loading
+	# Array of shape (periods, branches) with the apparent power of each branch relative to its capacity.
+
+# Starting point from python #
+if __name__ == "__main__":
+	main(sys.argv[1:])
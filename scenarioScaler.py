@@ -0,0 +1,345 @@
+## Batched what-if scaling of the reference powers of the scenarios without reading the Excel files again.
+# A variant scales the reference powers of columns of the scenarios file (load, inhab, EC, HP, PV, CHP, Wind) on the
+# whole network or on a feeder, e.g. "PV=1.5,EC=2,PV@8002=0.5", see parseVariants. As the injection of a bus is the sum
+# of its reference powers times base profiles, see injectionStore, scaling a column scales the coefficients of its
+# profile types. The coefficients are summed by feeder so that the totals of hundreds of variants are a single product
+# of an array of shape (variants, profile types) by the base profiles. The injections of every bus of a variant are
+# given by a scaled InjectionStore, and the radial power flow solves a batch of variants at once, each period of each
+# variant being a column of the sweep.
+# Requires numpy which can be installed with "pip3 install numpy".
+#@author Sebastien MATHIEU
+
+import sys, os, itertools
+
+import scenariosReader
+import daySelector
+import cacheFolders
+import lazyImport
+numpy=lazyImport.lazyModule('numpy')
+injectionStore=lazyImport.lazyModule('injectionStore')
+networkMaker=lazyImport.lazyModule('networkMaker')
+networkArrays=lazyImport.lazyModule('networkArrays')
+radialPowerFlow=lazyImport.lazyModule('radialPowerFlow')
+feederPartitioner=lazyImport.lazyModule('feederPartitioner')
+
+## Number of periods of a day.
+T=96
+## Default number of variants solved together by the power flow.
+VARIANT_BATCH=32
+## Profile types of the reference power columns whose type is not the name of the column, see scenariosReader.loadProfiles.
+COLUMN_TYPES={'load':['I1','I2','I3','IEP'],'inhab':['R']}
+## Metrics of the evaluation of a variant.
+METRICS=["consumedMWh","producedMWh","peakWithdrawalMW","peakInjectionMW"]
+## Metrics of the evaluation of a variant with the power flow.
+FLOW_METRICS=["minVoltage","maxVoltage","maxLoading","lossesMWh"]
+
+## Entry point of the program.
+# @param argv Program parameters.
+def main(argv):
+	# Options
+	flow=False
+	exportPath=None
+	root=None
+	days,argv=daySelector.daysOption(argv)
+	argv=cacheFolders.cacheFolderOption(argv)
+	options=[a for a in argv if a.startswith('--')]
+	argv=[a for a in argv if not a.startswith('--')]
+	for o in options:
+		if o == "--flow":
+			flow=True
+		elif o.startswith("--export="):
+			exportPath=o[len("--export="):]
+		elif o.startswith("--root="):
+			root=int(o[len("--root="):])
+		else:
+			raise Exception('Unknown option "%s".' % o)
+
+	if len(argv) < 4:
+		displayHelp()
+		sys.exit(2)
+	folderPath=argv[0] if argv[0].endswith(("/","\\")) else argv[0]+"/"
+	if not os.path.exists(folderPath):
+		raise Exception('Folder \"%s\" does not exists.' % folderPath)
+	year=int(argv[1])
+	scenario=argv[2]
+	variants=parseVariants(argv[3])
+
+	# Network graph, only read for the feeders and the power flow
+	store=injectionStore.openStore(folderPath,year,scenario)
+	graph=None
+	if flow or any(v.feeders() for v in variants):
+		graph=networkMaker.makeNetwork(folderPath)
+	scaler=ScenarioScaler(store,graph,root if root is not None else networkArrays.ROOT_BUS)
+
+	if exportPath is not None:
+		if not os.path.exists(exportPath):
+			os.makedirs(exportPath)
+		for v,variant in enumerate(variants):
+			scaler.variantStore(variant).save(os.path.join(exportPath,"injections_y%ss%s_v%s.npz" % (year,scenario,v)))
+
+	metrics=scaler.evaluate(variants,days,flow=flow)
+	lines=["variant,name,%s" % ",".join(metrics.keys())]
+	for v,variant in enumerate(variants):
+		lines.append('%s,"%s",%s' % (v,variant.name,",".join("%.6g" % values[v] for values in metrics.values())))
+	if len(argv) > 4:
+		with open(argv[4],'w') as file:
+			file.write("\n".join(lines)+"\n")
+	else:
+		print("\n".join(lines))
+
+## Display help of the program.
+def displayHelp():
+	text="Usage :\n\tpython3 scenarioScaler.py dataFolder year scenario variants [outputFile] [--days=days] [--flow] [--root=busId] [--export=folder] [--cache-folder=folder]\n"
+	text+="\nEvaluate variants of the scenario scaling the reference powers of the columns %s of the scenarios file.\n" % ", ".join(sorted(scenariosReader.SCENARIOS_REFERENCE_POWERS))
+	text+="A variant is given as \"PV=1.5,EC=2\", \"PV@8002=0.5\" scales the PV of the feeder 8002 on top of the factor of the network.\n"
+	text+="Several values separated by \"/\" give the grid of all combinations, e.g. \"PV=1/1.5/2,EC=1/2\" is 6 variants.\n"
+	text+="The variants are separated by \";\" or are the lines of a file, a line may start with \"name:\".\n"
+	text+="\nThe energies and peaks of the total injection are computed for every variant on the days of --days, all the year by default.\n"
+	text+="With --flow, the voltages, loadings and losses are computed with the radial power flow from the root bus (%s by default).\n" % networkArrays.ROOT_BUS
+	text+="With --export=folder, the injection store of each variant is saved in the folder.\n"
+	print(text)
+
+## Parse variants.
+# @param text Path to a file with a variant by line or variants separated by ";".
+# @return List of Variant, the grids being expanded.
+def parseVariants(text):
+	if os.path.exists(text):
+		with open(text) as file:
+			specifications=[l.strip() for l in file]
+	else:
+		specifications=[s.strip() for s in text.split(";")]
+
+	variants=[]
+	for specification in specifications:
+		if specification == "" or specification.startswith("#"):
+			continue
+		name=None
+		if ":" in specification:
+			name,specification=[s.strip() for s in specification.split(":",1)]
+
+		# Keys with their values, several for a grid
+		keys=[]
+		values=[]
+		for part in specification.split(","):
+			if part.strip() == "":
+				continue
+			try:
+				key,value=part.split("=")
+				column,feeder=key.strip().split("@") if "@" in key else (key.strip(),None)
+				keys.append((column,int(feeder) if feeder is not None else None))
+				values.append([float(x) for x in value.split("/")])
+			except ValueError:
+				raise Exception('Invalid scale factor "%s" in the variant "%s".' % (part,specification))
+			if column not in scenariosReader.SCENARIOS_REFERENCE_POWERS:
+				raise Exception('Unknown reference power "%s", expected one of %s.' % (column,", ".join(sorted(scenariosReader.SCENARIOS_REFERENCE_POWERS))))
+
+		for combination in itertools.product(*values):
+			factors=dict(zip(keys,combination))
+			variantName=Variant.format(factors)
+			if name is not None:
+				variantName=name if len(values) == 0 or all(len(v) == 1 for v in values) else "%s %s" % (name,variantName)
+			variants.append(Variant(variantName,factors))
+	return variants
+
+## Variant of a scenario with scale factors of the reference powers.
+class Variant:
+	## Constructor.
+	# @param name Name of the variant.
+	# @param factors Dictionary of the scale factors with (column, feeder id or None) as keys.
+	def __init__(self,name,factors):
+		self.name=name
+		self.factors=factors
+
+	## Format scale factors as in parseVariants.
+	# @param factors Dictionary of the scale factors with (column, feeder id or None) as keys.
+	# @return Text of the factors, "base" without factor.
+	@staticmethod
+	def format(factors):
+		if len(factors) == 0:
+			return "base"
+		return ",".join("%s%s=%g" % (column,"@%s" % feeder if feeder is not None else "",factor) for (column,feeder),factor in factors.items())
+
+	## Get the feeders with their own factors.
+	# @return Set of the feeder ids.
+	def feeders(self):
+		return set(feeder for column,feeder in self.factors if feeder is not None)
+
+	## @var name
+	# Name of the variant.
+	## @var factors
+	# Dictionary of the scale factors with (column, feeder id or None) as keys, the factors of a feeder multiply the ones of the network.
+
+## Scaling of the injection store of a year and scenario.
+class ScenarioScaler:
+	## Constructor.
+	# @param store InjectionStore of the year and scenario.
+	# @param graph Network graph, needed for the factors of the feeders and the power flow. None if not needed.
+	# @param root Id of the root bus of the feeders and of the power flow.
+	def __init__(self,store,graph=None,root=None):
+		self.store=store
+		self.graph=graph
+		self.root=root if root is not None else networkArrays.ROOT_BUS
+		self.feeders=[]
+		self.groups=numpy.zeros(len(store.buses),dtype=numpy.intp)
+		if graph is not None:
+			partition=feederPartitioner.partitionFeeders(graph,self.root)
+			self.feeders=sorted(partition.feeders.keys())
+			feederIndex=dict((f,g) for g,f in enumerate(self.feeders))
+			self.groups=numpy.array([feederIndex.get(partition.busFeeder.get(int(b)),len(self.feeders)) for b in store.buses],dtype=numpy.intp)
+
+		# Coefficients summed by feeder, the last group has the buses outside the feeders
+		self.groupCoefficients=numpy.zeros((len(self.feeders)+1,len(store.profileTypes)))
+		numpy.add.at(self.groupCoefficients,self.groups,store.coefficients)
+		self.arrays=None
+		self.tree=None
+
+	## Get the profile types of a column of reference powers.
+	# @param column Column of the scenarios file.
+	# @return List of the indexes of the profile types in the store.
+	def columnTypes(self,column):
+		return [self.store.profileTypes.index(t) for t in COLUMN_TYPES.get(column,[column]) if t in self.store.profileTypes]
+
+	## Compute the factors of variants.
+	# @param variants List of Variant.
+	# @return Array of shape (variants, feeders + 1, profile types) with the factor of each type by feeder, the last feeder being the buses outside the feeders.
+	def factors(self,variants):
+		feederIndex=dict((f,g) for g,f in enumerate(self.feeders))
+		F=numpy.ones((len(variants),len(self.feeders)+1,len(self.store.profileTypes)))
+		for v,variant in enumerate(variants):
+			for (column,feeder),factor in variant.factors.items():
+				types=self.columnTypes(column)
+				if feeder is None:
+					F[v][:,types]*=factor
+				elif feeder in feederIndex:
+					F[v,feederIndex[feeder],types]*=factor
+				else:
+					raise Exception('Feeder %s of the variant "%s" not in the network, the feeders are %s.' % (feeder,variant.name,self.feeders))
+		return F
+
+	## Get the coefficients of the buses for a variant.
+	# @param variant Variant.
+	# @return Array of shape (buses, profile types) with the scaled reference powers.
+	def scaledCoefficients(self,variant):
+		return self.store.coefficients*self.factors([variant])[0][self.groups]
+
+	## Get the injection store of a variant, sharing the base profiles of the store.
+	# @param variant Variant.
+	# @return InjectionStore.
+	def variantStore(self,variant):
+		return injectionStore.InjectionStore(self.store.year,self.store.scenario,self.store.buses,self.store.profileTypes,
+											self.scaledCoefficients(variant),self.store.activeBase,self.store.reactiveBase)
+
+	## Get the total injections of variants over a range of days.
+	# @param variants List of Variant.
+	# @param start First day as a date or a day of the year.
+	# @param end Last day included as a date or a day of the year, the first day if None.
+	# @return Tuple of arrays of shape (variants, periods) with the total active and reactive injections in kW and kVAr.
+	def totals(self,variants,start,end=None):
+		coefficients=numpy.einsum('vgt,gt->vt',self.factors(variants),self.groupCoefficients)
+		periods=self.store.periods(start,end)
+		return coefficients@self.store.activeBase[:,periods],coefficients@self.store.reactiveBase[:,periods]
+
+	## Get the total injections of each feeder of variants over a range of days.
+	# @param variants List of Variant.
+	# @param start First day as a date or a day of the year.
+	# @param end Last day included as a date or a day of the year, the first day if None.
+	# @return Tuple of arrays of shape (variants, feeders + 1, periods) with the active and reactive injections in kW and kVAr, the last feeder being the buses outside the feeders.
+	def feederTotals(self,variants,start,end=None):
+		coefficients=self.factors(variants)*self.groupCoefficients
+		periods=self.store.periods(start,end)
+		return coefficients@self.store.activeBase[:,periods],coefficients@self.store.reactiveBase[:,periods]
+
+	## Get the injections of every bus of variants for a day.
+	# @param factors Array of the factors of the variants, see factors.
+	# @param day Day of the year.
+	# @return Tuple of arrays of shape (variants, periods, buses) with the active and reactive injections in kW and kVAr.
+	def injections(self,factors,day):
+		coefficients=self.store.coefficients*factors[:,self.groups]
+		periods=self.store.periods(day)
+		return (numpy.einsum('vbt,tp->vpb',coefficients,self.store.activeBase[:,periods]),
+				numpy.einsum('vbt,tp->vpb',coefficients,self.store.reactiveBase[:,periods]))
+
+	## Evaluate variants over days.
+	# The energies and peaks are computed from the totals of all the variants at once. With the power flow, the
+	# injections of a batch of variants are the columns of a single radial power flow of each day.
+	# @param variants List of Variant.
+	# @param days Days of the year, all the days of the store if None.
+	# @param flow If true, evaluate the voltages, loadings and losses with the radial power flow.
+	# @param batch Number of variants solved together by the power flow.
+	# @return Dictionary of arrays of the metrics by variant, see METRICS and FLOW_METRICS.
+	def evaluate(self,variants,days=None,flow=False,batch=VARIANT_BATCH):
+		if days is None:
+			days=range(1,self.store.activeBase.shape[1]//T+1)
+		V=len(variants)
+		metrics=dict((m,numpy.zeros(V)) for m in METRICS)
+		metrics["peakWithdrawalMW"][:]=-numpy.inf
+		metrics["peakInjectionMW"][:]=-numpy.inf
+		coefficients=numpy.einsum('vgt,gt->vt',self.factors(variants),self.groupCoefficients)
+		for d in days:
+			# Contribution of each profile type to the total injection in kW
+			periods=self.store.periods(d)
+			contributions=coefficients[:,:,numpy.newaxis]*self.store.activeBase[numpy.newaxis,:,periods]
+			total=contributions.sum(axis=1)
+			metrics["consumedMWh"]-=numpy.minimum(contributions,0).sum(axis=(1,2))/4e3
+			metrics["producedMWh"]+=numpy.maximum(contributions,0).sum(axis=(1,2))/4e3
+			metrics["peakWithdrawalMW"]=numpy.maximum(metrics["peakWithdrawalMW"],-total.min(axis=1)/1e3)
+			metrics["peakInjectionMW"]=numpy.maximum(metrics["peakInjectionMW"],total.max(axis=1)/1e3)
+
+		if flow:
+			metrics.update(self.evaluateFlow(variants,days,batch))
+		return metrics
+
+	## Evaluate variants with the radial power flow.
+	# @param variants List of Variant.
+	# @param days Days of the year.
+	# @param batch Number of variants solved together.
+	# @return Dictionary of arrays of the metrics by variant, see FLOW_METRICS.
+	def evaluateFlow(self,variants,days,batch=VARIANT_BATCH):
+		if self.graph is None:
+			raise Exception('The power flow of the variants requires the network graph.')
+		if self.arrays is None:
+			self.arrays=networkArrays.makeNetworkArrays(self.graph)
+			self.tree=networkArrays.makeRadialTree(self.arrays,self.root)
+		V=len(variants)
+		metrics={"minVoltage":numpy.full(V,numpy.inf),"maxVoltage":numpy.full(V,-numpy.inf),"maxLoading":numpy.zeros(V),"lossesMWh":numpy.zeros(V)}
+		rows=self.store.rows(self.arrays.buses)
+		for first in range(0,V,batch):
+			factors=self.factors(variants[first:first+batch])
+			b=factors.shape[0]
+			for d in days:
+				# Periods of the variants of the batch as rows of a single power flow, in MW and MVar
+				P,Q=self.injections(factors,d)
+				P=P[:,:,rows].reshape((b*T,len(rows)))/1e3
+				Q=Q[:,:,rows].reshape((b*T,len(rows)))/1e3
+				result=radialPowerFlow.solveRadialPowerFlow(self.arrays,self.tree,P,Q)
+				if not result.converged:
+					print("Warning: power flow of day %s not converged after %s iterations." % (d,result.iterations))
+
+				magnitudes=numpy.abs(result.voltages[:,self.tree.order]).reshape((b,T,len(self.tree.order)))
+				selected=slice(first,first+b)
+				metrics["minVoltage"][selected]=numpy.minimum(metrics["minVoltage"][selected],magnitudes.min(axis=(1,2)))
+				metrics["maxVoltage"][selected]=numpy.maximum(metrics["maxVoltage"][selected],magnitudes.max(axis=(1,2)))
+				metrics["maxLoading"][selected]=numpy.maximum(metrics["maxLoading"][selected],result.loading.reshape((b,-1)).max(axis=1))
+				metrics["lossesMWh"][selected]+=result.totalLosses().real.reshape((b,T)).sum(axis=1)/4
+		return metrics
+
+	## @var store
+	# InjectionStore of the year and scenario.
+	## @var graph
+	# Network graph, None if not needed.
+	## @var root
+	# Id of the root bus of the feeders and of the power flow.
+	## @var feeders
+	# Sorted list of the feeder ids, empty without graph.
+	## @var groups
+	# Array with the index of the feeder of each bus of the store, len(feeders) for the buses outside the feeders.
+	## @var groupCoefficients
+	# Array of shape (feeders + 1, profile types) with the coefficients of the buses summed by feeder.
+	## @var arrays
+	# Array model of the network for the power flow, made at the first evaluation.
+	## @var tree
+	# Radial tree of the network from the root bus for the power flow.
+
+# Starting point from python #
+if __name__ == "__main__":
+	main(sys.argv[1:])
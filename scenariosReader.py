@@ -2,9 +2,11 @@
 # Requires xlrd which can be installed with "pip3 install xlrd".
 #@author Sebastien MATHIEU
 
-import xlrd
-import datetime, math
+import datetime, math, gc, copy
 import networkMaker
+import instrumentation
+import lazyImport
+xlrd=lazyImport.lazyModule('xlrd')
 
 # Constants
 ## File with the information on the scenarios.
@@ -13,6 +15,16 @@ SCENARIOS_FILE="scenarios GREDOR_substation V3.xlsx"
 CALENDAR_FILE="YearCalendar 2015-2020-2030-2050 for profile.xlsx"
 ## File with the load profiles/
 LOAD_PROFILES_FILE="catalogue charge V3.xlsx"
+## Files read by readScenarios.
+SCENARIO_FILES=[SCENARIOS_FILE,CALENDAR_FILE,LOAD_PROFILES_FILE]
+## Number of days of a year in the converters and in the load profiles file, i.e. 35,040 periods.
+YEAR_DAYS=365
+## Row of the header of the sheet of each type of profile in the load profiles file.
+PROFILES_HEADERS_ROW={'R':5,'HP':8,'I1':8,'I2':9,'I3':9,'EC':8,'PV':0,'Wind':0,'IEP':1,'CHP':0}
+## Types of profile with a profile by day of the year in the load profiles file.
+DAILY_PROFILE_TYPES=['PV','Wind','IEP']
+## Columns of the reference powers of the loads in the scenarios file.
+SCENARIOS_REFERENCE_POWERS={'load':3,'inhab':4,'EC':5,'HP':6,'PV':7,'CHP':8,'Wind':9}
 
 # Buffers of excel files and their path
 networkMaker.BUFFER_CALENDAR = None
@@ -28,6 +40,7 @@ networkMaker.BUFFER_SCENARIOS_FILE = None
 # @param day Day of the year.
 # @param graph Multigraph to add the loads.
 # @param scenarioType Type of scenario. Usually 'L' or 'H'.
+@instrumentation.instrumented()
 def readScenarios(folderPath,year,day,graph,scenarioType='H'):
 	readScenariosExcel(folderPath+SCENARIOS_FILE,year,graph,scenarioType)
 
@@ -35,12 +48,156 @@ def readScenarios(folderPath,year,day,graph,scenarioType='H'):
 	readLoadProfilesExcel(folderPath+LOAD_PROFILES_FILE,day,graph,profilesType)
 	#networkMaker.detectEndBuses(graph)
 
+## Iterate over days with the loads of each day, reusing the same graph.
+# The loads are read once and the profiles of a day replace the ones of the previous day so that the memory does not
+# grow with the number of days. The graph of a day must not be used after the next iteration, unless copyGraph is set.
+# @param folderPath Path to the folder with the Excel data files.
+# @param year Year of the scenarios.
+# @param days Iterable of days of the year.
+# @param graph Multigraph to add the loads.
+# @param scenarioType Type of scenario. Usually 'L' or 'H'.
+# @param memoryBudget Resident memory in MB above which the buffered Excel files are released after a day, None to keep them. They are released once each time the memory crosses the budget.
+# @param copyGraph If true, the loads of each day are read on a new copy of the graph without loads.
+# @return Generator of tuples with the day and the graph with the loads of the day.
+def iterateScenarios(folderPath,year,days,graph,scenarioType='H',memoryBudget=None,copyGraph=False):
+	if not copyGraph:
+		clearLoads(graph)
+		readScenariosExcel(folderPath+SCENARIOS_FILE,year,graph,scenarioType)
+	aboveBudget=False # The buffers were released since the memory crossed the budget
+	for day in days:
+		if copyGraph:
+			g=copy.deepcopy(graph)
+			readScenarios(folderPath,year,day,g,scenarioType)
+			yield day,g
+		else:
+			profilesType=readCalendarExcel(folderPath+CALENDAR_FILE,year,day)
+			readLoadProfilesExcel(folderPath+LOAD_PROFILES_FILE,day,graph,profilesType)
+			yield day,graph
+
+		if memoryBudget is not None:
+			if instrumentation.currentRss() <= memoryBudget*2**20:
+				aboveBudget=False
+			elif not aboveBudget:
+				aboveBudget=True
+				releaseBuffers()
+				gc.collect()
+				rss=instrumentation.currentRss()
+				if rss > memoryBudget*2**20:
+					print("Warning: memory of %.1f MB above the budget of %s MB after releasing the buffered Excel files." % (rss/2**20,memoryBudget))
+
+## Release the buffered Excel files of the scenarios, they are opened again when needed.
+def releaseBuffers():
+	for name in ['CALENDAR','PROFILES','SCENARIOS']:
+		xl=getattr(networkMaker,'BUFFER_%s'%name)
+		if xl is not None:
+			xl.release_resources()
+		setattr(networkMaker,'BUFFER_%s'%name,None)
+		setattr(networkMaker,'BUFFER_%s_FILE'%name,None)
+
+## Load every sheet of the buffered Excel files of the scenarios.
+# The sheets of the buffered files are parsed when first read, once loaded they are read without parsing so that
+# several threads can read them concurrently.
+def loadBuffers():
+	for name in ['CALENDAR','PROFILES','SCENARIOS']:
+		xl=getattr(networkMaker,'BUFFER_%s'%name)
+		if xl is not None:
+			for i in range(xl.nsheets):
+				xl.sheet_by_index(i)
+
+## Get the years and scenarios of the data folder.
+# @param folderPath Path to the folder with the Excel data files.
+# @return Sorted list of tuples with the year and the type of scenario having a sheet in the scenarios file and in the calendar file.
+def scenarioYears(folderPath):
+	calendar=xlrd.open_workbook(folderPath+CALENDAR_FILE,on_demand=True)
+	scenarios=xlrd.open_workbook(folderPath+SCENARIOS_FILE,on_demand=True)
+	try:
+		calendarSheets=set(calendar.sheet_names())
+		years=[]
+		for name in scenarios.sheet_names():
+			words=name.split()
+			if len(words) == 3 and words[0] == "scenarios" and words[1].isdigit():
+				if "%s %s" % ('R',words[1]) in calendarSheets:
+					years.append((int(words[1]),words[2]))
+		return sorted(years)
+	finally:
+		calendar.release_resources()
+		scenarios.release_resources()
+
+## Get the number of days of a year covered by the load profiles file.
+# @param filePath Path to the load profiles excel file.
+# @param year Year.
+# @return Number of days with a profile in every sheet of the profiles by day, at most the number of days of the year.
+def profileDays(filePath,year):
+	if filePath != networkMaker.BUFFER_PROFILES_FILE:
+		networkMaker.BUFFER_PROFILES = xlrd.open_workbook(filePath,on_demand=True)
+		networkMaker.BUFFER_PROFILES_FILE = filePath
+	xl = networkMaker.BUFFER_PROFILES
+	days=min((xl.sheet_by_name(pType).nrows-PROFILES_HEADERS_ROW[pType]-1)//96 for pType in DAILY_PROFILE_TYPES)
+	return min(days,datetime.date(year,12,31).timetuple().tm_yday)
+
+## Remove the loads of a graph so that the same graph can be used for another day or scenario without copy.
+# @param graph Graph with loads.
+def clearLoads(graph):
+	for n,ndata in graph.nodes(data=True):
+		if 'load' in ndata:
+			ndata['load']=None
+
 ## Read and attached the load profiles to each buses.
 # @param filePath Path to the load profiles excel file.
 # @param day Day of the year.
 # @param graph Graph to add the loads.
 # @param profilesType Type of profiles for the day.
 def readLoadProfilesExcel(filePath,day,graph,profilesType):
+	baseActiveProfiles,baseReactiveProfiles=readBaseProfilesExcel(filePath,day,profilesType)
+	setLoadProfiles(graph,baseActiveProfiles,baseReactiveProfiles)
+
+## Set the profiles of the loads of a graph from the base profiles of a day.
+# @param graph Graph with the loads.
+# @param baseActiveProfiles Dictionary of the active base profiles by type.
+# @param baseReactiveProfiles Dictionary of the reactive base profiles by type.
+@instrumentation.instrumented()
+def setLoadProfiles(graph,baseActiveProfiles,baseReactiveProfiles):
+	# Iterate over the nodes
+	for n,ndata in graph.nodes(data=True):
+		# Filter nodes without data
+		if len(ndata)==0 or ndata['load'] is None:
+			continue
+		load=ndata['load']
+		for name,pType,refPower in loadProfiles(load,baseActiveProfiles):
+			load.activeProfiles[name]=list(map(lambda x: refPower*x,baseActiveProfiles[pType]))
+			load.reactiveProfiles[name]=list(map(lambda x: refPower*x,baseReactiveProfiles[pType]))
+
+## Get the profiles of a load as the product of a reference power and a base profile.
+# @param load LoadData with its reference powers.
+# @param profileTypes Types of the available base profiles.
+# @return List of tuples with the name of the profile in the load, the type of its base profile and the reference power.
+def loadProfiles(load,profileTypes):
+	profiles=[]
+	for refType,refPower in load.refPowers.items():
+		if refType == 'load':
+			if load.loadType in ['R']:
+				continue
+			elif load.loadType in ['I1','I2','I3','IEP']:
+				profiles.append((refType,load.loadType,refPower))
+			else:
+				raise Exception('Unhandled load type: "%s".'%load.loadType)
+		elif refType == 'inhab':
+			if not load.loadType in ['R']:
+				raise Exception('Inhabitant not handled with load type "%s".'%load.loadType)
+			profiles.append(('load',load.loadType,refPower))
+		elif refType in profileTypes:
+			profiles.append((refType,refType,refPower))
+		else:
+			raise Exception('Production/consumption of type "%s" not handled.'%refType)
+	return profiles
+
+## Read the base profiles of a day, the profile of a load is its reference power times the base profile of its type.
+# @param filePath Path to the load profiles excel file.
+# @param day Day of the year.
+# @param profilesType Type of profiles for the day.
+# @return Tuple of dictionaries with the active and reactive base profiles of the day by type, positive for a production.
+@instrumentation.instrumented()
+def readBaseProfilesExcel(filePath,day,profilesType):
 	# Open excel (buffered)
 	if filePath != networkMaker.BUFFER_PROFILES_FILE:
 		networkMaker.BUFFER_PROFILES = xlrd.open_workbook(filePath,on_demand=True)
@@ -48,8 +205,6 @@ def readLoadProfilesExcel(filePath,day,graph,profilesType):
 	xl = networkMaker.BUFFER_PROFILES
 
 	# Constants
-	# Row of the headers profile
-	PROFILES_HEADERS_ROW={'R':5,'HP':8,'I1':8,'I2':9,'I3':9,'EC':8,'PV':0,'Wind':0,'IEP':1,'CHP':0}
 	# Sign (+1 or -1) of the profile, positive for a production.
 	PROFILES_SIGN={'R':-1, 'HP':-1,'I1':-1,'I2':-1,'I3':-1,'EC':-1,'PV':1,'Wind':1,'IEP':-1,'CHP':1}
 	# Power factors of each profiles.
@@ -67,9 +222,11 @@ def readLoadProfilesExcel(filePath,day,graph,profilesType):
 		baseActiveProfiles[pType]=sheet.col_values(1, start_rowx=PROFILES_HEADERS_ROW[pType]+2, end_rowx=PROFILES_HEADERS_ROW[pType]+2+96)
 
 	# Day dependent profiles
-	for pType in ['PV','Wind','IEP']:
+	for pType in DAILY_PROFILE_TYPES:
 		sheet=xl.sheet_by_name(pType)
 		baseActiveProfiles[pType]=sheet.col_values(2, start_rowx=PROFILES_HEADERS_ROW[pType]+1+(day-1)*96, end_rowx=PROFILES_HEADERS_ROW[pType]+1+day*96)
+		if len(baseActiveProfiles[pType]) < 96:
+			raise Exception('Day %s not in the sheet "%s" of "%s", which has the profiles of %s days.'%(day,pType,filePath,(sheet.nrows-PROFILES_HEADERS_ROW[pType]-1)//96))
 
 	# Obtain the base profile dependent on the calendar
 	for pType in profilesType:
@@ -94,6 +251,8 @@ def readLoadProfilesExcel(filePath,day,graph,profilesType):
 		else:
 			raise Exception('Reading of the base profile of type %s not handled.'%pType)
 
+	instrumentation.addRows(sum(len(p) for p in baseActiveProfiles.values())+sum(len(p) for p in baseReactiveProfiles.values()))
+
 	# Set the correct sign to each base profile
 	for pType, profile in baseActiveProfiles.items():
 		profile=list(map(lambda x: x*PROFILES_SIGN[pType],profile))
@@ -107,37 +266,14 @@ def readLoadProfilesExcel(filePath,day,graph,profilesType):
 			else:
 				baseReactiveProfiles[pType]=list(map(lambda x: x*math.tan(math.acos(PROFILES_DEFAULT_POWER_FACTOR)),profile))
 
-	# Iterate over the nodes
-	for n,ndata in graph.nodes(data=True):
-		# Filter nodes without data
-		if len(ndata)==0 or ndata['load'] is None:
-			continue
-		load=ndata['load']
-		for refType,refPower in load.refPowers.items():
-			if refType == 'load':
-				if load.loadType in ['R']:
-					continue
-				elif load.loadType in ['I1','I2','I3','IEP']:
-					load.activeProfiles[refType]=list(map(lambda x: load.refPowers[refType]*x,baseActiveProfiles[load.loadType]))
-					load.reactiveProfiles[refType]=list(map(lambda x: load.refPowers[refType]*x,baseReactiveProfiles[load.loadType]))
-				else:
-					raise Exception('Unhandled load type: "%s".'%load.loadType)
-			elif refType == 'inhab':
-				if not load.loadType in ['R']:
-					raise Exception('Inhabitant not handled with load type "%s".'%load.loadType)
-				load.activeProfiles['load']=list(map(lambda x: load.refPowers[refType]*x,baseActiveProfiles[load.loadType]))
-				load.reactiveProfiles['load']=list(map(lambda x: load.refPowers[refType]*x,baseReactiveProfiles[load.loadType]))
-			elif refType in baseActiveProfiles:
-				load.activeProfiles[refType]=list(map(lambda x: load.refPowers[refType]*x,baseActiveProfiles[refType]))
-				load.reactiveProfiles[refType]=list(map(lambda x: load.refPowers[refType]*x,baseReactiveProfiles[refType]))
-			else:
-				raise Exception('Production/consumption of type "%s" not handled.'%p)
+	return baseActiveProfiles,baseReactiveProfiles
 
 ## Read the calendar excel file and obtain the day type given a load type.
 # @param filePath Path to the load profiles excel file.
 # @param year Year.
 # @param day Day of the year as a number.
 # @return Dictionary of the profile type.
+@instrumentation.instrumented()
 def readCalendarExcel(filePath,year,day):
 	# Start cell of the month in the calendar excel.
 	CALENDAR_CELLS={'January':(3,2),'February':(18,2),'March':(33,2),
@@ -224,6 +360,7 @@ def readCalendarExcel(filePath,year,day):
 # @param year Year of the scenarios.
 # @param graph Graph to add the loads.
 # @param scenarioType Type of scenario. Usually 'L' or 'H'.
+@instrumentation.instrumented()
 def readScenariosExcel(filePath,year,graph,scenarioType='H'):
 	# Open excel (buffered)
 	if filePath != networkMaker.BUFFER_SCENARIOS_FILE:
@@ -238,14 +375,13 @@ def readScenariosExcel(filePath,year,graph,scenarioType='H'):
 	SCENARIOS_BUS_COLUMN=0
 	# Number of the column of the profile type.
 	SCENARIOS_TYPE_COLUMN=2
-	# Reference powers of the load.
-	SCENARIOS_REFERENCE_POWERS={'load':3,'inhab':4,'EC':5,'HP':6,'PV':7,'CHP':8,'Wind':9}
 
 	# Read the file
 	loadCount=1
 	unknownBuses=set()
 	doubleLoads=set()
 	sheet=xl.sheet_by_name("scenarios %s %s"%(year,scenarioType))
+	instrumentation.addRows(sheet.nrows-SCENARIOS_HEADER_SIZE)
 	for row in range(SCENARIOS_HEADER_SIZE,sheet.nrows):
 
 		# Get bus and check existence
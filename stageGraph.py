@@ -0,0 +1,265 @@
+## Dependency graph of the reading stages with a cache of every intermediate result.
+# makeNetwork and readScenarios are split in stages: the buses, the cables, the lines, the LV transformers, the loads
+# of a year and scenario, the calendar table of a year and the base profiles of a day. The key of a stage is the hash
+# of its own input files, of its parameters and of the keys of the stages it depends on, so that editing a workbook only
+# recomputes the stages reading it and the stages after them. For example, editing the scenarios workbook recomputes
+# the loads and keeps the network, the calendar and the base profiles. The results are kept in memory and pickled in
+# the folder CACHE_FOLDER of the derived files of the data folder, see cacheFolders, which can be deleted at any time.
+#@author Sebastien MATHIEU
+
+import sys, os, copy, time, pickle, datetime
+
+import networkMaker
+import scenariosReader
+import buildManifest
+import cacheFolders
+import lazyImport
+networkx=lazyImport.lazyModule('networkx')
+
+## Folder of the cached stages in the folder of derived files of the data folder.
+CACHE_FOLDER="cache"
+## Version of the stages, to increase when a reader changes so that the cached results are recomputed.
+STAGES_VERSION=1
+
+# Opened stage graphs by cache folder.
+openedGraphs={}
+
+## Entry point of the program.
+# @param argv Program parameters.
+def main(argv):
+	argv=cacheFolders.cacheFolderOption(argv)
+	if len(argv) < 3:
+		displayHelp()
+		sys.exit(2)
+	folderPath=argv[0] if argv[0].endswith(("/","\\")) else argv[0]+"/"
+	if not os.path.exists(folderPath):
+		raise Exception('Folder \"%s\" does not exists.' % folderPath)
+	year=int(argv[1])
+	day=int(argv[2])
+	scenario=argv[3] if len(argv) > 3 else 'H'
+
+	stages=openStageGraph(folderPath)
+	readScenarios(folderPath,year,day,scenario,stages)
+	for result in stages.history:
+		print("%-16s %-9s %8.3fs %s" % (result.name,"computed" if result.computed else "cached",result.seconds,result.key[:12]))
+
+## Display help of the program.
+def displayHelp():
+	text="Usage :\n\tpython3 stageGraph.py dataFolder year day [scenario] [--cache-folder=folder]\n"
+	text+="\nRead the network and the scenario of a day through the cached stages and print the stages computed or taken from\n"
+	text+="the cache in the folder \"%s\" of the derived files of the data folder, under the folder of --cache-folder, of the\n" % CACHE_FOLDER
+	text+="environment variable %s or \"%s\".\n" % (cacheFolders.CACHE_VARIABLE,cacheFolders.cacheRoot())
+	print(text)
+
+## Open the stage graph of a data folder, shared by the calls with the same cache folder.
+# @param folderPath Folder with the excel files.
+# @param cacheFolder Folder of the cached stages, the folder CACHE_FOLDER of the derived files of the data folder if None, see cacheFolders.
+# @return StageGraph.
+def openStageGraph(folderPath,cacheFolder=None):
+	if cacheFolder is None:
+		cacheFolder=cacheFolders.cacheFolder(folderPath,CACHE_FOLDER)
+	if cacheFolder not in openedGraphs:
+		openedGraphs[cacheFolder]=StageGraph(cacheFolder)
+	return openedGraphs[cacheFolder]
+
+## Read the network as makeNetwork through the cached stages.
+# @param folderPath Folder with the excel files.
+# @param stages StageGraph, the one of the data folder if None.
+# @return Graph, a copy which can be modified.
+def makeNetwork(folderPath,stages=None):
+	if stages is None:
+		stages=openStageGraph(folderPath)
+	return copy.deepcopy(networkStage(stages,folderPath).value)
+
+## Read the network with the loads of a day as makeNetwork followed by readScenarios through the cached stages.
+# @param folderPath Folder with the excel files.
+# @param year Year of the scenarios.
+# @param day Day of the year.
+# @param scenarioType Type of scenario. Usually 'L' or 'H'.
+# @param stages StageGraph, the one of the data folder if None.
+# @return Graph with the loads of the day, a copy which can be modified.
+def readScenarios(folderPath,year,day,scenarioType='H',stages=None):
+	if stages is None:
+		stages=openStageGraph(folderPath)
+	loads=loadsStage(stages,folderPath,year,scenarioType)
+	profilesType=calendarStage(stages,folderPath,year).value[day]
+	baseActiveProfiles,baseReactiveProfiles=baseProfilesStage(stages,folderPath,day,profilesType).value
+	graph=copy.deepcopy(loads.value)
+	scenariosReader.setLoadProfiles(graph,baseActiveProfiles,baseReactiveProfiles)
+	return graph
+
+## Stages of the network.
+# @param stages StageGraph.
+# @param folderPath Folder with the excel files.
+# @return StageResult with the graph of the network.
+def networkStage(stages,folderPath):
+	buses=stages.run("buses",readBuses,[folderPath+networkMaker.BUSES_FILE])
+	cables=stages.run("cables",networkMaker.readCablesExcel,[folderPath+networkMaker.CABLES_FILE])
+	lines=stages.run("lines",readLines,[folderPath+networkMaker.LINES_FILE],[cables,buses])
+	return stages.run("transformers",readLvTransformers,[folderPath+networkMaker.LV_TRANSFORMERS_FILE],[lines])
+
+## Stage of the loads of a year and scenario, without their profiles.
+# @param stages StageGraph.
+# @param folderPath Folder with the excel files.
+# @param year Year of the scenarios.
+# @param scenarioType Type of scenario.
+# @return StageResult with the graph of the network with the loads.
+def loadsStage(stages,folderPath,year,scenarioType):
+	return stages.run("loads",lambda filePath,network: readLoads(filePath,network,year,scenarioType),
+					[folderPath+scenariosReader.SCENARIOS_FILE],[networkStage(stages,folderPath)],{"year":year,"scenario":scenarioType})
+
+## Stage of the calendar table of a year.
+# @param stages StageGraph.
+# @param folderPath Folder with the excel files.
+# @param year Year.
+# @return StageResult with the dictionary of the profiles type of each day of the year.
+def calendarStage(stages,folderPath,year):
+	return stages.run("calendar",lambda filePath: readCalendar(filePath,year),[folderPath+scenariosReader.CALENDAR_FILE],parameters={"year":year})
+
+## Stage of the base profiles of a day.
+# The stage is keyed by the profiles type of the day rather than by the calendar stage, so that editing the calendar
+# only recomputes the base profiles of the days whose type changed.
+# @param stages StageGraph.
+# @param folderPath Folder with the excel files.
+# @param day Day of the year.
+# @param profilesType Type of profiles for the day.
+# @return StageResult with the tuple of the active and reactive base profiles.
+def baseProfilesStage(stages,folderPath,day,profilesType):
+	return stages.run("baseProfiles",lambda filePath: scenariosReader.readBaseProfilesExcel(filePath,day,profilesType),
+					[folderPath+scenariosReader.LOAD_PROFILES_FILE],parameters={"day":day,"profilesType":profilesType})
+
+## Read the buses in a new graph.
+# @param filePath Path to the buses excel file.
+# @return Graph with the buses.
+def readBuses(filePath):
+	graph=networkx.MultiGraph()
+	networkMaker.readBusesExcel(filePath,graph)
+	return graph
+
+## Read the lines in a copy of the graph with the buses.
+# @param filePath Path to the lines excel file.
+# @param cables Cables data as a map.
+# @param buses Graph with the buses.
+# @return Graph with the buses and lines.
+def readLines(filePath,cables,buses):
+	graph=copy.deepcopy(buses)
+	networkMaker.readLinesExcel(filePath,cables,graph)
+	return graph
+
+## Read the LV transformers in a copy of the graph with the lines.
+# @param filePath Path to the transformers excel file.
+# @param lines Graph with the buses and lines.
+# @return Graph of the network.
+def readLvTransformers(filePath,lines):
+	graph=copy.deepcopy(lines)
+	networkMaker.readLvTransformersExcel(filePath,graph)
+	return graph
+
+## Read the loads in a copy of the graph of the network.
+# @param filePath Path to the scenarios excel file.
+# @param network Graph of the network.
+# @param year Year of the scenarios.
+# @param scenarioType Type of scenario.
+# @return Graph with the loads.
+def readLoads(filePath,network,year,scenarioType):
+	graph=copy.deepcopy(network)
+	scenariosReader.readScenariosExcel(filePath,year,graph,scenarioType)
+	return graph
+
+## Read the profiles type of every day of a year.
+# @param filePath Path to the calendar excel file.
+# @param year Year.
+# @return Dictionary of the profiles type with the day of the year as key.
+def readCalendar(filePath,year):
+	days=datetime.date(year,12,31).timetuple().tm_yday
+	return dict((d,scenariosReader.readCalendarExcel(filePath,year,d)) for d in range(1,days+1))
+
+## Result of a stage.
+class StageResult:
+	## Constructor.
+	# @param name Name of the stage.
+	# @param key Key of the stage.
+	# @param value Result of the stage.
+	# @param computed True if the stage was computed, false if it was taken from the cache.
+	# @param seconds Time to compute or load the stage.
+	def __init__(self,name,key,value,computed,seconds):
+		self.name=name
+		self.key=key
+		self.value=value
+		self.computed=computed
+		self.seconds=seconds
+
+	## @var name
+	# Name of the stage.
+	## @var key
+	# Key of the stage, hash of its input files, parameters and dependencies.
+	## @var value
+	# Result of the stage, which must not be modified.
+	## @var computed
+	# True if the stage was computed, false if it was taken from the cache.
+	## @var seconds
+	# Time to compute or load the stage in seconds.
+
+## Graph of stages whose results are cached in memory and in a folder.
+class StageGraph:
+	## Constructor.
+	# @param cacheFolder Folder of the pickled results, None to only keep them in memory.
+	def __init__(self,cacheFolder=None):
+		self.cacheFolder=cacheFolder
+		self.results={}
+		self.history=[]
+
+	## Compute the key of a stage.
+	# @param name Name of the stage.
+	# @param inputFiles List of paths of the input files read by the stage.
+	# @param dependencies List of StageResult of the stages it depends on.
+	# @param parameters Dictionary of the parameters.
+	# @return Hexadecimal key.
+	def key(self,name,inputFiles,dependencies,parameters):
+		return buildManifest.hashParameters({"name":name,"version":STAGES_VERSION,"parameters":parameters,
+											"inputs":[buildManifest.hashFile(f) for f in inputFiles],
+											"dependencies":[d.key for d in dependencies]})
+
+	## Get the result of a stage, from the memory, from the cache folder or by computing it.
+	# @param name Name of the stage.
+	# @param function Function of the stage, called with the input files then the values of the dependencies.
+	# @param inputFiles List of paths of the input files read by the stage.
+	# @param dependencies List of StageResult of the stages it depends on.
+	# @param parameters Dictionary of the parameters which are not in the input files.
+	# @return StageResult.
+	def run(self,name,function,inputFiles,dependencies=[],parameters={}):
+		key=self.key(name,inputFiles,dependencies,parameters)
+		if key in self.results:
+			return self.results[key]
+
+		tic=time.perf_counter()
+		filePath=os.path.join(self.cacheFolder,"%s_%s.pickle" % (name,key)) if self.cacheFolder is not None else None
+		if filePath is not None and os.path.exists(filePath):
+			with open(filePath,'rb') as file:
+				value=pickle.load(file)
+			computed=False
+		else:
+			value=function(*(inputFiles+[d.value for d in dependencies]))
+			computed=True
+			if filePath is not None:
+				if not os.path.exists(self.cacheFolder):
+					os.makedirs(self.cacheFolder)
+				with open(filePath+".tmp",'wb') as file:
+					pickle.dump(value,file,pickle.HIGHEST_PROTOCOL)
+				os.replace(filePath+".tmp",filePath)
+
+		result=StageResult(name,key,value,computed,time.perf_counter()-tic)
+		self.results[key]=result
+		self.history.append(result)
+		return result
+
+	## @var cacheFolder
+	# Folder of the pickled results, None to only keep them in memory.
+	## @var results
+	# StageResult by key of the stages run or loaded in this process.
+	## @var history
+	# StageResult of the stages in the order they were run or loaded.
+
+# Starting point from python #
+if __name__ == "__main__":
+	main(sys.argv[1:])
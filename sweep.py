@@ -0,0 +1,187 @@
+## Convert several years and scenarios at once, sharing the parsed inputs between the combinations.
+# The inputs are parsed once in the parent process: the network, the loads of each year and scenario, and the base
+# profiles of every day of a year, which only depend on the year and the calendar, from the injection store of the year.
+# The days are split in chunks solved by a pool of processes. The graphs with the loads are handed to the workers and the
+# base profiles are published in a dataPlane to which the workers attach, so that they do not read the Excel files.
+#@author Sebastien MATHIEU
+
+import sys, os, copy, time
+import multiprocessing
+
+import networkMaker
+import scenariosReader
+import matpowerConverter
+import pyflowConverter
+import daySelector
+import injectionStore
+import dataPlane
+
+## Output formats of the sweep.
+FORMATS=['matpower','pyflow','npy']
+## Default number of days of a chunk.
+CHUNK_DAYS=7
+
+# State of a worker process, set by initWorker.
+workerState={}
+
+## Entry point of the program.
+# @param argv Program parameters.
+def main(argv):
+	# Options
+	workers=None
+	chunkDays=CHUNK_DAYS
+	days,argv=daySelector.daysOption(argv)
+	options=[a for a in argv if a.startswith('--')]
+	argv=[a for a in argv if not a.startswith('--')]
+	for o in options:
+		if o.startswith('--workers='):
+			workers=int(o[len('--workers='):])
+		elif o.startswith('--chunk='):
+			chunkDays=int(o[len('--chunk='):])
+		else:
+			displayHelp()
+			sys.exit(2)
+
+	if len(argv) < 5:
+		displayHelp()
+		sys.exit(2)
+	folderPath=argv[0] if argv[0].endswith(("/","\\")) else argv[0]+"/"
+	if not os.path.exists(folderPath):
+		raise Exception('Folder \"%s\" does not exists.' % folderPath)
+	outputFormat=argv[1]
+	if outputFormat not in FORMATS:
+		raise Exception('Unknown format "%s", expected one of %s.' % (outputFormat,FORMATS))
+	slackBusId=int(argv[2])
+	years=[int(y) for y in argv[3].split(',')]
+	scenarios=argv[4].split(',')
+	outputPath=argv[5] if len(argv) > 5 else "."
+
+	runSweep(folderPath,outputFormat,slackBusId,years,scenarios,outputPath,workers=workers,chunkDays=chunkDays,days=days)
+
+## Display help of the program.
+def displayHelp():
+	text="Usage :\n\tpython3 sweep.py dataFolder format slackBusId year[,year...] scenario[,scenario...] [outputFolder] [--workers=N] [--chunk=days] [--days=days]\n"
+	text+="\nThe format is one of %s. The files of each combination are written in the folder \"y<year>s<scenario>\" of the output folder\n"%", ".join(FORMATS)
+	text+="with the names of the year mode of the converters. With the format npy, the topology shared by all the combinations\n"
+	text+="is written once as \"ylpic_topology.npz\".\n"
+	text+="With the option --days=1-31,45 or --days=selection.csv, a file written by daySelector, only these days of each year are converted.\n"
+	print(text)
+
+## Convert every combination of years and scenarios.
+# @param folderPath Folder with the excel files.
+# @param outputFormat Output format, one of FORMATS.
+# @param slackBusId Id of the slack bus.
+# @param years List of years.
+# @param scenarios List of types of scenario.
+# @param outputPath Output folder.
+# @param workers Number of worker processes, the number of cores if None.
+# @param chunkDays Number of consecutive days of a task.
+# @param days Days of each year, the scenariosReader.YEAR_DAYS days of the converters if None.
+def runSweep(folderPath,outputFormat,slackBusId,years,scenarios,outputPath=".",workers=None,chunkDays=CHUNK_DAYS,days=None):
+	tic=time.time()
+	if workers is None:
+		workers=os.cpu_count() or 1
+	for year in years:
+		for scenario in scenarios:
+			combinationPath=os.path.join(outputPath,"y%ss%s"%(year,scenario))
+			if not os.path.exists(combinationPath):
+				os.makedirs(combinationPath)
+
+	# The topology does not depend on the year nor the scenario
+	graph=networkMaker.makeNetwork(folderPath)
+	if outputFormat == 'npy':
+		pyflowConverter.makePyflowTopology(os.path.join(outputPath,"ylpic_topology.npz"),graph,slackBusId)
+
+	# Loads of each combination
+	graphs={}
+	for year in years:
+		for scenario in scenarios:
+			g=copy.deepcopy(graph)
+			scenariosReader.readScenariosExcel(folderPath+scenariosReader.SCENARIOS_FILE,year,g,scenario)
+			graphs[(year,scenario)]=g
+
+	# Tasks of consecutive days of a year, each with all the scenarios
+	tasks=[]
+	for year in years:
+		yearDays=list(days) if days is not None else list(range(1,scenariosReader.YEAR_DAYS+1))
+		tasks+=[(year,yearDays[i:i+chunkDays]) for i in range(0,len(yearDays),chunkDays)]
+
+	# Base profiles of every day of each year, from the store of the year with any scenario
+	plane=dataPlane.DataPlane()
+	for year in years:
+		dataPlane.publishInjectionStore(plane,injectionStore.openStore(folderPath,year,scenarios[0]),prefix="y%s"%year)
+
+	print("Sweep of %s years and %s scenarios with %s workers" % (len(years),len(scenarios),workers))
+	initArgs=(plane.descriptor,years,outputFormat,slackBusId,scenarios,outputPath,graphs)
+	if workers == 1:
+		initWorker(*initArgs)
+		results=map(convertDays,tasks)
+	else:
+		pool=multiprocessing.Pool(workers,initWorker,initArgs)
+		results=pool.imap_unordered(convertDays,tasks)
+	try:
+		for year,days in results:
+			print("\t%s days %s-%s" % (year,days[0],days[-1]))
+	finally:
+		if workers != 1:
+			pool.close()
+			pool.join()
+		else:
+			workerState.pop("view").detach()
+		plane.release()
+	print("%s combinations converted in %.2fs" % (len(years)*len(scenarios),time.time()-tic))
+
+## Initialize a worker process by attaching to the data plane with the base profiles.
+# @param descriptor PlaneDescriptor of the plane with the injection store of each year.
+# @param years List of years.
+# @param outputFormat Output format, one of FORMATS.
+# @param slackBusId Id of the slack bus.
+# @param scenarios List of types of scenario.
+# @param outputPath Output folder.
+# @param graphs Network graphs with the loads by year and scenario.
+def initWorker(descriptor,years,outputFormat,slackBusId,scenarios,outputPath,graphs):
+	view=dataPlane.attach(descriptor)
+	stores=dict((year,dataPlane.attachInjectionStore(view,prefix="y%s"%year)) for year in years)
+	workerState.update({"view":view,"stores":stores,"outputFormat":outputFormat,"slackBusId":slackBusId,"scenarios":scenarios,
+						"outputPath":outputPath,"graphs":graphs})
+
+## Get the base profiles of a day in a worker.
+# @param year Year.
+# @param day Day of the year.
+# @return Tuple of dictionaries with the active and reactive base profiles of the day by type.
+def baseProfiles(year,day):
+	store=workerState["stores"][year]
+	periods=store.periods(day)
+	active=dict((p,store.activeBase[k,periods].tolist()) for k,p in enumerate(store.profileTypes))
+	reactive=dict((p,store.reactiveBase[k,periods].tolist()) for k,p in enumerate(store.profileTypes))
+	return active,reactive
+
+## Convert consecutive days of a year for every scenario in a worker.
+# @param task Tuple with the year and the list of days.
+# @return The task.
+def convertDays(task):
+	year,days=task
+	slackBusId=workerState["slackBusId"]
+	for d in days:
+		# Base profiles shared by the scenarios
+		baseActiveProfiles,baseReactiveProfiles=baseProfiles(year,d)
+
+		for scenario in workerState["scenarios"]:
+			g=workerState["graphs"][(year,scenario)]
+			scenariosReader.setLoadProfiles(g,baseActiveProfiles,baseReactiveProfiles)
+			outputPath=os.path.join(workerState["outputPath"],"y%ss%s"%(year,scenario),"")
+
+			if workerState["outputFormat"] == 'npy':
+				pyflowConverter.makePyflowInjections('%sylpic_y%ss%sd%s_injections.npy' % (outputPath,year,scenario,d),g)
+				continue
+			for period in range(1,97):
+				caseName='ylpic_y%ss%sd%sp%s' % (year,scenario,d,period)
+				if workerState["outputFormat"] == 'matpower':
+					matpowerConverter.makeMatpowerFile('%s%s.m' % (outputPath,caseName),g,caseName,slackBusId,period-1)
+				else:
+					pyflowConverter.makePyflowFile('%s%s.py' % (outputPath,caseName),g,caseName,slackBusId,period-1)
+	return task
+
+# Starting point from python #
+if __name__ == "__main__":
+	main(sys.argv[1:])
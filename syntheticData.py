@@ -0,0 +1,277 @@
+## Generate synthetic Excel files shaped like the Ylpic data.
+# The real Ylpic workbooks are confidential. This module writes workbooks with the same file names, sheet names and
+# column layouts as the ones read by networkMaker and scenariosReader so that the converters can be run and timed.
+# Requires openpyxl which can be installed with "pip3 install openpyxl".
+#@author Sebastien MATHIEU
+
+import sys, os, datetime, math, random
+
+import networkMaker
+import scenariosReader
+import networkArrays
+
+## Years covered by the generated scenarios and calendar.
+YEARS=[2015,2020,2030,2050]
+## Scenario types generated.
+SCENARIO_TYPES=['L','H']
+## Base voltage of the buses in V.
+BASE_VOLTAGE=10000.0
+## Number of buses of a feeder.
+FEEDER_SIZE=30
+## Day types of the calendar with their abbreviation.
+DAY_TYPES={'w':'Weekday','s':'Saturday','h':'Sunday'}
+## Cable types available as (section, core, insulation, insulation voltage, R1, X1, C1, iMax).
+CABLE_TYPES=[(95,'Al','XLPE',12,0.320,0.110,0.25,250),
+			(150,'Al','XLPE',12,0.206,0.105,0.29,315),
+			(240,'Al','XLPE',12,0.125,0.098,0.35,415)]
+
+## Entry point of the program.
+# @param argv Program parameters.
+def main(argv):
+	if len(argv) < 2:
+		displayHelp()
+		sys.exit(2)
+	outputPath=argv[0] if argv[0].endswith(("/","\\")) else argv[0]+"/"
+	busCount=int(argv[1])
+	seed=int(argv[2]) if len(argv) > 2 else 0
+	makeSyntheticData(outputPath,busCount,seed)
+
+## Display help of the program.
+def displayHelp():
+	text="Usage :\n\tpython3 syntheticData.py outputFolder busCount [seed]\n"
+	text+="\nExample:\n\tpython3 syntheticData.py synthetic1000 1000\n"
+	print(text)
+
+## Write a complete synthetic data set.
+# @param outputPath Folder of the generated Excel files.
+# @param busCount Number of buses of the network.
+# @param seed Seed of the random generator.
+def makeSyntheticData(outputPath,busCount,seed=0):
+	if not os.path.exists(outputPath):
+		os.makedirs(outputPath)
+	rand=random.Random(seed)
+
+	buses,lines=makeTopology(busCount,rand)
+	writeBusesExcel(outputPath+networkMaker.BUSES_FILE,buses)
+	writeCablesExcel(outputPath+networkMaker.CABLES_FILE)
+	writeLinesExcel(outputPath+networkMaker.LINES_FILE,lines)
+	writeLvTransformersExcel(outputPath+networkMaker.LV_TRANSFORMERS_FILE,buses,rand)
+	writeScenariosExcel(outputPath+scenariosReader.SCENARIOS_FILE,buses,rand)
+	writeCalendarExcel(outputPath+scenariosReader.CALENDAR_FILE)
+	writeLoadProfilesExcel(outputPath+scenariosReader.LOAD_PROFILES_FILE,rand)
+	writePricesExcel(outputPath+"prices.xlsx",rand)
+
+## Make a random radial topology.
+# @param busCount Number of buses.
+# @param rand Random generator.
+# @return Tuple with the list of bus ids and the list of lines as (id, from, to, segments) where segments is a list of
+# (cable index, length in m).
+def makeTopology(busCount,rand):
+	buses=[networkArrays.ROOT_BUS]+[10000+i for i in range(1,busCount)]
+	lines=[]
+	lineId=1
+	feeder=[]
+	for i in range(1,busCount):
+		# Feeders of about FEEDER_SIZE buses leave the root and grow as chains with some branching
+		if len(feeder) == 0 or len(feeder) >= FEEDER_SIZE:
+			feeder=[networkArrays.ROOT_BUS]
+		parent=feeder[-1] if rand.random() < 0.7 else feeder[rand.randrange(0,len(feeder))]
+		segments=[(rand.randrange(len(CABLE_TYPES)),rand.uniform(50,500)) for s in range(1 if rand.random() < 0.8 else rand.randint(2,4))]
+		lines.append((lineId,parent,buses[i],segments))
+		feeder.append(buses[i])
+		lineId+=1
+
+	# A few open tie lines between feeders
+	for k in range(max(1,busCount//100)):
+		u,v=rand.sample(buses[1:],2) if busCount > 2 else (buses[0],buses[-1])
+		lines.append((lineId,u,v,[(0,rand.uniform(50,800))]))
+		lineId+=1
+	return buses,lines
+
+## Write a workbook.
+# @param filePath Path of the workbook.
+# @param sheets List of sheets as tuples with the name of the sheet and its rows as lists of values.
+def writeWorkbook(filePath,sheets):
+	import openpyxl
+
+	wb=openpyxl.Workbook(write_only=True)
+	for sheetName,rows in sheets:
+		sheet=wb.create_sheet(sheetName)
+		for row in rows:
+			sheet.append(row)
+	wb.save(filePath)
+
+## Write the buses file.
+# @param filePath Path of the workbook.
+# @param buses List of bus ids.
+def writeBusesExcel(filePath,buses):
+	rows=[['id','name','cell','bus bar','voltage','','','status']]
+	for b in buses:
+		# A single closed cell on bus bar 1, the open lines of writeLinesExcel are connected to a missing cell
+		rows.append([b,'Bus %s'%b,1,1,BASE_VOLTAGE,'','','F'])
+	writeWorkbook(filePath,[('Noeuds',rows)])
+
+## Write the cables file.
+# @param filePath Path of the workbook.
+def writeCablesExcel(filePath):
+	rows=[['type','R1','X1','C1','','','','','','iMax']]
+	for section,core,insulation,insulationVoltage,R1,X1,C1,iMax in CABLE_TYPES:
+		rows.append(['S-%s-%s-%s-%s'%(float(section),core,insulation,float(insulationVoltage)),R1,X1,C1,'','','','','',iMax])
+	writeWorkbook(filePath,[('cables',rows)])
+
+## Write the lines file, one row per segment.
+# @param filePath Path of the workbook.
+# @param lines List of lines as (id, from, to, segments), the last lines are open.
+def writeLinesExcel(filePath,lines):
+	rows=[['id','from','from bus bar','from cell','to','to bus bar','to cell','','','','','length','','voltage','','','core','insulation','insulation voltage','section','segment length']]
+	for id,u,v,segments in lines:
+		lineLength=sum(l for c,l in segments)
+		closed=id <= len(lines)-max(1,(len(lines)+1)//101)
+		for c,l in segments:
+			section,core,insulation,insulationVoltage=CABLE_TYPES[c][:4]
+			rows.append([id,u,1,1,v,1,1 if closed else 2,'','','','',lineLength,'',BASE_VOLTAGE,'','',core,insulation,float(insulationVoltage),float(section),l])
+	writeWorkbook(filePath,[('lines',rows)])
+
+## Write the MV-LV transformers file.
+# @param filePath Path of the workbook.
+# @param buses List of bus ids, the first one being the root bus.
+# @param rand Random generator.
+def writeLvTransformersExcel(filePath,buses,rand):
+	rows=[['bus','id','pmax']]
+	for i,b in enumerate(buses[1:]):
+		if rand.random() < 0.7:
+			rows.append([b,i+1,rand.choice([160,250,400,630])])
+	writeWorkbook(filePath,[('transformers',rows)])
+
+## Write the scenarios file with a sheet per year and scenario type.
+# @param filePath Path of the workbook.
+# @param buses List of bus ids, the first one being the root bus.
+# @param rand Random generator.
+def writeScenariosExcel(filePath,buses,rand):
+	sheets=[]
+	loadTypes=['R']*6+['I1','I2','I3','IEP']
+	assignments=[(b,rand.choice(loadTypes),rand.random()) for b in buses[1:] if rand.random() < 0.8]
+	for year in YEARS:
+		for scenarioType in SCENARIO_TYPES:
+			growth=(1+(year-2015)/35.0)*(1.5 if scenarioType == 'H' else 1.0)
+			rows=[['scenarios %s %s'%(year,scenarioType)]]+[[]]*5
+			for b,loadType,u in assignments:
+				refPowers=[0]*7 # load, inhab, EC, HP, PV, CHP, Wind
+				if loadType == 'R':
+					refPowers[1]=20+int(200*u)
+					refPowers[2]=round(2*growth*u)
+					refPowers[3]=round(3*growth*u)
+					refPowers[4]=round(50*growth*u,1)
+				else:
+					refPowers[0]=round(50+450*u,1)
+					if u > 0.9:
+						refPowers[5]=round(500*u,1)
+					if u < 0.05:
+						refPowers[6]=round(2000*growth*u,1)
+				rows.append([b,'',loadType]+refPowers)
+			sheets.append(('scenarios %s %s'%(year,scenarioType),rows))
+	writeWorkbook(filePath,sheets)
+
+## Write the calendar file with a sheet per load type and year.
+# @param filePath Path of the workbook.
+def writeCalendarExcel(filePath):
+	CALENDAR_CELLS={'January':(3,2),'February':(18,2),'March':(33,2),
+					'April':(3,10),'May':(18,10),'June':(33,10),
+					'July':(3,18),'August':(18,18),'September':(33,18),
+					'October':(3,26),'November':(18,26),'December':(33,26)
+					}
+	ORDINAL_EXCEL_DIF=737425-43831
+	CALENDAR_ABBRV_MAP_COL=34
+
+	sheets=[]
+	for loadType in ['R','HP','I1','I2','I3','CHP']:
+		for year in YEARS:
+			grid={}
+			date=datetime.date(year,1,1)
+			while date.year == year:
+				l0,c0=CALENDAR_CELLS[date.strftime("%B")]
+				firstWeekday=date.replace(day=1).weekday()
+				index=firstWeekday+date.day-1
+				l=l0+2*(index//7)
+				c=c0+index%7
+				grid[(l,c)]=date.toordinal()-ORDINAL_EXCEL_DIF
+				grid[(l+1,c)]='w' if date.weekday() < 5 else ('s' if date.weekday() == 5 else 'h')
+				date+=datetime.timedelta(days=1)
+			for i,(abbrv,name) in enumerate(sorted(DAY_TYPES.items())):
+				grid[(1+i,CALENDAR_ABBRV_MAP_COL)]=abbrv
+				grid[(1+i,CALENDAR_ABBRV_MAP_COL+1)]=name
+			rows=[['' for c in range(CALENDAR_ABBRV_MAP_COL+2)] for l in range(50)]
+			for (l,c),v in grid.items():
+				rows[l][c]=v
+			sheets.append(('%s %s'%(loadType,year),rows))
+	writeWorkbook(filePath,sheets)
+
+## Make a smooth daily profile.
+# @param peak Quarter of the peak.
+# @param width Width of the peak in quarters.
+# @param base Base level.
+# @param rand Random generator.
+# @param amplitude Amplitude of the peak.
+# @return List of 96 values.
+def dailyProfile(peak,width,base,rand,amplitude=1.0):
+	return [max(0.0,base+amplitude*math.exp(-((t-peak)/float(width))**2)+rand.uniform(-0.02,0.02)) for t in range(96)]
+
+## Write the load profiles catalogue.
+# @param filePath Path of the workbook.
+# @param rand Random generator.
+def writeLoadProfilesExcel(filePath,rand):
+	PROFILES_HEADERS_ROW={'R':5,'HP':8,'I1':8,'I2':9,'I3':9,'EC':8,'PV':0,'Wind':0,'IEP':1,'CHP':0}
+	sheets=[]
+
+	# Single day profile
+	rows=[[] for l in range(PROFILES_HEADERS_ROW['EC']+2)]+[['',v] for v in dailyProfile(76,12,0.05,rand)]
+	sheets.append(('EC',rows))
+
+	# Day dependent profiles, one value every quarter of the 365 days of the year as in the real catalogue
+	for pType,peak,width in [('PV',48,14),('Wind',0,200),('IEP',50,30)]:
+		rows=[[] for l in range(PROFILES_HEADERS_ROW[pType]+1)]
+		for d in range(scenariosReader.YEAR_DAYS):
+			scale=0.5+0.5*math.sin(math.pi*d/float(scenariosReader.YEAR_DAYS)) if pType == 'PV' else rand.uniform(0.1,1.0)
+			rows.extend([['','',scale*v] for v in dailyProfile(peak,width,0.0 if pType == 'PV' else 0.2,rand)])
+		sheets.append((pType,rows))
+
+	# Calendar dependent profiles
+	for pType in ['R','HP','I1','I2','I3','CHP']:
+		header=PROFILES_HEADERS_ROW[pType]
+		reactive=pType in ['I1','I2','I3','CHP']
+		rows=[[] for l in range(header)]
+		headerRow=['']
+		profiles=[]
+		for abbrv,name in sorted(DAY_TYPES.items()):
+			headerRow.append(name)
+			profiles.append(dailyProfile(rand.randint(30,80),rand.randint(8,20),0.1,rand,0.4))
+			if reactive:
+				headerRow.append('')
+				profiles.append([0.3*v for v in profiles[-1]])
+		rows.append(headerRow)
+		rows.append([])
+		for t in range(96):
+			rows.append(['']+[p[t] for p in profiles])
+		sheets.append((pType,rows))
+	writeWorkbook(filePath,sheets)
+
+## Write the prices file of the first year.
+# @param filePath Path of the workbook.
+# @param rand Random generator.
+def writePricesExcel(filePath,rand):
+	ORDINAL_EXCEL_DIF=737425-43831
+	rows=[['date','quarter','energy price','upward imbalance price','downward imbalance price','system imbalance'],[]]
+	for year in YEARS:
+		date=datetime.date(year,1,1)
+		while date.year == year:
+			excelDate=date.toordinal()-ORDINAL_EXCEL_DIF
+			for t in range(96):
+				piE=40+20*math.sin(2*math.pi*t/96.0)+rand.uniform(-5,5)
+				rows.append([excelDate,t+1,piE,piE+rand.uniform(0,30),piE-rand.uniform(0,30),rand.uniform(-50,50)])
+			date+=datetime.timedelta(days=1)
+		break # The prices file covers a single year
+	writeWorkbook(filePath,[('prices',rows)])
+
+# Starting point from python #
+if __name__ == "__main__":
+	main(sys.argv[1:])
@@ -7,10 +7,12 @@ import datetime
 import time
 import copy
 
-import xlwt
-
 import networkMaker
 import scenariosReader
+import instrumentation
+import daySelector
+import lazyImport
+xlwt=lazyImport.lazyModule('xlwt')
 
 ## Entry point of the program.
 # @param argv Program parameters: data folder path, slack bus id, period of interest (scenario hardcoded for now).
@@ -22,6 +24,13 @@ def main(argv):
 	scenario = 'H'
 	T = 96
 
+	# Stream the days to a CSV file, with an optional memory budget in MB
+	stream=any(a.startswith("--stream") for a in argv)
+	memoryBudget=next((int(a[len("--stream="):]) for a in argv if a.startswith("--stream=")),None)
+	argv=[a for a in argv if not a.startswith("--stream")]
+	# Days of the time series, e.g. representative days of daySelector
+	days,argv=daySelector.daysOption(argv,range(1,366))
+
 	# Read instance folder
 	if len(argv) < 1 :
 		displayHelp()
@@ -36,6 +45,93 @@ def main(argv):
 
 	print("Compute time series %s %s" % (year, scenario))
 
+	if stream:
+		outputPath='timeseries-%s%s.csv' % (year,scenario)
+		makeTimeseriesCSV(outputPath,folderPath,year,scenario,T,memoryBudget,days)
+		print('"%s" saved after %.2fs' % (outputPath, time.time()-globalTic))
+		return
+
+	outputPath='timeseries-%s%s.xls' % (year,scenario)
+	makeTimeseriesXLS(outputPath,folderPath,year,scenario,T,days)
+	print('"%s" saved after %.2fs' % (outputPath, time.time()-globalTic))
+
+## Compute the total production and consumption of a period.
+# @param graph Graph with the daily scenario.
+# @param day Day of the year.
+# @param t Period of the day starting from 0.
+# @param T Number of periods of the day.
+# @return Tuple with the active production, active consumption, reactive production and reactive consumption in MW and MVar.
+def aggregateInjections(graph,day,t,T=96):
+	activeProduction=0.0
+	activeConsumption=0.0
+	reactiveProduction=0.0
+	reactiveConsumption=0.0
+
+	for n, ndata in graph.nodes(data=True):
+		Pd = 0 # MW
+		Qd = 0 # MVar
+		try:
+			loadData = ndata['load']
+			if loadData is not None:
+				for label, baseline in loadData.activeProfiles.items():
+					if len(baseline) < T:
+						raise Exception("Error with label \"%s\" in node %s, baseline has %s periods in day %s." % (label, n, len(baseline),day))
+
+				for baseline in loadData.activeProfiles.values():
+					Pd += baseline[t]/1e3 # Convert from W to MW
+				for baseline in loadData.reactiveProfiles.values():
+					Qd += baseline[t]/1e3 # Convert from VAr to MVAr
+		except KeyError:
+			pass
+
+		if Pd > 0:
+			activeProduction+=Pd
+			reactiveProduction+=Qd
+		else:
+			activeConsumption+=Pd
+			reactiveConsumption+=Qd
+	return activeProduction,activeConsumption,reactiveProduction,reactiveConsumption
+
+## Write the time series in a CSV file, day after day.
+# The days are read on the same graph and each row is written as soon as it is computed so that the memory does not
+# grow with the number of days.
+# @param outputPath Path of the CSV file.
+# @param folderPath Folder with the excel files.
+# @param year Year of the scenarios.
+# @param scenario Type of scenario.
+# @param T Number of periods of a day.
+# @param memoryBudget Resident memory in MB above which the buffered Excel files are released, None to keep them.
+# @param days Days of the year, the first 365 days if None.
+@instrumentation.instrumented(output=lambda outputPath,*args: outputPath)
+def makeTimeseriesCSV(outputPath,folderPath,year,scenario,T=96,memoryBudget=None,days=None):
+	if days is None:
+		days=range(1,366)
+	graph = networkMaker.makeNetwork(folderPath)
+	firstDay = datetime.date(year, 1, 1).toordinal()
+	with open(outputPath,'w') as file:
+		file.write('Day,Quarter,Active production [MW],Active consumption [MW],Net active injection [MW],Reactive Production [MVar],Reactive Consumption [MVar],Net reactive injection [MVar]\n')
+		for d,g in scenariosReader.iterateScenarios(folderPath,year,days,graph,scenario,memoryBudget):
+			tic = time.time()
+			day = datetime.date.fromordinal(firstDay+d-1)
+			for t in range(0, T):
+				activeProduction,activeConsumption,reactiveProduction,reactiveConsumption=aggregateInjections(g,d,t,T)
+				file.write('%s,%s,%r,%r,%r,%r,%r,%r\n' % (day.strftime('%d/%m/%Y'),t+1,activeProduction,activeConsumption,activeProduction+activeConsumption,
+														reactiveProduction,reactiveConsumption,reactiveProduction+reactiveConsumption))
+			print("\t day %s: %.3fs" % (d, time.time()-tic))
+
+## Write the time series in an Excel file.
+# The workbook is built in memory and saved once all the days are written.
+# @param outputPath Path of the Excel file.
+# @param folderPath Folder with the excel files.
+# @param year Year of the scenarios.
+# @param scenario Type of scenario.
+# @param T Number of periods of a day.
+# @param days Days of the year, the first 365 days if None.
+@instrumentation.instrumented(output=lambda outputPath,*args: outputPath)
+def makeTimeseriesXLS(outputPath,folderPath,year,scenario,T=96,days=None):
+	if days is None:
+		days=range(1,366)
+
 	# Create work sheet
 	wb = xlwt.Workbook()
 	sheet = wb.add_sheet('timeseries')
@@ -69,52 +165,25 @@ def main(argv):
 	# Read network data (all but power information)
 	firstDay = datetime.date(year, 1, 1).toordinal()
 	day = datetime.date(year, 1, 1)
-	for d in range(0,365):
+	for i,d in enumerate(days):
 		tic = time.time()
 		graph = copy.deepcopy(initGraph)
 
 		# Obtain the corresponding date-time
-		day=day.fromordinal(firstDay+d)
+		day=day.fromordinal(firstDay+d-1)
 
 		# Read daily data
-		scenariosReader.readScenarios(folderPath,year,d+1,graph,scenario)
+		scenariosReader.readScenarios(folderPath,year,d,graph,scenario)
 
 		for t in range(0, T):
-			l=2+d*T+t # Excel line
+			l=2+i*T+t # Excel line
 
 			# Write day and quarter
 			sheet.write(l, 0, day, dateStyle)
 			sheet.write(l, 1, t+1)
 
 			# Find production & consumption
-			activeProduction=0.0
-			activeConsumption=0.0
-			reactiveProduction=0.0
-			reactiveConsumption=0.0
-
-			for n, ndata in graph.nodes(data=True):
-				Pd = 0 # MW
-				Qd = 0 # MVar
-				try:
-					loadData = ndata['load']
-					if loadData is not None:
-						for label, baseline in loadData.activeProfiles.items():
-							if len(baseline) < T:
-								raise Exception("Error with label \"%s\" in node %s, baseline has %s periods in day %s." % (label, n, len(baseline),d+1))
-
-						for baseline in loadData.activeProfiles.values():
-							Pd += baseline[t]/1e3 # Convert from W to MW
-						for baseline in loadData.reactiveProfiles.values():
-							Qd += baseline[t]/1e3 # Convert from VAr to MVAr
-				except KeyError:
-					pass
-
-				if Pd > 0:
-					activeProduction+=Pd
-					reactiveProduction+=Qd
-				else:
-					activeConsumption+=Pd
-					reactiveConsumption+=Qd
+			activeProduction,activeConsumption,reactiveProduction,reactiveConsumption=aggregateInjections(graph,d,t,T)
 
 			# Write
 			sheet.write(l, 2, activeProduction)
@@ -124,16 +193,17 @@ def main(argv):
 			sheet.write(l, 6, reactiveConsumption)
 			sheet.write(l, 7, reactiveProduction+reactiveConsumption)
 
-		print("\t day %s: %.3fs" % (d+1, time.time()-tic))
+		print("\t day %s: %.3fs" % (d, time.time()-tic))
 
 	# Save
-	outputPath='timeseries-%s%s.xls' % (year,scenario)
 	wb.save(outputPath)
-	print('"%s" saved after %.2fs' % (outputPath, time.time()-globalTic))
 
 ## Display help of the program.
 def displayHelp():
-	text="Usage :\n\tpython timeseriesConverter.py [year scenario] dataFolder\n"
+	text="Usage :\n\tpython timeseriesConverter.py [year scenario] dataFolder [--stream[=MB]] [--days=days]\n"
+	text+="\nWith the option --stream, the time series are written in a CSV file day after day instead of an Excel file built in memory.\n"
+	text+="With --stream=MB, the buffered Excel files are also released when the memory exceeds MB megabytes.\n"
+	text+="With the option --days=1-31,45 or --days=selection.csv, a file written by daySelector, only these days are in the time series.\n"
 	print(text)
 
 # Starting point from python #
@@ -0,0 +1,194 @@
+## Loading of the MV/LV transformers for every period of a year and screening of their overloads.
+# The loads of a bus with transformers are supplied through them, the transformers of a bus sharing its apparent power
+# in proportion of their maximal power pmax in kVA. The apparent power of the buses is computed from the injection
+# store by chunks of days, so that the loading of every transformer and period is a product of the coefficients of the
+# buses with the base profiles. The loadings are streamed in a memory-mapped array with a row by transformer, each
+# time series being contiguous, and the overloads and the duration curves are accumulated chunk by chunk.
+# Requires numpy which can be installed with "pip3 install numpy".
+#@author Sebastien MATHIEU
+
+import sys, os, json, time
+
+import daySelector
+import cacheFolders
+import lazyImport
+numpy=lazyImport.lazyModule('numpy')
+networkMaker=lazyImport.lazyModule('networkMaker')
+injectionStore=lazyImport.lazyModule('injectionStore')
+
+## Number of periods of a day.
+T=96
+## Default loading above which a transformer is overloaded.
+OVERLOAD=1.0
+## Loadings at which the duration curves are sampled.
+DURATION_LEVELS=[l/20 for l in range(0,41)]
+## Default number of days computed together.
+CHUNK_DAYS=31
+## Default number of most stressed transformers reported.
+TOP=10
+## File of the loadings in the output folder.
+LOADING_FILE="loading.npy"
+## File of the description of the loadings in the output folder.
+DESCRIPTION_FILE="loading.json"
+## File of the summary of each transformer in the output folder.
+SUMMARY_FILE="summary.csv"
+## File of the duration curves in the output folder.
+DURATION_FILE="duration.csv"
+
+## Entry point of the program.
+# @param argv Program parameters.
+def main(argv):
+	# Options
+	threshold=OVERLOAD
+	top=TOP
+	days,argv=daySelector.daysOption(argv)
+	argv=cacheFolders.cacheFolderOption(argv)
+	options=[a for a in argv if a.startswith('--')]
+	argv=[a for a in argv if not a.startswith('--')]
+	for o in options:
+		if o.startswith("--overload="):
+			threshold=float(o[len("--overload="):])
+		elif o.startswith("--top="):
+			top=int(o[len("--top="):])
+		else:
+			raise Exception('Unknown option "%s".' % o)
+
+	if len(argv) < 4:
+		displayHelp()
+		sys.exit(2)
+	folderPath=argv[0] if argv[0].endswith(("/","\\")) else argv[0]+"/"
+	if not os.path.exists(folderPath):
+		raise Exception('Folder \"%s\" does not exists.' % folderPath)
+	year=int(argv[1])
+	scenario=argv[2]
+	outputPath=argv[3]
+
+	tic=time.time()
+	report=computeLoading(folderPath,year,scenario,outputPath,days,threshold)
+	print("%s transformers over %s periods computed in %.2fs, %s overloaded above %.0f%%." % (len(report.transformers),report.periods,time.time()-tic,
+																							numpy.count_nonzero(report.overloadPeriods),100*threshold))
+	print("Most stressed transformers:")
+	for i in report.mostStressed(top):
+		t=report.transformers[i]
+		print("\t%s on bus %s, %s kVA: maximal loading %.1f%%, %.2fh overloaded" % (t,t.bus,t.pmax,100*report.maxLoading[i],report.overloadPeriods[i]/4))
+
+## Display help of the program.
+def displayHelp():
+	text="Usage :\n\tpython3 transformerLoading.py dataFolder year scenario outputFolder [--overload=loading] [--top=N] [--days=days] [--cache-folder=folder]\n"
+	text+="\nCompute the loading of the MV/LV transformers for every period of the year, or of the days of --days, and report the\n"
+	text+="most stressed transformers. The output folder contains the loadings \"%s\" of shape (transformers, periods) described\n" % LOADING_FILE
+	text+="in \"%s\", the summary of each transformer \"%s\" and the hours above each loading in \"%s\".\n" % (DESCRIPTION_FILE,SUMMARY_FILE,DURATION_FILE)
+	text+="A transformer is overloaded above the loading of --overload, %.2f by default.\n" % OVERLOAD
+	print(text)
+
+## Get the transformers of a network.
+# @param graph Network graph from networkMaker.makeNetwork.
+# @return List of TransformerData by increasing internal id.
+def listTransformers(graph):
+	return sorted((t for n,ndata in graph.nodes(data=True) for t in ndata.get("transformers",[])),key=lambda t: t.internalId)
+
+## Compute the loading of the transformers of a year and scenario.
+# @param folderPath Folder with the excel files.
+# @param year Year of the scenarios.
+# @param scenario Type of scenario. Usually 'L' or 'H'.
+# @param outputPath Output folder.
+# @param days Days of the year, all the days if None.
+# @param threshold Loading above which a transformer is overloaded.
+# @param chunkDays Number of days computed together.
+# @return LoadingReport.
+def computeLoading(folderPath,year,scenario,outputPath,days=None,threshold=OVERLOAD,chunkDays=CHUNK_DAYS):
+	store=injectionStore.openStore(folderPath,year,scenario)
+	transformers=listTransformers(networkMaker.makeNetwork(folderPath))
+	if days is None:
+		days=range(1,store.activeBase.shape[1]//T+1)
+	days=list(days)
+	if not os.path.exists(outputPath):
+		os.makedirs(outputPath)
+
+	# Buses with transformers and their total maximal power in kVA
+	buses=sorted(set(t.bus for t in transformers))
+	busColumn=dict((b,i) for i,b in enumerate(buses))
+	columns=numpy.array([busColumn[t.bus] for t in transformers],dtype=numpy.intp)
+	capacity=numpy.zeros(len(buses))
+	numpy.add.at(capacity,columns,[float(t.pmax) for t in transformers])
+	if numpy.any(capacity <= 0):
+		raise Exception('Transformers without maximal power on the buses %s.' % [b for b,c in zip(buses,capacity) if c <= 0])
+	coefficients=store.coefficients[store.rows(buses)]
+
+	with open(os.path.join(outputPath,DESCRIPTION_FILE),'w') as file:
+		json.dump({"year":year,"scenario":scenario,"periods":T,"days":days,"threshold":threshold,
+					"transformers":[{"id":t.id,"bus":t.bus,"pmax":t.pmax} for t in transformers]},file)
+	loading=numpy.lib.format.open_memmap(os.path.join(outputPath,LOADING_FILE),mode='w+',dtype=numpy.float32,shape=(len(transformers),len(days)*T))
+	report=LoadingReport(transformers,threshold)
+	for i in range(0,len(days),chunkDays):
+		periods=numpy.concatenate([numpy.arange(*store.periods(d).indices(store.activeBase.shape[1])) for d in days[i:i+chunkDays]])
+		S=numpy.hypot(coefficients@store.activeBase[:,periods],coefficients@store.reactiveBase[:,periods])
+		chunk=(S/capacity[:,numpy.newaxis])[columns]
+		loading[:,i*T:i*T+chunk.shape[1]]=chunk
+		report.add(chunk)
+	loading.flush()
+	del loading
+
+	report.save(outputPath)
+	return report
+
+## Overloads and duration curves of the transformers, accumulated over the periods.
+class LoadingReport:
+	## Constructor.
+	# @param transformers List of TransformerData.
+	# @param threshold Loading above which a transformer is overloaded.
+	def __init__(self,transformers,threshold=OVERLOAD):
+		self.transformers=transformers
+		self.threshold=threshold
+		self.periods=0
+		self.maxLoading=numpy.zeros(len(transformers))
+		self.totalLoading=numpy.zeros(len(transformers))
+		self.overloadPeriods=numpy.zeros(len(transformers),dtype=numpy.int64)
+		self.duration=numpy.zeros((len(transformers),len(DURATION_LEVELS)),dtype=numpy.int64)
+
+	## Add the loadings of the next periods.
+	# @param loading Array of shape (transformers, periods) with the loading of the transformers.
+	def add(self,loading):
+		self.periods+=loading.shape[1]
+		self.maxLoading=numpy.maximum(self.maxLoading,loading.max(axis=1,initial=0))
+		self.totalLoading+=loading.sum(axis=1)
+		self.overloadPeriods+=numpy.count_nonzero(loading > self.threshold,axis=1)
+		for l,level in enumerate(DURATION_LEVELS):
+			self.duration[:,l]+=numpy.count_nonzero(loading >= level,axis=1)
+
+	## Get the most stressed transformers, by maximal loading then by overloaded periods.
+	# @param n Number of transformers.
+	# @return List of the indexes of the transformers.
+	def mostStressed(self,n=TOP):
+		return list(numpy.lexsort((-self.overloadPeriods,-self.maxLoading))[:n])
+
+	## Save the summary and the duration curves.
+	# @param outputPath Output folder.
+	def save(self,outputPath):
+		with open(os.path.join(outputPath,SUMMARY_FILE),'w') as file:
+			file.write("id,bus,pmax,maxLoading,meanLoading,overloadHours\n")
+			for i,t in enumerate(self.transformers):
+				file.write("%s,%s,%s,%.6g,%.6g,%.2f\n" % (t.id,t.bus,t.pmax,self.maxLoading[i],self.totalLoading[i]/max(self.periods,1),self.overloadPeriods[i]/4))
+		with open(os.path.join(outputPath,DURATION_FILE),'w') as file:
+			file.write("loading,%s\n" % ",".join(str(t.id) for t in self.transformers))
+			for l,level in enumerate(DURATION_LEVELS):
+				file.write("%.2f,%s\n" % (level,",".join("%.2f" % (h/4) for h in self.duration[:,l])))
+
+	## @var transformers
+	# List of TransformerData.
+	## @var threshold
+	# Loading above which a transformer is overloaded.
+	## @var periods
+	# Number of periods added.
+	## @var maxLoading
+	# Array with the maximal loading of each transformer.
+	## @var totalLoading
+	# Array with the sum of the loadings of each transformer over the periods.
+	## @var overloadPeriods
+	# Array with the number of periods each transformer is above the threshold.
+	## @var duration
+	# Array of shape (transformers, levels) with the number of periods each transformer is at or above each level of DURATION_LEVELS.
+
+# Starting point from python #
+if __name__ == "__main__":
+	main(sys.argv[1:])
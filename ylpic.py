@@ -0,0 +1,78 @@
+## Single entry point of the converters with a subcommand by output format.
+# The module of a subcommand is only imported when the subcommand is run and the converters import networkx, xlrd,
+# xlwt and numpy lazily, see lazyImport, so that the help and the short jobs of shell loops do not pay their import
+# time. The subcommand "startup" measures the import time of every subcommand in a fresh interpreter and fails if one
+# exceeds the budget or loads a heavy module.
+#@author Sebastien MATHIEU
+
+import sys, os, subprocess, importlib
+
+## Subcommands with their module and description.
+SUBCOMMANDS=[("dot","dotConverter","Dot representation and pdf figure of the network."),
+			("matpower","matpowerConverter","Matpower cases of a period or of every period of a year."),
+			("pyflow","pyflowConverter","Pyflow cases of a period or of every period of a year."),
+			("dgp","DGPConverter","DGP file of the network."),
+			("dsima","dsimaConverter","DSIMA instances of the days of a year."),
+			("timeseries","timeseriesConverter","Time series of the total injections of a year."),
+			("horizon","horizonBuilder","DSIMA instances over horizons of several consecutive days."),
+			("days","daySelector","Representative days of a year with their weights."),
+			("whatif","scenarioScaler","What-if variants scaling the reference powers of a scenario."),
+			("transformers","transformerLoading","Loading and overloads of the MV/LV transformers of a year."),
+			("serve","conversionServer","Resident server of the conversions, keeping the data in memory.")]
+## Modules which should not be loaded when a subcommand is imported.
+HEAVY_MODULES=["networkx","xlrd","xlwt","numpy","scipy","pygraphviz"]
+## Default budget of the import time of a subcommand in seconds.
+STARTUP_BUDGET=0.1
+
+## Entry point of the program.
+# @param argv Program parameters.
+def main(argv):
+	commands=dict((name,module) for name,module,description in SUBCOMMANDS)
+	if len(argv) < 1 or argv[0] in ("-h","--help","help"):
+		displayHelp()
+		sys.exit(2 if len(argv) < 1 else 0)
+	elif argv[0] == "startup":
+		budget=next((float(a[len("--budget="):])/1000 for a in argv[1:] if a.startswith("--budget=")),STARTUP_BUDGET)
+		sys.exit(0 if checkStartup(budget) else 1)
+	elif argv[0] not in commands:
+		print('Unknown subcommand "%s".\n' % argv[0])
+		displayHelp()
+		sys.exit(2)
+	importlib.import_module(commands[argv[0]]).main(argv[1:])
+
+## Display help of the program.
+def displayHelp():
+	text="Usage :\n\tpython3 ylpic.py subcommand [parameters]\n\tpython3 ylpic.py startup [--budget=ms]\n"
+	text+="\nSubcommands:\n"
+	for name,module,description in SUBCOMMANDS:
+		text+="\t%-12s %s\n" % (name,description)
+	text+="\nRun a subcommand without parameters to display its help. The subcommand startup checks that every subcommand\n"
+	text+="imports in less than %.0fms (default) without loading %s.\n" % (STARTUP_BUDGET*1000,", ".join(HEAVY_MODULES))
+	print(text)
+
+## Measure the import time of a module in a fresh interpreter.
+# @param module Name of the module.
+# @return Tuple with the import time in seconds and the list of the heavy modules loaded.
+def measureStartup(module):
+	code="import time;tic=time.perf_counter();import %s;seconds=time.perf_counter()-tic\n" % module
+	code+="import lazyImport;print(seconds);print(','.join(m for m in %r if lazyImport.isLoaded(m)))" % HEAVY_MODULES
+	output=subprocess.check_output([sys.executable,"-c",code],cwd=os.path.dirname(os.path.abspath(__file__)),universal_newlines=True)
+	lines=output.splitlines()
+	return float(lines[-2]),[m for m in lines[-1].split(",") if m != ""]
+
+## Check the import time of every subcommand.
+# @param budget Budget of the import time of a subcommand in seconds.
+# @return True if every subcommand is within the budget and loads no heavy module.
+def checkStartup(budget=STARTUP_BUDGET):
+	success=True
+	for name,module,description in SUBCOMMANDS:
+		seconds,loaded=measureStartup(module)
+		passed=seconds <= budget and len(loaded) == 0
+		success=success and passed
+		print("%-12s %8.1fms %s%s" % (name,seconds*1000,"ok" if passed else "FAILED",
+									" (loads %s)" % ", ".join(loaded) if len(loaded) > 0 else ""))
+	return success
+
+# Starting point from python #
+if __name__ == "__main__":
+	main(sys.argv[1:])